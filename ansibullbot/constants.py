@@ -224,6 +224,16 @@ DEFAULT_RATELIMIT = get_config(
     value_type='boolean'
 )
 
+# Requests left untouched in each rate limit bucket before callers wait for the reset
+DEFAULT_RATELIMIT_RESERVE = get_config(
+    p,
+    DEFAULTS,
+    'ratelimit_reserve',
+    '%s_RATELIMIT_RESERVE' % PROG_NAME.upper(),
+    100,
+    value_type='int'
+)
+
 DEFAULT_GITHUB_URL = get_config(
     p,
     DEFAULTS,
@@ -260,6 +270,36 @@ DEFAULT_GITHUB_TOKEN = get_config(
     value_type='string'
 )
 
+# Cap on concurrent raw api requests per process
+DEFAULT_GITHUB_MAX_CONCURRENCY = get_config(
+    p,
+    DEFAULTS,
+    'github_max_concurrency',
+    '%s_GITHUB_MAX_CONCURRENCY' % PROG_NAME.upper(),
+    8,
+    value_type='int'
+)
+
+# How many issues ahead of the one being triaged to load api data for
+DEFAULT_PREFETCH = get_config(
+    p,
+    DEFAULTS,
+    'prefetch',
+    '%s_PREFETCH' % PROG_NAME.upper(),
+    4,
+    value_type='int'
+)
+
+# How many issues or pull requests to fetch per bulk graphql query, 0 disables it
+DEFAULT_GRAPHQL_BATCH_SIZE = get_config(
+    p,
+    DEFAULTS,
+    'graphql_batch_size',
+    '%s_GRAPHQL_BATCH_SIZE' % PROG_NAME.upper(),
+    25,
+    value_type='int'
+)
+
 DEFAULT_GITHUB_REPOS = get_config(
     p,
     DEFAULTS,
@@ -327,6 +367,48 @@ DEFAULT_PICKLE_ISSUES = get_config(
     value_type='boolean'
 )
 
+# Where the per issue caches live, sqlite or the legacy file tree
+DEFAULT_CACHE_BACKEND = get_config(
+    p,
+    DEFAULTS,
+    'cache_backend',
+    '%s_CACHE_BACKEND' % PROG_NAME.upper(),
+    'sqlite',
+)
+
+# How many processes parse the module docstrings while indexing, 1 parses them in process
+DEFAULT_EXTRACT_WORKERS = get_config(
+    p,
+    DEFAULTS,
+    'extract_workers',
+    '%s_EXTRACT_WORKERS' % PROG_NAME.upper(),
+    4,
+    value_type='int'
+)
+
+# How the repos are cloned and updated: full, blobless (--filter=blob:none) or sparse
+# (blobless with only DEFAULT_SPARSE_PATHS in the worktree). blobless and sparse
+# update with fetch and reset --hard instead of pull --rebase. File contents missing
+# from them are downloaded when read, so the module history only follows exact
+# renames there.
+DEFAULT_CLONE_STRATEGY = get_config(
+    p,
+    DEFAULTS,
+    'clone_strategy',
+    '%s_CLONE_STRATEGY' % PROG_NAME.upper(),
+    'full',
+)
+
+# The directories a sparse checkout keeps, files at the top of the repo are always kept
+DEFAULT_SPARSE_PATHS = get_config(
+    p,
+    DEFAULTS,
+    'sparse_paths',
+    '%s_SPARSE_PATHS' % PROG_NAME.upper(),
+    ['.github', 'changelogs', 'lib/ansible', 'meta', 'plugins'],
+    value_type='list'
+)
+
 ###########################################
 #   AZURE PIPELINES
 ###########################################
@@ -412,6 +494,26 @@ DEFAULT_RECEIVER_PORT = get_config(
     value_type='int'
 )
 
+# Shared secret for validating github webhook deliveries
+DEFAULT_WEBHOOK_SECRET = get_config(
+    p,
+    'receiver',
+    'webhook_secret',
+    '%s_WEBHOOK_SECRET' % PROG_NAME.upper(),
+    None,
+    value_type='str'
+)
+
+# Write every webhook delivery here so it can be replayed later
+DEFAULT_WEBHOOK_RECORD_DIR = get_config(
+    p,
+    'receiver',
+    'webhook_record_dir',
+    '%s_WEBHOOK_RECORD_DIR' % PROG_NAME.upper(),
+    None,
+    value_type='str'
+)
+
 ###########################################
 #   SENTRY ERROR REPORTING
 ###########################################
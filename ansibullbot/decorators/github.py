@@ -8,6 +8,7 @@ import logging
 import requests
 import socket
 import sys
+import threading
 import time
 import traceback
 
@@ -15,6 +16,7 @@ from requests.exceptions import ReadTimeout
 
 from ansibullbot._text_compat import to_text
 from ansibullbot.errors import RateLimitError
+from ansibullbot.utils.rate_scheduler import SCHEDULER
 from ansibullbot.utils.sqlite_utils import AnsibullbotDatabase
 
 import ansibullbot.constants as C
@@ -22,6 +24,12 @@ import ansibullbot.constants as C
 
 ADB = AnsibullbotDatabase()
 
+# the database session is not thread safe and prefetching calls in from threads
+ADB_LOCK = threading.RLock()
+
+# set once this process asked the rate_limit endpoint for the initial buckets
+SEEDED = False
+
 
 def get_rate_limit():
     url = C.DEFAULT_GITHUB_URL
@@ -56,6 +64,7 @@ def get_rate_limit():
         return None
 
     ADB.set_rate_limit(token=token, rawjson=response)
+    SCHEDULER.update_from_rate_limit(response)
     return response
 
 
@@ -96,23 +105,20 @@ def RateLimited(fn):
         while not success:
             count += 1
 
-            # use cached ratelimit data and a query counter to reduce api calls for rate_limit
-            rl = ADB.get_rate_limit_rawjson(token=C.DEFAULT_GITHUB_TOKEN)
-            qcounter = ADB.get_rate_limit_query_counter(token=C.DEFAULT_GITHUB_TOKEN)
-            if rl is None or qcounter is None or qcounter > 100 or (rl and rl['resources']['core']['remaining'] < 100):
-                rl = get_rate_limit()
-                ADB.set_rate_limit(token=C.DEFAULT_GITHUB_TOKEN, rawjson=rl)
-                qcounter = ADB.get_rate_limit_query_counter(token=C.DEFAULT_GITHUB_TOKEN)
-
-            logging.debug('qcounter: %s' % qcounter)
-            rl['resources']['core']['remaining'] -= qcounter
-
-            if rl:
-                logging.debug('ratelimited call #%s [%s] [%s] [%s]' %
-                              (count,
-                               type(args[0]),
-                               fn.__name__,
-                               rl['resources']['core']['remaining']))
+            # the buckets are kept current from the response headers, so
+            # the rate_limit endpoint is only asked once to seed them
+            global SEEDED
+            if not SEEDED:
+                with ADB_LOCK:
+                    if not SEEDED:
+                        SEEDED = True
+                        get_rate_limit()
+
+            logging.debug('ratelimited call #%s [%s] [%s] [%s]' %
+                          (count,
+                           type(args[0]),
+                           fn.__name__,
+                           SCHEDULER.remaining('core')))
 
             if count > 10:
                 logging.error('HIT 10 loop iteration on call, giving up')
@@ -123,6 +129,7 @@ def RateLimited(fn):
             try:
                 x = fn(*args, **kwargs)
                 success = True
+                SCHEDULER.observe()
             except RateLimitError:
                 stime = get_reset_time()
             except OSError as e:
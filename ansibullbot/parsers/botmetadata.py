@@ -39,6 +39,47 @@ def compute_file_children(filenames):
     return iterfiles
 
 
+class BotmetaIndex:
+    '''Prefix lookups over the botmeta file keys
+
+    A key applies to every path starting with it, so the keys of a path are
+    among its prefixes of the lengths the keys have and each is one dict
+    lookup. Keys added to the files later on (index_files adds the modules)
+    are picked up by the next lookup.
+    '''
+
+    def __init__(self, files):
+        self.files = files
+        self._count = None
+        self._lengths = []
+
+    @property
+    def lengths(self):
+        if self._count != len(self.files):
+            self._lengths = sorted({len(x) for x in self.files})
+            self._count = len(self.files)
+        return self._lengths
+
+    def ancestors(self, path):
+        '''The keys path starts with, the shortest first'''
+        return [path[:x] for x in self.lengths if x <= len(path) and path[:x] in self.files]
+
+    def longest(self, path):
+        '''The longest key path starts with or None'''
+        for x in reversed(self.lengths):
+            if x <= len(path) and path[:x] in self.files:
+                return path[:x]
+        return None
+
+
+def get_botmeta_index(botmeta):
+    '''The index parse_yaml built for the botmeta, or a new one for a botmeta built otherwise'''
+    index = botmeta.get('files_index')
+    if index is None or index.files is not botmeta['files']:
+        index = botmeta['files_index'] = BotmetaIndex(botmeta['files'])
+    return index
+
+
 class BotMetadataParser:
 
     @staticmethod
@@ -223,4 +264,7 @@ class BotMetadataParser:
         logging.info('botmeta: propogate keys')
         propagate_keys(ydata)
 
+        # ancestors and longest key lookups over the propagated files
+        ydata['files_index'] = BotmetaIndex(ydata['files'])
+
         return ydata
@@ -31,7 +31,6 @@ import os
 import shutil
 
 from ansibullbot.triagers.ansible import AnsibleTriage
-from ansibullbot.triagers.plugins.component_matching import get_component_match_facts
 
 basepath = os.path.dirname(__file__).split('/')
 libindex = basepath[::-1].index('ansibullbot')
@@ -39,49 +38,6 @@ libindex = (len(basepath) - 1) - libindex
 basedir = '/'.join(basepath[0:libindex])
 TEMPLATES = os.path.join(basedir, 'templates')
 
-class HistoryMock:
-
-    def get_component_commands(self, botnames=None):
-        return []
-
-
-class IssueMock:
-
-    _component = None
-
-    def is_issue(self):
-        return True
-    def is_pullrequest(self):
-        return False
-
-    @property
-    def title(self):
-        return ''
-
-    @property
-    def body(self):
-        return ''
-
-    @property
-    def comments(self):
-        return []
-
-    @property
-    def files(self):
-        return [self._component]
-
-    @property
-    def history(self):
-        return HistoryMock()
-
-    @property
-    def template_data(self):
-        return {
-            'component_raw': self._component,
-            'component name': self._component
-        }
-
-
 class AnsibleSupportReport(AnsibleTriage):
 
     def __init__(self):
@@ -108,21 +64,14 @@ class AnsibleSupportReport(AnsibleTriage):
         filenames = [x for x in filenames if not x.endswith('.pyo')]
         filenames = [x for x in filenames if not x.endswith('.pyo')]
 
-        for fn in filenames:
+        for fn, matches, _ in self.component_matcher.match_many(filenames, files=True):
             logging.debug(fn)
-            iw = IssueMock()
-            iw._component = fn
             try:
-                facts = get_component_match_facts(iw, self.component_matcher, [])
                 component_facts[fn] = {}
-                component_facts[fn]['component'] = facts['component_name']
-                component_facts[fn]['support'] = facts['component_matches'][0]['support']
-                labels = facts['component_matches'][0]['labels'][:]
-                labels += facts['component_labels']
-                labels = sorted(set(labels))
-                component_facts[fn]['labels'] = ','.join(labels)
-                component_facts[fn]['maintainers'] = \
-                        ','.join(facts['component_matches'][0]['maintainers'])
+                component_facts[fn]['component'] = fn
+                component_facts[fn]['support'] = matches[0]['support']
+                component_facts[fn]['labels'] = ','.join(sorted(set(matches[0]['labels'])))
+                component_facts[fn]['maintainers'] = ','.join(matches[0]['maintainers'])
 
             except Exception as e:
                 component_facts[fn] = {'error': '%s' % e}
@@ -10,12 +10,18 @@
 #     where the bot can't
 #   * different workflows should be a matter of enabling different plugins
 
+import dataclasses
 import datetime
-import json
+import gc
 import logging
+import multiprocessing
 import os
+import queue
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+from operator import itemgetter
 from pprint import pprint
 
 import ansibullbot.constants as C
@@ -30,6 +36,7 @@ from ansibullbot.utils.moduletools import ModuleIndexer
 from ansibullbot.utils.receiver_client import post_to_receiver
 from ansibullbot.utils.timetools import strip_time_safely
 from ansibullbot.utils.version_tools import AnsibleVersionIndexer
+from ansibullbot.wrappers.ghapiwrapper import RepoWrapper, rebind
 from ansibullbot.wrappers.issuewrapper import IssueWrapper
 
 from ansibullbot.triagers.plugins.backports import get_backport_facts
@@ -68,6 +75,14 @@ from ansibullbot.triagers.plugins.docs_info import get_docs_facts
 
 VALID_CI_PROVIDERS = frozenset(('azp', 'gha'))
 
+# IssueWrapper properties the fact plugins in process() end up reading, the
+# history pulls in the timeline, reviews and commits, component matching and
+# small_patch the files and the CI wrapper the check runs
+PREFETCH_RESOURCES = {
+    'issue': ('events',),
+    'pullrequest': ('events', 'pr_files', 'reviews', 'commits', 'pullrequest_check_runs'),
+}
+
 
 class AnsibleActions(DefaultActions):
     def __init__(self):
@@ -78,9 +93,22 @@ class AnsibleActions(DefaultActions):
         self.cancel_ci_branch = False
 
 
+@dataclasses.dataclass(frozen=True)
+class TriageContext:
+    '''The per repo indexes, built once and only read while triaging'''
+    key: tuple
+    botmeta: dict
+    version_indexer: AnsibleVersionIndexer
+    module_indexer: ModuleIndexer
+    component_matcher: AnsibleComponentMatcher
+
+
 class AnsibleTriage(DefaultTriager):
     CLOSING_LABELS = ['bot_closed']
 
+    # seconds between checks for workers that died without reporting
+    WORKER_POLL = 30
+
     ISSUE_TYPES = {
         'bug report': 'bug',
         'bugfix pull request': 'bug',
@@ -136,6 +164,12 @@ class AnsibleTriage(DefaultTriager):
 
         self.ci = None
         self.ci_class = ci_class
+        self.contexts = {}
+        self.worker = None
+
+        # workers have no stdin to answer the action prompts
+        if self.args.workers > 1 and not (self.args.force or self.args.dry_run):
+            raise ValueError('--workers requires --force or --dry-run')
 
     def load_botmeta(self, gitrepo):
         if self.args.botmetafile is not None:
@@ -193,152 +227,438 @@ class AnsibleTriage(DefaultTriager):
 
         icount = 0
         for repopath, repodata in self.repos.copy().items():
-            repo = repodata['repo']
-            cachedir = os.path.join(self.cachedir_base, repopath)
-
-            logging.info('loading botmeta')
-            self.botmeta = self.load_botmeta(repodata['gitrepo'])
-
-            logging.info('creating version indexer')
-            self.version_indexer = AnsibleVersionIndexer(checkoutdir=repodata['gitrepo'].checkoutdir)
-
-            logging.info('creating module indexer')
-            self.module_indexer = ModuleIndexer(
-                botmeta=self.botmeta,
-                gh_client=self.gqlc,
-                cachedir=self.cachedir_base,
-                gitrepo=repodata['gitrepo'],
-                commits=not self.args.ignore_module_commits
+            self.use_context(self.prepare_context(repopath, repodata))
+
+            if self.args.workers > 1:
+                icount += self.run_workers(repopath, repodata)
+            else:
+                for issue, prefetched in self.prefetch_issues(repopath, repodata, repodata['issues']):
+                    icount += 1
+                    self.triage_issue(repopath, repodata, issue, prefetched=prefetched)
+
+            self.ack_webhook_events(repopath)
+
+            logging.info(
+                'component match cache for %s: %s hits, %s misses' %
+                (repopath, self.component_matcher.match_cache_hits, self.component_matcher.match_cache_misses)
+            )
+
+        ts2 = datetime.datetime.now()
+        td = (ts2 - ts1).total_seconds()
+        logging.info('triaged %s issues in %s seconds' % (icount, td))
+
+    def _context_key(self, repodata):
+        key = [repodata['gitrepo'].head]
+        if self.args.botmetafile is not None:
+            key.append(os.path.getmtime(self.args.botmetafile))
+        return tuple(key)
+
+    def prepare_context(self, repopath, repodata):
+        '''Build the botmeta and indexers for a repo unless the checkout is unchanged'''
+        key = self._context_key(repodata)
+        context = self.contexts.get(repopath)
+        if context is not None and key[0] and context.key == key:
+            logging.info('reusing triage context for %s' % repopath)
+            return context
+
+        logging.info('loading botmeta')
+        botmeta = self.load_botmeta(repodata['gitrepo'])
+
+        logging.info('creating version indexer')
+        version_indexer = AnsibleVersionIndexer(checkoutdir=repodata['gitrepo'].checkoutdir)
+
+        logging.info('creating module indexer')
+        module_indexer = ModuleIndexer(
+            botmeta=botmeta,
+            gh_client=self.gqlc,
+            cachedir=self.cachedir_base,
+            gitrepo=repodata['gitrepo'],
+            commits=not self.args.ignore_module_commits
+        )
+
+        logging.info('creating component matcher')
+        component_matcher = AnsibleComponentMatcher(
+            cachedir=self.cachedir_base,
+            gitrepo=repodata['gitrepo'],
+            botmeta=botmeta,
+            email_cache=module_indexer.emails_cache,
+            usecache=True,
+            use_galaxy=not self.args.ignore_galaxy
+        )
+
+        context = TriageContext(
+            key=key,
+            botmeta=botmeta,
+            version_indexer=version_indexer,
+            module_indexer=module_indexer,
+            component_matcher=component_matcher,
+        )
+        self.contexts[repopath] = context
+        return context
+
+    def use_context(self, context):
+        self.botmeta = context.botmeta
+        self.version_indexer = context.version_indexer
+        self.module_indexer = context.module_indexer
+        self.component_matcher = context.component_matcher
+
+    def run_workers(self, repopath, repodata):
+        '''Triage a repo with a pool of workers pulling from a shared queue
+
+        Numbers are handed out one at a time, so a slow issue only holds up
+        the worker that got it instead of a whole pre-assigned chunk.
+        '''
+        numbers = repodata['issues'].numbers[:]
+        workercount = min(self.args.workers, len(numbers))
+        if not workercount:
+            return 0
+
+        logging.info('starting %s workers for %s numbers in %s' % (workercount, len(numbers), repopath))
+
+        # workers are forked so they inherit the collected repo data as is
+        mpctx = multiprocessing.get_context('fork')
+
+        numbers_queue = mpctx.Queue()
+        for number in numbers:
+            numbers_queue.put(number)
+        for _ in range(workercount):
+            numbers_queue.put(None)
+
+        stats_queue = mpctx.Queue()
+
+        # move the context built by the parent out of the gc's reach so the
+        # collector does not touch (and copy) its pages in every child
+        gc.collect()
+        gc.freeze()
+
+        workers = []
+        for wid in range(workercount):
+            p = mpctx.Process(
+                target=self._triage_worker,
+                args=(wid, repopath, repodata, numbers_queue, stats_queue)
             )
+            p.start()
+            workers.append(p)
+
+        try:
+            stats = self._collect_worker_stats(repopath, numbers, workers, stats_queue)
+        finally:
+            for p in workers:
+                p.join()
+            gc.unfreeze()
 
-            logging.info('creating component matcher')
-            self.component_matcher = AnsibleComponentMatcher(
-                cachedir=self.cachedir_base,
-                gitrepo=repodata['gitrepo'],
-                botmeta=self.botmeta,
-                email_cache=self.module_indexer.emails_cache,
-                usecache=True,
-                use_galaxy=not self.args.ignore_galaxy
+        icount = 0
+        for wstats in sorted(stats, key=itemgetter('worker')):
+            icount += wstats['count']
+            rate = 0
+            if wstats['seconds']:
+                rate = wstats['count'] / (wstats['seconds'] / 60)
+            logging.info(
+                'worker %s [pid %s] triaged %s issues (%s failed) in %ss [%.2f/min]' %
+                (wstats['worker'], wstats['pid'], wstats['count'], wstats['failed'], wstats['seconds'], rate)
             )
 
-            for issue in repodata['issues']:
+        return icount
+
+    def _collect_worker_stats(self, repopath, numbers, workers, stats_queue):
+        '''Record what the workers report until each sent its stats or died
+
+        Workers only report the numbers they finished, the resume file and
+        the processed list are kept here. Resume points at the end of the
+        run of numbers that are all done, so nothing a slower worker still
+        holds is skipped on the next start.
+        '''
+        stats = {}
+        counts = dict.fromkeys(range(len(workers)), 0)
+        done = set()
+        pending = deque(numbers)
+        while len(stats) < len(workers):
+            try:
+                kind, data = stats_queue.get(timeout=self.WORKER_POLL)
+            except queue.Empty:
+                for wid, p in enumerate(workers):
+                    # a worker that exited normally flushed its stats before
+                    # it went, so anything left missing after a drain is lost
+                    if wid in stats or p.exitcode is None or not stats_queue.empty():
+                        continue
+                    logging.error('worker %s [pid %s] died with exitcode %s' % (wid, p.pid, p.exitcode))
+                    stats[wid] = {
+                        'worker': wid, 'pid': p.pid, 'count': counts[wid], 'failed': 0, 'seconds': 0,
+                        'match_cache_hits': 0, 'match_cache_misses': 0,
+                    }
+                continue
+
+            if kind == 'stats':
+                stats[data['worker']] = data
+                # the matcher counted in the child, add it up here
+                self.component_matcher.match_cache_hits += data['match_cache_hits']
+                self.component_matcher.match_cache_misses += data['match_cache_misses']
+                continue
+
+            wid, number, closed = data
+            counts[wid] += 1
+            self.repos[repopath]['processed'].append(number)
+            if closed:
+                self.mark_closed(repopath, number)
+
+            done.add(number)
+            last = None
+            while pending and pending[0] in done:
+                last = pending.popleft()
+            if last is not None:
+                self.set_resume(repopath, last)
+
+        return list(stats.values())
+
+    def _triage_worker(self, wid, repopath, repodata, numbers_queue, stats_queue):
+        '''Pull numbers off the queue until the sentinel is reached'''
+        ts1 = datetime.datetime.now()
+        self.worker = wid
+        stats = {
+            'worker': wid,
+            'pid': os.getpid(),
+            'count': 0,
+            'failed': 0,
+            'seconds': 0,
+            'match_cache_hits': 0,
+            'match_cache_misses': 0,
+        }
+        self.component_matcher.match_cache_hits = 0
+        self.component_matcher.match_cache_misses = 0
+
+        try:
+            # do not share api connections with the parent process
+            self.ghw = self.create_github_wrapper()
+            repodata['repo'] = RepoWrapper(self.ghw.gh, repopath, cachedir=self.cachedir_base)
+
+            issuecache = repodata['issues'].issuecache
+            while True:
+                number = numbers_queue.get()
+                if number is None:
+                    break
+
+                stats['count'] += 1
+                closed = False
+                try:
+                    if number in issuecache:
+                        issue = issuecache[number]
+                    else:
+                        issue = repodata['repo'].get_issue(number)
+                    if issue is not None:
+                        # a worker only ever holds one number so there is nothing to
+                        # look ahead at, but the resources still load concurrently
+                        prefetched = None
+                        if self.args.prefetch:
+                            try:
+                                prefetched = self.prefetch_issue(repopath, repodata, issue)
+                            except Exception as e:
+                                # triage_issue loads everything lazily as it would without prefetching
+                                logging.warning('prefetching %s failed: %s' % (number, e))
+                        self.triage_issue(repopath, repodata, issue, prefetched=prefetched)
+                        # the parent's summaries do not see what a worker found closed
+                        closed = issue.state == 'closed'
+                except Exception as e:
+                    stats['failed'] += 1
+                    logging.exception('worker %s failed to triage %s: %s' % (wid, number, e))
+                stats_queue.put(('processed', (wid, number, closed)))
+        finally:
+            stats['seconds'] = (datetime.datetime.now() - ts1).total_seconds()
+            stats['match_cache_hits'] = self.component_matcher.match_cache_hits
+            stats['match_cache_misses'] = self.component_matcher.match_cache_misses
+            stats_queue.put(('stats', stats))
+
+    def create_issue_wrapper(self, repopath, repodata, issue, github=None, repo=None):
+        return IssueWrapper(
+            github=github or self.ghw,
+            repo=repo or repodata['repo'],
+            issue=issue,
+            cachedir=os.path.join(self.cachedir_base, repopath),
+            gitrepo=repodata['gitrepo'],
+        )
+
+    def prefetch_issue(self, repopath, repodata, issue, node=None):
+        '''Create the wrappers for an issue and load what process() reads
+
+        This runs next to the main thread, so the issue is moved onto a
+        PyGithub connection of its own that goes with the wrappers it returns.
+        '''
+        ghw = self.ghw.clone()
+        iw = self.create_issue_wrapper(
+            repopath,
+            repodata,
+            rebind(issue, ghw.gh),
+            github=ghw,
+            repo=repodata['repo'].clone(ghw.gh),
+        )
+
+        if self.args.skip_no_update:
+            # do not spend api calls on issues that are likely to be skipped
+            lmeta = self.load_meta(iw)
+            if lmeta and lmeta['updated_at'] == to_text(iw.updated_at.isoformat()):
+                return None
+
+        # refreshing the pullrequest resets the reviews, so do it before seeding
+        iw.update_pullrequest()
+        if node is not None:
+            iw.hydrate(node)
+
+        if iw.is_pullrequest():
+            iw.prefetch(PREFETCH_RESOURCES['pullrequest'])
+            ci = self.ci_class(self.cachedir_base, iw)
+        else:
+            iw.prefetch(PREFETCH_RESOURCES['issue'])
+            ci = None
+
+        return iw, ci
+
+    def prefetch_issues(self, repopath, repodata, issues):
+        '''Yield (issue, prefetched) pairs while the next issues load in the background'''
+        if not self.args.prefetch:
+            for issue in issues:
+                if issue is not None:
+                    yield issue, None
+            return
+
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.args.prefetch) as executor:
+            for issue in issues:
                 if issue is None:
                     continue
 
-                icount += 1
+                # the iterator hydrates each batch of upcoming numbers with
+                # a single graphql query
+                node = getattr(issues, 'nodes', {}).get(issue.number)
+                pending.append((issue, executor.submit(self.prefetch_issue, repopath, repodata, issue, node)))
+                if len(pending) > self.args.prefetch:
+                    yield self._prefetched(*pending.popleft())
 
-                self.meta = {}
-                self.processed_meta = {}
-                self.set_resume(repopath, issue.number)
+            while pending:
+                yield self._prefetched(*pending.popleft())
 
-                # keep track of known issues
-                self.repos[repopath]['processed'].append(issue.number)
+    def _prefetched(self, issue, future):
+        try:
+            return issue, future.result()
+        except Exception as e:
+            # triage_issue loads everything lazily as it would without prefetching
+            logging.warning('prefetching %s failed: %s' % (issue.number, e))
+            return issue, None
 
-                if issue.state == 'closed' and not self.args.ignore_state:
-                    logging.info(str(issue.number) + ' is closed, skipping')
-                    continue
+    def triage_issue(self, repopath, repodata, issue, prefetched=None):
+        '''Process a single issue and apply the resulting actions'''
+        repo = repodata['repo']
 
-                if self.args.only_prs and 'pull' not in issue.html_url:
-                    logging.info(str(issue.number) + ' is issue, skipping')
-                    continue
+        self.meta = {}
+        self.processed_meta = {}
 
-                if self.args.only_issues and 'pull' in issue.html_url:
-                    logging.info(str(issue.number) + ' is pullrequest, skipping')
-                    continue
+        # workers report back to the parent which keeps both in order
+        if self.worker is None:
+            self.set_resume(repopath, issue.number)
 
-                # users may want to re-run this issue after manual intervention
-                redo = True
+            # keep track of known issues
+            self.repos[repopath]['processed'].append(issue.number)
 
-                # keep track of how many times this isssue has been re-done
-                loopcount = 0
+        if issue.state == 'closed':
+            self.mark_closed(repopath, issue.number)
+            if not self.args.ignore_state:
+                logging.info(str(issue.number) + ' is closed, skipping')
+                return
 
-                # time each issue
-                its1 = datetime.datetime.now()
+        if self.args.only_prs and 'pull' not in issue.html_url:
+            logging.info(str(issue.number) + ' is issue, skipping')
+            return
 
-                while redo:
+        if self.args.only_issues and 'pull' in issue.html_url:
+            logging.info(str(issue.number) + ' is pullrequest, skipping')
+            return
 
-                    # use the loopcount to check new data
-                    loopcount += 1
+        # users may want to re-run this issue after manual intervention
+        redo = True
 
-                    if loopcount <= 1:
-                        logging.info('starting triage for %s' % issue.html_url)
-                    else:
-                        # if >1 get latest data
-                        logging.info('restarting triage for %s' % issue.number)
-                        issue = repo.get_issue(issue.number)
-
-                    # clear redo
-                    redo = False
-
-                    # create the wrapper on each loop iteration
-                    iw = IssueWrapper(
-                        github=self.ghw,
-                        repo=repo,
-                        issue=issue,
-                        cachedir=cachedir,
-                        gitrepo=repodata['gitrepo'],
-                    )
+        # keep track of how many times this isssue has been re-done
+        loopcount = 0
 
-                    if iw.is_pullrequest():
-                        logging.info('creating CI wrapper')
-                        self.ci = self.ci_class(self.cachedir_base, iw)
-                    else:
-                        self.ci = None
+        # time each issue
+        its1 = datetime.datetime.now()
 
-                    if self.args.skip_no_update:
-                        if self._should_skip_issue(iw, repopath):
-                            continue
+        while redo:
 
-                    # force an update on the PR data
-                    iw.update_pullrequest()
+            # use the loopcount to check new data
+            loopcount += 1
 
-                    self.process(iw, repodata['labels'])
+            if loopcount <= 1:
+                logging.info('starting triage for %s' % issue.html_url)
+            else:
+                # if >1 get latest data
+                logging.info('restarting triage for %s' % issue.number)
+                issue = repo.get_issue(issue.number)
 
-                    # build up actions from the meta
-                    actions = AnsibleActions()
-                    self.create_actions(iw, actions, repodata['labels'])
-                    self.save_meta(iw, self.meta, actions)
+            # clear redo
+            redo = False
 
-                    # DEBUG!
-                    logging.info('url: %s' % iw.html_url)
-                    logging.info('title: %s' % iw.title)
-                    if iw.is_pullrequest():
-                        for fn in iw.files:
-                            logging.info('component[f]: %s' % fn)
-                    else:
-                        for line in iw.template_data.get('component_raw', '').split('\n'):
-                            logging.info('component[t]: %s' % line)
-                        for fn in self.meta['component_filenames']:
-                            logging.info('component[m]: %s' % fn)
-
-                    if self.meta['template_missing_sections']:
-                        logging.info(
-                            'missing sections: ' +
-                            ', '.join(self.meta['template_missing_sections'])
-                        )
-                    if self.meta['is_needs_revision']:
-                        logging.info('needs_revision')
-                        for msg in self.meta['is_needs_revision_msgs']:
-                            logging.info('needs_revision_msg: %s' % msg)
-                    if self.meta['is_needs_rebase']:
-                        logging.info('needs_rebase')
-                        for msg in self.meta['is_needs_rebase_msgs']:
-                            logging.info('needs_rebase_msg: %s' % msg)
-
-                    pprint(vars(actions))
-
-                    # do the actions
-                    action_meta = self.apply_actions(iw, actions)
-                    if action_meta['REDO']:
-                        redo = True
-
-                its2 = datetime.datetime.now()
-                td = (its2 - its1).total_seconds()
-                logging.info('finished triage for %s in %ss' % (to_text(iw), td))
+            if loopcount <= 1 and prefetched is not None:
+                # the pullrequest data was refreshed when it was prefetched
+                iw, self.ci = prefetched
+            else:
+                # create the wrapper on each loop iteration
+                iw = self.create_issue_wrapper(repopath, repodata, issue)
 
-        ts2 = datetime.datetime.now()
-        td = (ts2 - ts1).total_seconds()
-        logging.info('triaged %s issues in %s seconds' % (icount, td))
+                if iw.is_pullrequest():
+                    logging.info('creating CI wrapper')
+                    self.ci = self.ci_class(self.cachedir_base, iw)
+                else:
+                    self.ci = None
+
+            if self.args.skip_no_update:
+                if self._should_skip_issue(iw, repopath):
+                    continue
+
+            if loopcount > 1 or prefetched is None:
+                # force an update on the PR data
+                iw.update_pullrequest()
+
+            self.process(iw, repodata['labels'])
+
+            # build up actions from the meta
+            actions = AnsibleActions()
+            self.create_actions(iw, actions, repodata['labels'])
+            self.save_meta(iw, self.meta, actions)
+
+            # DEBUG!
+            logging.info('url: %s' % iw.html_url)
+            logging.info('title: %s' % iw.title)
+            if iw.is_pullrequest():
+                for fn in iw.files:
+                    logging.info('component[f]: %s' % fn)
+            else:
+                for line in iw.template_data.get('component_raw', '').split('\n'):
+                    logging.info('component[t]: %s' % line)
+                for fn in self.meta['component_filenames']:
+                    logging.info('component[m]: %s' % fn)
+
+            if self.meta['template_missing_sections']:
+                logging.info(
+                    'missing sections: ' +
+                    ', '.join(self.meta['template_missing_sections'])
+                )
+            if self.meta['is_needs_revision']:
+                logging.info('needs_revision')
+                for msg in self.meta['is_needs_revision_msgs']:
+                    logging.info('needs_revision_msg: %s' % msg)
+            if self.meta['is_needs_rebase']:
+                logging.info('needs_rebase')
+                for msg in self.meta['is_needs_rebase_msgs']:
+                    logging.info('needs_rebase_msg: %s' % msg)
+
+            pprint(vars(actions))
+
+            # do the actions
+            action_meta = self.apply_actions(iw, actions)
+            if action_meta['REDO']:
+                redo = True
+
+        its2 = datetime.datetime.now()
+        td = (its2 - its1).total_seconds()
+        logging.info('finished triage for %s in %ss' % (to_text(iw), td))
 
     def save_meta(self, issuewrapper, meta, actions):
         # save the meta+actions
@@ -396,31 +716,13 @@ class AnsibleTriage(DefaultTriager):
         self.processed_meta = dmeta_copy.copy()
 
     def load_meta(self, issuewrapper):
-        mfile = os.path.join(
-            issuewrapper.full_cachedir,
-            'meta.json'
-        )
-        meta = {}
-        if os.path.isfile(mfile):
-            try:
-                with open(mfile, 'rb') as f:
-                    meta = json.load(f)
-            except ValueError as e:
-                logging.error("Could not load json from '%s' because: '%s'. Removing the file...", f.name, e)
-                os.remove(mfile)
-                return {}
-        return meta
+        return issuewrapper.store.get(issuewrapper.repo_full_name, issuewrapper.number, 'meta') or {}
 
     def dump_meta(self, issuewrapper, meta):
-        mfile = os.path.join(
-            issuewrapper.full_cachedir,
-            'meta.json'
-        )
         meta['time'] = to_text(datetime.datetime.now().isoformat())
-        logging.info('dump meta to %s' % mfile)
-
-        with open(mfile, 'w', encoding='utf-8') as f:
-            json.dump(meta, f)
+        logging.info('dump meta for %s/%s' % (issuewrapper.repo_full_name, issuewrapper.number))
+        issuewrapper.store.set(issuewrapper.repo_full_name, issuewrapper.number, 'meta', meta)
+        issuewrapper.store.set_triaged(issuewrapper.repo_full_name, issuewrapper.number, meta)
 
     def create_actions(self, iw, actions, valid_labels):
         '''Parse facts and make actions from them'''
@@ -1612,6 +1914,10 @@ class AnsibleTriage(DefaultTriager):
                             help="Use a specific commit for the indexers")
         parser.add_argument('--ignore_galaxy', action='store_true',
                             help='do not index or search for components in galaxy')
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Number of worker processes pulling issues from a shared queue")
+        parser.add_argument("--prefetch", type=int, default=C.DEFAULT_PREFETCH,
+                            help="Number of upcoming issues to load api data for while the current one is triaged")
         parser.add_argument("--ci", type=str, choices=VALID_CI_PROVIDERS,
                             default=C.DEFAULT_CI_PROVIDER,
                             help="Specify a CI provider that repo uses")
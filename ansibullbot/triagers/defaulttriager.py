@@ -16,7 +16,6 @@
 
 import abc
 import argparse
-import datetime
 import json
 import logging
 import os
@@ -29,10 +28,12 @@ from jinja2 import Environment, FileSystemLoader
 from ansibullbot import constants as C
 from ansibullbot._text_compat import to_text
 from ansibullbot.decorators.github import RateLimited
+from ansibullbot.utils.cache_store import get_cache_store
 from ansibullbot.utils.gh_gql_client import GithubGraphQLClient
 from ansibullbot.utils.git_tools import GitRepoWrapper
 from ansibullbot.utils.iterators import RepoIssuesIterator
 from ansibullbot.utils.logs import set_logger
+from ansibullbot.utils.sqlite_utils import AnsibullbotDatabase
 from ansibullbot.utils.systemtools import run_command
 from ansibullbot.utils.timetools import strip_time_safely
 from ansibullbot.wrappers.ghapiwrapper import GithubWrapper, RepoWrapper
@@ -44,6 +45,9 @@ basepath = '/'.join(basepath[0:libindex])
 loader = FileSystemLoader(os.path.join(basepath, 'templates'))
 environment = Environment(loader=loader, trim_blocks=True)
 
+# holds the webhook event queue filled by scripts/ansibot_receiver.py
+ADB = AnsibullbotDatabase()
+
 
 class DefaultActions:
     def __init__(self):
@@ -88,6 +92,9 @@ class DefaultTriager:
         parser = self.create_parser()
         self.args = parser.parse_args(args)
 
+        if self.args.webhooks and not self.args.daemonize:
+            raise ValueError('--webhooks requires --daemonize')
+
         logging.info('starting bot')
         self.set_logger()
 
@@ -104,13 +111,7 @@ class DefaultTriager:
                 self.args.start_at = resume['number'] + 1
 
         logging.info('creating api wrapper')
-        self.ghw = GithubWrapper(
-            url=C.DEFAULT_GITHUB_URL,
-            user=C.DEFAULT_GITHUB_USERNAME,
-            passw=C.DEFAULT_GITHUB_PASSWORD,
-            token=C.DEFAULT_GITHUB_TOKEN,
-            cachedir=self.cachedir_base
-        )
+        self.ghw = self.create_github_wrapper()
 
         logging.info('creating graphql client')
         self.gqlc = GithubGraphQLClient(
@@ -120,6 +121,15 @@ class DefaultTriager:
 
         self._maintainer_team = None
 
+    def create_github_wrapper(self):
+        return GithubWrapper(
+            url=C.DEFAULT_GITHUB_URL,
+            user=C.DEFAULT_GITHUB_USERNAME,
+            passw=C.DEFAULT_GITHUB_PASSWORD,
+            token=C.DEFAULT_GITHUB_TOKEN,
+            cachedir=self.cachedir_base
+        )
+
     @property
     def maintainer_team(self):
         # Note: this assumes that the token used by the bot has access to check
@@ -156,6 +166,7 @@ class DefaultTriager:
         parser.add_argument("--skiprepo", action='append', help="Github repo to skip triaging")
         parser.add_argument("--start-at", type=int, help="Start triage at the specified pr|issue")
         parser.add_argument("--sort", default='desc', choices=['asc', 'desc'], help="Direction to sort issues [desc=9-0 asc=0-9]")
+        parser.add_argument("--webhooks", action="store_true", help="after the first loop only triage numbers with queued webhook events")
         return parser
 
     def set_logger(self):
@@ -354,39 +365,15 @@ class DefaultTriager:
             self.issue_summaries[repopath] = self.gqlc.get_issue_summaries(repopath)
 
     def get_stale_numbers(self, reponame):
-        stale = []
-        for number, summary in self.issue_summaries[reponame].items():
-            if number in stale:
-                continue
-
-            if summary['state'] == 'closed':
-                continue
+        numbers = [
+            int(number) for number, summary in self.issue_summaries[reponame].items()
+            if summary['state'] != 'closed'
+        ]
 
-            number = int(number)
-            mfile = os.path.join(
-                self.cachedir_base,
-                reponame,
-                'issues',
-                to_text(number),
-                'meta.json'
-            )
-
-            if not os.path.isfile(mfile):
-                stale.append(number)
-                continue
-
-            try:
-                with open(mfile, 'rb') as f:
-                    meta = json.load(f)
-            except ValueError as e:
-                logging.error('failed to parse %s: %s' % (to_text(mfile), to_text(e)))
-                os.remove(mfile)
-                stale.append(number)
-                continue
-
-            delta = (datetime.datetime.now() - strip_time_safely(meta['time'])).days
-            if delta > C.DEFAULT_STALE_WINDOW:
-                stale.append(number)
+        # anything not triaged within the window, same as a delta.days > window check
+        since = time.time() - (C.DEFAULT_STALE_WINDOW + 1) * 86400
+        triaged = get_cache_store(self.cachedir_base).get_triaged_since(reponame, since)
+        stale = [x for x in numbers if x not in triaged]
 
         stale = sorted({int(x) for x in stale})
         if 10 >= len(stale) > 0:
@@ -429,6 +416,13 @@ class DefaultTriager:
             # increment the loopcount
             self.repos[repo]['loopcount'] += 1
 
+        if self.args.webhooks:
+            # read before collecting so events arriving during the loop are kept
+            self.repos[repo]['webhook_events'] = ADB.get_webhook_events(repo)
+            if self.repos[repo]['loopcount'] > 0:
+                self._collect_webhook_numbers(repo)
+                return
+
         logging.info('getting issue objs for %s' % repo)
         self.update_issue_summaries(repopath=repo, issuenums=issuenums)
 
@@ -536,11 +530,63 @@ class DefaultTriager:
         self.repos[repo]['issues'] = RepoIssuesIterator(
             self.repos[repo]['repo'],
             numbers,
-            issuecache=issuecache
+            issuecache=issuecache,
+            hydrate=self.get_issue_hydrator(repo),
+            batch_size=C.DEFAULT_GRAPHQL_BATCH_SIZE,
         )
 
         logging.info('getting repo objs for %s complete' % repo)
 
+    def _collect_webhook_numbers(self, repo):
+        '''Collect only the numbers with webhook events and the stale ones'''
+        numbers = set(self.repos[repo]['webhook_events'])
+        logging.info('%s numbers from webhook events' % len(numbers))
+
+        logging.info('checking for stale numbers')
+        stale = self.get_stale_numbers(repo)
+        self.repos[repo]['stale'] = [int(x) for x in stale]
+        numbers.update(self.repos[repo]['stale'])
+        logging.info('%s numbers after stale check' % len(numbers))
+
+        # state and type are filtered by the triager, the summaries are not
+        # refreshed in this mode and would miss new numbers
+        numbers = sorted(numbers, reverse=self.args.sort == 'desc')
+
+        self.repos[repo]['issues'] = RepoIssuesIterator(
+            self.repos[repo]['repo'],
+            numbers,
+            hydrate=self.get_issue_hydrator(repo),
+            batch_size=C.DEFAULT_GRAPHQL_BATCH_SIZE,
+        )
+
+    def hydrate_issues(self, repo, numbers):
+        '''Bulk fetch the graphql nodes for numbers, an empty dict on failure'''
+        try:
+            return self.gqlc.get_issue_nodes(repo, numbers)
+        except Exception as e:
+            logging.warning('failed to hydrate %s: %s' % (numbers, e))
+            return {}
+
+    def get_issue_hydrator(self, repo):
+        if C.DEFAULT_GRAPHQL_BATCH_SIZE < 1:
+            return None
+        return lambda numbers: self.hydrate_issues(repo, numbers)
+
+    def mark_closed(self, repo, number):
+        '''Keep a number seen closed out of the stale selection
+
+        Webhook mode does not refresh the summaries, without this a closed
+        issue would be fetched as stale on every loop.
+        '''
+        summary = self.issue_summaries.get(repo, {}).get(to_text(number))
+        if summary is not None:
+            summary['state'] = 'closed'
+
+    def ack_webhook_events(self, repo):
+        '''Drop the webhook events handled by this loop from the queue'''
+        if self.args.webhooks and self.repos[repo].get('webhook_events'):
+            ADB.ack_webhook_events(repo, self.repos[repo]['webhook_events'])
+
     def collect_repos(self):
         '''Populate the local cache of repos'''
         logging.info('start collecting repos')
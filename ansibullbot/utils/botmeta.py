@@ -1,3 +1,74 @@
+import sys
+
+from collections.abc import Mapping
+
+
+def _freeze(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(x) for x in value)
+    if isinstance(value, dict):
+        return MetaRecord(value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return [_thaw(x) for x in value]
+    if isinstance(value, MetaRecord):
+        return value.to_dict()
+    return value
+
+
+class MetaRecord(Mapping):
+    '''An immutable botmeta or module entry
+
+    Records of the same shape share one key index, the strings are interned
+    and the lists are kept as tuples. Reading a list gives a fresh list and
+    to_dict() or copy() the mutable dict the callers used to get.
+    '''
+
+    __slots__ = ('_index', '_values')
+
+    _INDEXES = {}
+
+    def __init__(self, data=()):
+        data = dict(data)
+        keys = tuple(sys.intern(k) for k in data)
+        index = self._INDEXES.get(keys)
+        if index is None:
+            index = self._INDEXES[keys] = {k: idx for idx, k in enumerate(keys)}
+        self._index = index
+        self._values = tuple(_freeze(x) for x in data.values())
+
+    def __getitem__(self, key):
+        value = self._values[self._index[key]]
+        if isinstance(value, tuple):
+            return _thaw(value)
+        return value
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __reduce__(self):
+        return (MetaRecord, (self.to_dict(),))
+
+    def __repr__(self):
+        return 'MetaRecord(%r)' % self.to_dict()
+
+    def to_dict(self):
+        return {k: _thaw(v) for k, v in zip(self._index, self._values)}
+
+    copy = to_dict
+
+
 def botmeta_list(inlist):
     '''use the bot's expansion of space separated lists feature'''
     if not isinstance(inlist, list):
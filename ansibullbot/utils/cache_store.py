@@ -0,0 +1,363 @@
+'''Local storage for the per issue caches
+
+Everything the bot keeps about a single issue or pull request is stored under
+a (repo, number, resource) key. The sqlite backend keeps all of it in a single
+WAL mode database next to the other caches, the file backend is the legacy
+cachedir/<repo>/issues/<number>/<file> tree and is what the migration reads.
+'''
+
+import abc
+import glob
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+import ansibullbot.constants as C
+from ansibullbot.utils.timetools import strip_time_safely
+
+
+# resource name -> file name in the legacy tree
+RESOURCES = {
+    'issue': 'issue.pickle',
+    'history': 'history.pickle',
+    'files': 'files.pickle',
+    'timeline_data': 'timeline_data.json',
+    'timeline_meta': 'timeline_meta.json',
+    'meta': 'meta.json',
+}
+
+
+def triaged_at(meta):
+    '''The epoch time dump_meta stamped on a meta, None if it has none'''
+    if not meta or not meta.get('time'):
+        return None
+    return strip_time_safely(meta['time']).timestamp()
+
+
+def cache_root(cachedir, repo):
+    '''The base cachedir from one that may already point into a repo or its issues'''
+    parts = os.path.normpath(os.path.expanduser(cachedir)).split(os.sep)
+    rparts = repo.split('/')
+    for idx in range(len(parts) - len(rparts), -1, -1):
+        if parts[idx:idx + len(rparts)] == rparts:
+            return os.sep.join(parts[:idx]) or os.sep
+    return os.sep.join(parts)
+
+
+class CacheStore(abc.ABC):
+    '''The interface the cache backends implement'''
+
+    @abc.abstractmethod
+    def get(self, repo, number, resource, default=None):
+        pass
+
+    @abc.abstractmethod
+    def set(self, repo, number, resource, value):
+        pass
+
+    @abc.abstractmethod
+    def delete(self, repo, number, resource=None):
+        pass
+
+    def get_many(self, repo, numbers, resource):
+        '''Return {number: value} for the numbers that have the resource'''
+        values = {}
+        for number in numbers:
+            value = self.get(repo, number, resource)
+            if value is not None:
+                values[number] = value
+        return values
+
+    @abc.abstractmethod
+    def items(self, repo, resource):
+        '''Iterate (number, value) over every cached number of a repo'''
+
+    def set_many(self, repo, resource, values):
+        for number, value in values.items():
+            self.set(repo, number, resource, value)
+
+    def set_triaged(self, repo, number, meta):
+        '''Record when a number was triaged, backends without an index read the metas'''
+
+    def get_triaged_since(self, repo, since):
+        '''Return the numbers triaged after the since epoch time'''
+        triaged = set()
+        for number, meta in self.items(repo, 'meta'):
+            ts = triaged_at(meta)
+            if ts is not None and ts > since:
+                triaged.add(number)
+        return triaged
+
+
+class FileCacheStore(CacheStore):
+
+    def __init__(self, cachedir):
+        self.cachedir = os.path.expanduser(cachedir)
+
+    def path(self, repo, number, resource):
+        return os.path.join(self.cachedir, repo, 'issues', str(number), RESOURCES[resource])
+
+    def get(self, repo, number, resource, default=None):
+        fn = self.path(repo, number, resource)
+        if not os.path.isfile(fn):
+            return default
+        try:
+            if fn.endswith('.json'):
+                with open(fn, 'rb') as f:
+                    return json.load(f)
+            with open(fn, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logging.error('failed to load %s: %s' % (fn, e))
+            os.remove(fn)
+            return default
+
+    def set(self, repo, number, resource, value):
+        fn = self.path(repo, number, resource)
+        if not os.path.isdir(os.path.dirname(fn)):
+            os.makedirs(os.path.dirname(fn))
+        if fn.endswith('.json'):
+            with open(fn, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+        else:
+            with open(fn, 'wb') as f:
+                pickle.dump(value, f)
+
+    def delete(self, repo, number, resource=None):
+        if resource is not None:
+            fn = self.path(repo, number, resource)
+            if os.path.isfile(fn):
+                os.remove(fn)
+            return
+        for resource in RESOURCES:
+            self.delete(repo, number, resource)
+
+    def repos(self):
+        for dn in sorted(glob.glob(os.path.join(self.cachedir, '*', '*', 'issues'))):
+            yield os.path.relpath(os.path.dirname(dn), self.cachedir)
+
+    def numbers(self, repo):
+        for dn in glob.glob(os.path.join(self.cachedir, repo, 'issues', '*')):
+            number = os.path.basename(dn)
+            if number.isdigit():
+                yield int(number)
+
+    def items(self, repo, resource):
+        for number in sorted(self.numbers(repo)):
+            value = self.get(repo, number, resource)
+            if value is not None:
+                yield number, value
+
+
+class SqliteCacheStore(CacheStore):
+    '''All the per issue caches in one sqlite database
+
+    Values are encoded like their legacy file, json or pickle, and zlib
+    compressed. A different SCHEMA_VERSION on disk drops the table, it only
+    holds what the api can give back.
+    '''
+
+    SCHEMA_VERSION = 1
+
+    # sqlite limits the number of bound parameters per statement
+    BATCH_SIZE = 500
+
+    def __init__(self, dbfile):
+        self.dbfile = os.path.expanduser(dbfile)
+        dbdir = os.path.dirname(self.dbfile)
+        if dbdir and not os.path.isdir(dbdir):
+            os.makedirs(dbdir)
+        self._local = threading.local()
+        self._create_tables()
+
+    @property
+    def conn(self):
+        # connections can not cross threads or forked workers
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.dbfile, timeout=60)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _create_tables(self):
+        with self.conn as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != self.SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS resources')
+                conn.execute('DROP TABLE IF EXISTS triage_index')
+                conn.execute('PRAGMA user_version = %d' % self.SCHEMA_VERSION)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS resources ('
+                'repo TEXT NOT NULL, number INTEGER NOT NULL, resource TEXT NOT NULL, '
+                'data BLOB, updated REAL, '
+                'PRIMARY KEY (repo, number, resource)) WITHOUT ROWID'
+            )
+
+            # a few bytes per number so stale selection never decodes a meta
+            backfill = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'triage_index'"
+            ).fetchone() is None
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS triage_index ('
+                'repo TEXT NOT NULL, number INTEGER NOT NULL, last_triaged REAL, '
+                'last_updated_at TEXT, '
+                'PRIMARY KEY (repo, number)) WITHOUT ROWID'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS triage_index_last_triaged ON triage_index (repo, last_triaged)'
+            )
+
+        if backfill:
+            rows = self.conn.execute("SELECT repo, number, data FROM resources WHERE resource = 'meta'").fetchall()
+            for repo, number, data in rows:
+                try:
+                    self.set_triaged(repo, number, self._loads('meta', data))
+                except Exception as e:
+                    logging.error('failed to index %s/%s: %s' % (repo, number, e))
+
+    @staticmethod
+    def _dumps(resource, value):
+        if RESOURCES[resource].endswith('.json'):
+            data = json.dumps(value).encode('utf-8')
+        else:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return zlib.compress(data)
+
+    @staticmethod
+    def _loads(resource, data):
+        data = zlib.decompress(data)
+        if RESOURCES[resource].endswith('.json'):
+            return json.loads(data)
+        return pickle.loads(data)
+
+    def get(self, repo, number, resource, default=None):
+        row = self.conn.execute(
+            'SELECT data FROM resources WHERE repo = ? AND number = ? AND resource = ?',
+            (repo, int(number), resource)
+        ).fetchone()
+        if row is None:
+            return default
+        try:
+            return self._loads(resource, row[0])
+        except Exception as e:
+            logging.error('failed to load %s/%s %s: %s' % (repo, number, resource, e))
+            self.delete(repo, number, resource)
+            return default
+
+    def set(self, repo, number, resource, value):
+        self.set_many(repo, resource, {number: value})
+
+    def set_many(self, repo, resource, values):
+        now = time.time()
+        with self.conn as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO resources (repo, number, resource, data, updated) VALUES (?, ?, ?, ?, ?)',
+                [(repo, int(number), resource, self._dumps(resource, value), now) for number, value in values.items()]
+            )
+
+    def delete(self, repo, number, resource=None):
+        with self.conn as conn:
+            if resource in (None, 'meta'):
+                conn.execute('DELETE FROM triage_index WHERE repo = ? AND number = ?', (repo, int(number)))
+            if resource is None:
+                conn.execute('DELETE FROM resources WHERE repo = ? AND number = ?', (repo, int(number)))
+            else:
+                conn.execute(
+                    'DELETE FROM resources WHERE repo = ? AND number = ? AND resource = ?',
+                    (repo, int(number), resource)
+                )
+
+    def get_many(self, repo, numbers, resource):
+        numbers = [int(x) for x in numbers]
+        values = {}
+        for idx in range(0, len(numbers), self.BATCH_SIZE):
+            batch = numbers[idx:idx + self.BATCH_SIZE]
+            rows = self.conn.execute(
+                'SELECT number, data FROM resources WHERE repo = ? AND resource = ? AND number IN (%s)'
+                % ', '.join('?' * len(batch)),
+                [repo, resource] + batch
+            )
+            for number, data in rows:
+                try:
+                    values[number] = self._loads(resource, data)
+                except Exception as e:
+                    logging.error('failed to load %s/%s %s: %s' % (repo, number, resource, e))
+        return values
+
+    def set_triaged(self, repo, number, meta):
+        ts = triaged_at(meta)
+        if ts is None:
+            return
+        with self.conn as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO triage_index (repo, number, last_triaged, last_updated_at) '
+                'VALUES (?, ?, ?, ?)',
+                (repo, int(number), ts, meta.get('updated_at'))
+            )
+
+    def get_triaged_since(self, repo, since):
+        rows = self.conn.execute(
+            'SELECT number FROM triage_index WHERE repo = ? AND last_triaged > ?',
+            (repo, since)
+        )
+        return {x[0] for x in rows}
+
+    def items(self, repo, resource):
+        rows = self.conn.execute(
+            'SELECT number, data FROM resources WHERE repo = ? AND resource = ? ORDER BY number',
+            (repo, resource)
+        )
+        for number, data in rows:
+            try:
+                yield number, self._loads(resource, data)
+            except Exception as e:
+                logging.error('failed to load %s/%s %s: %s' % (repo, number, resource, e))
+
+
+def migrate(source, dest, repos=None, remove=False):
+    '''Copy every resource from a FileCacheStore into another store'''
+    counts = {}
+    for repo in repos or list(source.repos()):
+        numbers = sorted(source.numbers(repo))
+        for resource in RESOURCES:
+            for idx in range(0, len(numbers), 1000):
+                values = source.get_many(repo, numbers[idx:idx + 1000], resource)
+                dest.set_many(repo, resource, values)
+                if resource == 'meta':
+                    for number, meta in values.items():
+                        dest.set_triaged(repo, number, meta)
+                counts[repo] = counts.get(repo, 0) + len(values)
+        if remove:
+            for number in numbers:
+                source.delete(repo, number)
+        logging.info('migrated %s resources for %s' % (counts.get(repo, 0), repo))
+    return counts
+
+
+STORES = {}
+STORES_LOCK = threading.Lock()
+
+
+def get_cache_store(cachedir, backend=None):
+    '''Return the shared store for a base cachedir'''
+    if backend is None:
+        backend = C.DEFAULT_CACHE_BACKEND
+    cachedir = os.path.abspath(os.path.expanduser(cachedir))
+
+    with STORES_LOCK:
+        key = (backend, cachedir)
+        if key not in STORES:
+            if backend == 'file':
+                STORES[key] = FileCacheStore(cachedir)
+            elif backend == 'sqlite':
+                STORES[key] = SqliteCacheStore(os.path.join(cachedir, 'issues.sqlite'))
+            else:
+                raise ValueError('unknown cache backend: %s' % backend)
+        return STORES[key]
@@ -1,15 +1,24 @@
-import copy
-import difflib
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
 import re
 
-from collections import OrderedDict
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict
 
 from ansibullbot._text_compat import to_bytes, to_text
-from ansibullbot.utils.extractors import ModuleExtractor
+from ansibullbot.parsers.botmetadata import get_botmeta_index
+from ansibullbot.utils.botmeta import MetaRecord
+from ansibullbot.utils.extractors import extract_author_records, ModuleExtractor
+from ansibullbot.utils.file_tools import read_gzip_json_file, write_gzip_json_file
 from ansibullbot.utils.galaxy import GalaxyQueryTool
+from ansibullbot.utils.git_tools import git_blob_id
+from ansibullbot.utils.sqlite_utils import AnsibullbotDatabase
+
+
+ADB = AnsibullbotDatabase()
 
 
 MODULES_FLATTEN_MAP = {
@@ -95,16 +104,301 @@ def make_prefixes(filename):
     return prefixes
 
 
+class PatternSet:
+    '''An ordered list of patterns tried at the start of a text
+
+    re.match on an alternation tries its branches in order, so one pass of
+    the combined pattern finds the same pattern a loop of re.match calls
+    would stop at. The alternations of each tail of the list are compiled
+    on first use to carry on past a hit.
+    '''
+
+    def __init__(self, patterns, flags=0):
+        self.patterns = [re.compile(x, flags) for x in patterns]
+        self.flags = flags
+        self._combined = {}
+
+    def combined(self, start):
+        if start not in self._combined:
+            self._combined[start] = re.compile(
+                '|'.join('(?P<p%s>%s)' % (idx, x.pattern) for idx, x in enumerate(self.patterns) if idx >= start),
+                self.flags
+            )
+        return self._combined[start]
+
+    def match(self, text, start=0):
+        '''The index and match object of the first pattern from start that matches'''
+        if start >= len(self.patterns):
+            return None, None
+        mobj = self.combined(start).match(text)
+        if mobj is None:
+            return None, None
+        # the branch group closes last, so it is the lastgroup
+        idx = int(mobj.lastgroup[1:])
+        return idx, self.patterns[idx].match(text)
+
+    def matches(self, text):
+        '''Yield (index, match object) for every pattern that matches, in order'''
+        idx, mobj = self.match(text)
+        while mobj is not None:
+            yield idx, mobj
+            idx, mobj = self.match(text, idx + 1)
+
+
+RE_URL = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+
+# the search_by_regex_* patterns, each list is tried in order
+# https://www.tutorialspoint.com/python/python_reg_expressions.htm
+REGEX_MODULES = PatternSet([
+    r'\:\n(\S+)\.py',
+    r'(\S+)\.py',
+    r'\-(\s+)(\S+)(\s+)module',
+    r'\`ansible_module_(\S+)\.py\`',
+    r'module(\s+)\-(\s+)(\S+)',
+    r'module(\s+)(\S+)',
+    r'\`(\S+)\`(\s+)module',
+    r'(\S+)(\s+)module',
+    r'the (\S+) command',
+    r'(\S+) \(.*\)',
+    r'(\S+)\-module',
+    r'modules/(\S+)',
+    r'module\:(\s+)\`(\S+)\`',
+    r'module\: (\S+)',
+    r'module (\S+)',
+    r'module `(\S+)`',
+    r'module: (\S+)',
+    r'new (\S+) module',
+    r'the (\S+) module',
+    r'the \"(\S+)\" module',
+    r':\n(\S+) module',
+    r'(\S+) module',
+    r'(\S+) core module',
+    r'(\S+) extras module',
+    r':\n\`(\S+)\` module',
+    r'\`(\S+)\` module',
+    r'`(\S+)` module',
+    r'(\S+)\* modules',
+    r'(\S+) and (\S+)',
+    r'(\S+) or (\S+)',
+    r'(\S+) \+ (\S+)',
+    r'(\S+) \& (\S)',
+    r'(\S+) and (\S+) modules',
+    r'(\S+) or (\S+) module',
+    r'(\S+)_module',
+    r'action: (\S+)',
+    r'action (\S+)',
+    r'ansible_module_(\S+)\.py',
+    r'ansible_module_(\S+)',
+    r'ansible_modules_(\S+)\.py',
+    r'ansible_modules_(\S+)',
+    r'(\S+) task',
+    r'(\s+)\((\S+)\)',
+    r'(\S+)(\s+)(\S+)(\s+)modules',
+    r'(\S+)(\s+)module\:(\s+)(\S+)',
+    r'\-(\s+)(\S+)(\s+)module',
+    r'\:(\s+)(\S+)(\s+)module',
+    r'\-(\s+)ansible(\s+)(\S+)(\s+)(\S+)(\s+)module',
+    r'.*(\s+)(\S+)(\s+)module.*'
+], re.M | re.I)
+
+REGEX_MODULE_GLOBS = PatternSet([
+    r'(\S+) ansible modules',
+    r'all (\S+) based modules',
+    r'all (\S+) modules',
+    r'.* all (\S+) modules.*',
+    r'(\S+) modules',
+    r'(\S+\*) modules',
+    r'all cisco (\S+\*) modules',
+])
+
+_REGEX_GENERIC = [
+    [r'(.*) action plugin', 'lib/ansible/plugins/action'],
+    [r'(.*) inventory plugin', 'lib/ansible/plugins/inventory'],
+    [r'(.*) dynamic inventory', 'contrib/inventory'],
+    [r'(.*) dynamic inventory (script|file)', 'contrib/inventory'],
+    [r'(.*) inventory script', 'contrib/inventory'],
+    [r'(.*) filter', 'lib/ansible/plugins/filter'],
+    [r'(.*) jinja filter', 'lib/ansible/plugins/filter'],
+    [r'(.*) jinja2 filter', 'lib/ansible/plugins/filter'],
+    [r'(.*) template filter', 'lib/ansible/plugins/filter'],
+    [r'(.*) fact caching plugin', 'lib/ansible/plugins/cache'],
+    [r'(.*) fact caching module', 'lib/ansible/plugins/cache'],
+    [r'(.*) lookup plugin', 'lib/ansible/plugins/lookup'],
+    [r'(.*) lookup', 'lib/ansible/plugins/lookup'],
+    [r'(.*) callback plugin', 'lib/ansible/plugins/callback'],
+    [r'(.*)\.py callback', 'lib/ansible/plugins/callback'],
+    [r'callback plugin (.*)', 'lib/ansible/plugins/callback'],
+    [r'(.*) stdout callback', 'lib/ansible/plugins/callback'],
+    [r'stdout callback (.*)', 'lib/ansible/plugins/callback'],
+    [r'stdout_callback (.*)', 'lib/ansible/plugins/callback'],
+    [r'(.*) callback plugin', 'lib/ansible/plugins/callback'],
+    [r'(.*) connection plugin', 'lib/ansible/plugins/connection'],
+    [r'(.*) connection type', 'lib/ansible/plugins/connection'],
+    [r'(.*) connection', 'lib/ansible/plugins/connection'],
+    [r'(.*) transport', 'lib/ansible/plugins/connection'],
+    [r'connection=(.*)', 'lib/ansible/plugins/connection'],
+    [r'connection: (.*)', 'lib/ansible/plugins/connection'],
+    [r'connection (.*)', 'lib/ansible/plugins/connection'],
+    [r'strategy (.*)', 'lib/ansible/plugins/strategy'],
+    [r'(.*) strategy plugin', 'lib/ansible/plugins/strategy'],
+    [r'(.*) module util', 'lib/ansible/module_utils'],
+    [r'ansible-galaxy (.*)', 'lib/ansible/galaxy'],
+    [r'ansible-playbook (.*)', 'lib/ansible/playbook'],
+    [r'ansible/module_utils/(.*)', 'lib/ansible/module_utils'],
+    [r'module_utils/(.*)', 'lib/ansible/module_utils'],
+    [r'lib/ansible/module_utils/(.*)', 'lib/ansible/module_utils'],
+    [r'(\S+) documentation fragment', 'lib/ansible/utils/module_docs_fragments'],
+]
+REGEX_GENERIC = PatternSet([x[0] for x in _REGEX_GENERIC], re.M | re.I)
+REGEX_GENERIC_DIRS = [x[1] for x in _REGEX_GENERIC]
+
+
+class FilepathIndex:
+    '''Suffix and path segment lookups over a list of repo files
+
+    The reversed paths are kept sorted so a suffix becomes a prefix range
+    found by bisection, and every path segment maps to the positions of the
+    files containing it. Positions follow the order of the given list.
+    '''
+
+    def __init__(self, files):
+        self.files = list(files)
+        self.names = set(self.files)
+
+        rpaths = sorted((fn[::-1], idx) for idx, fn in enumerate(self.files))
+        self._rpaths = [x[0] for x in rpaths]
+        self._rpositions = [x[1] for x in rpaths]
+
+        self.segments = defaultdict(list)
+        for idx, fn in enumerate(self.files):
+            for segment in set(self.path_segments(fn)):
+                self.segments[segment].append(idx)
+
+    def __len__(self):
+        return len(self.files)
+
+    @staticmethod
+    def path_segments(fn):
+        fn_paths = fn.split('/')
+        fn_paths.append(fn_paths[-1].replace('.py', '').replace('.ps1', ''))
+        return fn_paths
+
+    def endswith(self, suffix):
+        '''Positions of the files ending with suffix'''
+        rsuffix = suffix[::-1]
+        positions = []
+        idx = bisect_left(self._rpaths, rsuffix)
+        while idx < len(self._rpaths) and self._rpaths[idx].startswith(rsuffix):
+            positions.append(self._rpositions[idx])
+            idx += 1
+        return positions
+
+    def segment_counts(self, segments):
+        '''Count for each file position how many of segments it contains'''
+        counts = Counter()
+        for segment in segments:
+            counts.update(self.segments.get(segment, ()))
+        return counts
+
+
+class ModuleIndex:
+    '''Name, key and approximate name lookups over the MODULES dict
+
+    difflib's quick_ratio only compares character counts, so the names are
+    bucketed by length (a ratio over .9 needs lengths within 9/11 of each
+    other) and keep their character counts to score without SequenceMatcher.
+    '''
+
+    CLOSE_RATIO = .9
+
+    def __init__(self, modules):
+        self.modules = list(modules.values())
+        self.keys = {k: idx for idx, k in enumerate(modules)}
+
+        self.names = {}
+        self.lengths = defaultdict(list)
+        for idx, v in enumerate(self.modules):
+            vname = v['name']
+            if not isinstance(vname, str):
+                vname = to_text(vname)
+            self.names.setdefault(vname, idx)
+            self.lengths[len(vname)].append((idx, Counter(vname)))
+
+    def by_name(self, candidates):
+        '''The first module named like any of the candidates'''
+        positions = [self.names[x] for x in candidates if x in self.names]
+        if positions:
+            return self.modules[min(positions)]
+        return None
+
+    def by_key(self, key):
+        if key in self.keys:
+            return self.modules[self.keys[key]]
+        return None
+
+    def close_matches(self, pattern):
+        '''Modules whose name has a quick_ratio over CLOSE_RATIO with pattern, in order'''
+        pcount = Counter(pattern)
+        plen = len(pattern)
+        positions = []
+        for length in range(plen * 9 // 11, plen * 11 // 9 + 2):
+            for idx, vcount in self.lengths.get(length, ()):
+                matches = sum((vcount & pcount).values())
+                total = length + plen
+                # same arithmetic as difflib._calculate_ratio
+                ratio = 2.0 * matches / total if total else 1.0
+                if ratio > self.CLOSE_RATIO:
+                    positions.append(idx)
+        return [self.modules[x] for x in sorted(positions)]
+
+
+# the matcher match_many forks its workers from, they inherit it as is
+_MATCH_MANY = None
+
+
+def _match_many_chunk(args):
+    title, todo = args
+    matcher, memo = _MATCH_MANY
+    return matcher._match_many_chunk(title, todo, memo)
+
+
+def _fork_map(matcher, title, todo, workers, chunksize):
+    '''Yield the results of each chunk of todo from forked workers, in order'''
+    global _MATCH_MANY
+    _MATCH_MANY = (matcher, {})
+    chunks = [(title, todo[x:x + chunksize]) for x in range(0, len(todo), chunksize)]
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            yield from pool.imap(_match_many_chunk, chunks)
+    finally:
+        _MATCH_MANY = None
+
+
 class AnsibleComponentMatcher:
 
     GALAXY_MANIFESTS = {}
     STOPWORDS = ['ansible', 'core', 'plugin']
+    # how many components a match_many worker takes at a time
+    MATCH_MANY_CHUNK = 50
+    # the only parts of a title _match_component looks at
+    TITLE_CONTEXTS = [
+        'module_util',
+        'module util',
+        'module',
+        'dynamic inventory',
+        'inventory script',
+        'inventory plugin',
+        'integration test',
+    ]
     STOPCHARS = ['"', "'", '(', ')', '?', '*', '`', ',', ':', '?', '-']
     BLACKLIST = ['new module', 'new modules']
     MODULES = OrderedDict()
     MODULE_NAMES = []
     MODULE_NAMESPACE_DIRECTORIES = []
 
+    # frozen since the modules moved to collections, so is its file list
+    PRE_COLLECTION_BRANCH = 'origin/stable-2.9'
+
     # FIXME: THESE NEED TO GO INTO botmeta
     # ALSO SEE search_by_regex_generic ...
     KEYWORDS = {
@@ -190,6 +484,7 @@ class AnsibleComponentMatcher:
         self.cachedir = cachedir
         self.use_galaxy = use_galaxy
         self.botmeta = botmeta if botmeta else {'files': {}}
+        self.botmeta_hash = self.hash_botmeta(self.botmeta)
         self.email_cache = email_cache
 
         if not use_galaxy:
@@ -200,80 +495,206 @@ class AnsibleComponentMatcher:
         self.strategy = None
         self.strategies = []
 
+        self.indexed_head = None
+        self.match_cache_context = None
+        self.match_cache_hits = 0
+        self.match_cache_misses = 0
+
+        self.blob_ids = {}
+        self.module_authors = {}
+        self.new_module_authors = {}
+
         self.update()
 
     def update(self, email_cache=None, botmeta=None):
         if botmeta is not None:
             self.botmeta = botmeta
+            self.botmeta_hash = self.hash_botmeta(botmeta)
         if email_cache:
             self.email_cache = email_cache
         self.index_files()
         self.cache_keywords()
+        self.set_match_cache_context()
+
+    def set_match_cache_context(self):
+        '''Key the persistent match cache on the checkout and the botmeta
+
+        Matches only depend on the files at HEAD, their history and the
+        botmeta (keywords included), so a new commit or botmeta starts over.
+        '''
+        self.match_cache_context = None
+        if not self.usecache or not self.gitrepo.repo or not self.indexed_head:
+            return
+
+        self.match_cache_context = '%s:%s' % (self.indexed_head, self.botmeta_hash)
+        ADB.prune_component_matches(self.gitrepo.repo, self.match_cache_context)
+
+    @staticmethod
+    def hash_botmeta(botmeta):
+        '''Digest the botmeta as given, index_files merges the module meta into it'''
+        botmeta = {k: v for k, v in botmeta.items() if k != 'files_index'}
+        return hashlib.sha1(
+            to_bytes(json.dumps(botmeta, sort_keys=True, default=str))
+        ).hexdigest()
+
+    @property
+    def index_dir(self):
+        '''Where the per repo index data persists between runs'''
+        if not self.usecache or not self.cachedir or not self.gitrepo.repo:
+            return None
+        return os.path.join(self.cachedir, 'component_index', *self.gitrepo.repo.rstrip('/').split('/')[-2:])
+
+    def get_pre_collection_files(self):
+        '''The files of PRE_COLLECTION_BRANCH, read from git once and kept'''
+        cfile = None
+        if self.index_dir:
+            cfile = os.path.join(self.index_dir, '%s.json' % self.PRE_COLLECTION_BRANCH.replace('/', '_'))
+            if os.path.exists(cfile):
+                with open(cfile) as f:
+                    return json.loads(f.read())
+
+        files = self.gitrepo.list_files_by_branch(self.PRE_COLLECTION_BRANCH)
+        # a missing branch may just not be fetched yet
+        if cfile and files:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(cfile, 'w') as f:
+                f.write(json.dumps(files))
+        return files
+
+    def get_reusable_module_meta(self, head):
+        '''The module meta of the last index minus the files changed since
+
+        Returns None without a previous index for this botmeta, the caller
+        then has nothing to go by and reads every module.
+        '''
+        if not self.index_dir or not head:
+            return None
+        sfile = os.path.join(self.index_dir, 'modules.json.gz')
+        if not os.path.exists(sfile):
+            return None
+        try:
+            state = read_gzip_json_file(sfile)
+        except Exception as e:
+            logging.error('failed to load %s: %s' % (sfile, e))
+            return None
+        if state.get('botmeta') != self.botmeta_hash:
+            return None
 
-    def get_module_meta(self, checkoutdir, filename):
+        changed = set()
+        if state['head'] != head:
+            changed = self.gitrepo.get_changed_files(state['head'], head)
+            if changed is None:
+                return None
+            logging.info('%s files changed since %s' % (len(changed), state['head']))
+        return {k: v for k, v in state['modules'].items() if k not in changed}
+
+    def save_module_meta(self, head, modules):
+        if not self.index_dir or not head:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        sfile = os.path.join(self.index_dir, 'modules.json.gz')
+        write_gzip_json_file(sfile + '.tmp', {'head': head, 'botmeta': self.botmeta_hash, 'modules': modules})
+        os.replace(sfile + '.tmp', sfile)
+
+    def normalize_title(self, title):
+        '''Reduce a title to the contexts that can change a match'''
+        title = (title or '').lower()
+        return ','.join(x for x in self.TITLE_CONTEXTS if x in title)
+
+    def preload_module_authors(self, filenames):
+        '''Read the stored author records of the files' current content in one go
+
+        The content nobody extracted yet is parsed across a process pool.
+        '''
+        self.blob_ids = self.gitrepo.get_blob_ids()
+        filenames = [x for x in filenames if x in self.blob_ids]
+        self.module_authors = {}
+        if self.usecache:
+            self.module_authors = ADB.get_module_authors({self.blob_ids[x] for x in filenames})
+        self.new_module_authors = {}
 
-        if self.cachedir:
-            cdir = os.path.join(self.cachedir, 'module_extractor_cache')
-        else:
-            cdir = '/tmp/ansibot_module_extractor_cache'
-        if not os.path.exists(cdir) and self.usecache:
-            os.makedirs(cdir)
-        cfile = os.path.join(cdir, '%s.json' % os.path.basename(filename))
-
-        bmeta = None
-        if not os.path.exists(cfile) or not self.usecache:
-            efile = os.path.join(checkoutdir, filename)
-            if not os.path.exists(efile):
-                fdata = self.gitrepo.get_file_content(filename, follow=True)
-                ME = ModuleExtractor(None, filedata=fdata, email_cache=self.email_cache)
-            else:
-                ME = ModuleExtractor(os.path.join(checkoutdir, filename), email_cache=self.email_cache)
-            if filename not in self.botmeta['files']:
-                bmeta = {
-                    'deprecated': os.path.basename(filename).startswith('_'),
-                    'labels': os.path.dirname(filename).split('/'),
-                    'authors': ME.authors,
-                    'maintainers': ME.authors,
-                    'maintainers_keys': [],
-                    'notified': ME.authors,
-                    'ignored': [],
-                    'support': 'core' if os.path.exists(efile) else 'community',
-                }
+        checkoutdir = os.path.abspath(self.gitrepo.checkoutdir)
+        missing = {}
+        for fn in filenames:
+            blob = self.blob_ids[fn]
+            if blob in self.module_authors or blob in missing:
+                continue
+            efile = os.path.join(checkoutdir, fn)
+            if os.path.isfile(efile):
+                missing[blob] = efile
+        if missing:
+            logging.debug('extract authors from %s modules' % len(missing))
+            records = extract_author_records(missing.values())
+            self.new_module_authors = dict(zip(missing, records))
+            self.module_authors.update(self.new_module_authors)
+
+    def save_module_authors(self):
+        if self.usecache:
+            ADB.set_module_authors(self.new_module_authors)
+        self.new_module_authors = {}
+
+    def get_module_authors(self, checkoutdir, filename):
+        '''The module's authors, extracted once per content'''
+        efile = os.path.join(checkoutdir, filename)
+        fdata = None
+        blob = self.blob_ids.get(filename)
+        if blob is None:
+            # untracked or long gone, the content itself says what it is
+            if os.path.exists(efile):
+                with open(efile, 'rb') as f:
+                    fdata = f.read()
             else:
-                bmeta = self.botmeta['files'][filename].copy()
-                if 'notified' not in bmeta:
-                    bmeta['notified'] = []
-                if 'maintainers' not in bmeta:
-                    bmeta['maintainers'] = []
-                if not bmeta.get('supported_by'):
-                    bmeta['supported_by'] = 'community'
-                if 'authors' not in bmeta:
-                    bmeta['authors'] = []
-                for x in ME.authors:
-                    if x not in bmeta['authors']:
-                        bmeta['authors'].append(x)
-                    if x not in bmeta['maintainers']:
-                        bmeta['maintainers'].append(x)
-                    if x not in bmeta['notified']:
-                        bmeta['notified'].append(x)
-                if not bmeta.get('labels'):
-                    bmeta['labels'] = os.path.dirname(filename).split('/')
-                bmeta['deprecated'] = os.path.basename(filename).startswith('_')
-
-            # clean out the ignorees
-            if 'ignored' in bmeta:
-                for ignoree in bmeta['ignored']:
-                    for thiskey in ['maintainers', 'notified']:
-                        while ignoree in bmeta[thiskey]:
-                            bmeta[thiskey].remove(ignoree)
-
-            if self.usecache:
-                with open(cfile, 'w') as f:
-                    f.write(json.dumps(bmeta))
-
-        if bmeta is None and self.usecache:
-            with open(cfile) as f:
-                bmeta = json.loads(f.read())
+                fdata = self.gitrepo.get_file_content(filename, follow=True)
+            blob = git_blob_id(fdata or b'')
+
+        record = self.module_authors.get(blob)
+        if record is None:
+            record = ModuleExtractor(efile, filedata=fdata, email_cache=self.email_cache).get_author_record()
+            self.module_authors[blob] = record
+            self.new_module_authors[blob] = record
+        return ModuleExtractor.resolve_authors(record, self.email_cache or {})
+
+    def get_module_meta(self, checkoutdir, filename):
+        efile = os.path.join(checkoutdir, filename)
+        authors = self.get_module_authors(checkoutdir, filename)
+        if filename not in self.botmeta['files']:
+            bmeta = {
+                'deprecated': os.path.basename(filename).startswith('_'),
+                'labels': os.path.dirname(filename).split('/'),
+                'authors': authors,
+                'maintainers': authors,
+                'maintainers_keys': [],
+                'notified': authors,
+                'ignored': [],
+                'support': 'core' if os.path.exists(efile) else 'community',
+            }
+        else:
+            bmeta = self.botmeta['files'][filename].copy()
+            if 'notified' not in bmeta:
+                bmeta['notified'] = []
+            if 'maintainers' not in bmeta:
+                bmeta['maintainers'] = []
+            if not bmeta.get('supported_by'):
+                bmeta['supported_by'] = 'community'
+            if 'authors' not in bmeta:
+                bmeta['authors'] = []
+            for x in authors:
+                if x not in bmeta['authors']:
+                    bmeta['authors'].append(x)
+                if x not in bmeta['maintainers']:
+                    bmeta['maintainers'].append(x)
+                if x not in bmeta['notified']:
+                    bmeta['notified'].append(x)
+            if not bmeta.get('labels'):
+                bmeta['labels'] = os.path.dirname(filename).split('/')
+            bmeta['deprecated'] = os.path.basename(filename).startswith('_')
+
+        # clean out the ignorees
+        if 'ignored' in bmeta:
+            for ignoree in bmeta['ignored']:
+                for thiskey in ['maintainers', 'notified']:
+                    while ignoree in bmeta[thiskey]:
+                        bmeta[thiskey].remove(ignoree)
 
         return bmeta
 
@@ -281,6 +702,8 @@ class AnsibleComponentMatcher:
         self.MODULES = OrderedDict()
         self.MODULE_NAMES = []
         self.MODULE_NAMESPACE_DIRECTORIES = []
+        self.FILEPATH_INDEX = FilepathIndex(self.gitrepo.files)
+        self.FILEPATH_INDEX_VERSION = self.gitrepo.files_version
 
         for fn in self.gitrepo.module_files:
             if self.gitrepo.isdir(fn):
@@ -329,7 +752,7 @@ class AnsibleComponentMatcher:
 
         # pre collections modules
         pre_coll_modules = [
-            x for x in self.gitrepo.list_files_by_branch('origin/stable-2.9')
+            x for x in self.get_pre_collection_files()
             if x.startswith('lib/ansible/modules') and '__init__' not in x and
                 (x.endswith('.py') or x.endswith('.ps1'))
         ]
@@ -347,6 +770,12 @@ class AnsibleComponentMatcher:
 
         checkoutdir = os.path.abspath(self.gitrepo.checkoutdir)
 
+        # only the modules changed since the last index need to be read
+        head = self.indexed_head = self.gitrepo.head
+        reusable = self.get_reusable_module_meta(head)
+        modules_meta = {}
+        self.preload_module_authors(x for x in self.MODULES if reusable is None or x not in reusable)
+
         _modules = self.MODULES.copy()
         for k, v in _modules.items():
             kparts = os.path.splitext(k)
@@ -357,14 +786,24 @@ class AnsibleComponentMatcher:
                     _k = k
             else:
                 _k = k
-            logging.debug('extract %s' % k)
-            # FIXME fmeta = self.get_module_meta(checkoutdir, k, _k)
-            fmeta = self.get_module_meta(checkoutdir, k)
-            if k in self.botmeta['files']:
-                self.botmeta['files'][k].update(fmeta)
+            if reusable is not None and k in reusable:
+                fmeta = reusable[k]
             else:
-                self.botmeta['files'][k] = copy.deepcopy(fmeta)
-            self.MODULES[k].update(fmeta)
+                logging.debug('extract %s' % k)
+                # FIXME fmeta = self.get_module_meta(checkoutdir, k, _k)
+                fmeta = self.get_module_meta(checkoutdir, k)
+            modules_meta[k] = fmeta
+
+            # one record serves as both the module and its botmeta entry
+            record = {}
+            record.update(self.botmeta['files'].get(k, {}))
+            record.update(self.MODULES[k])
+            record.update(fmeta)
+            self.MODULES[k] = self.botmeta['files'][k] = MetaRecord(record)
+
+        self.save_module_authors()
+        self.save_module_meta(head, modules_meta)
+        self.MODULE_INDEX = ModuleIndex(self.MODULES)
 
     def cache_keywords(self):
         for k, v in self.botmeta['files'].items():
@@ -411,12 +850,125 @@ class AnsibleComponentMatcher:
             matched_filenames = files[:]
         elif not component or component is None:
             return []
-        elif ' ' not in component and '\n' not in component and component.startswith('lib/') and self.gitrepo.existed(component):
+        elif self.match_cache_context is None:
+            matched_filenames = self._match_filenames(title, component)
+        else:
+            ntitle = self.normalize_title(title)
+            cached = ADB.get_component_match(
+                self.gitrepo.repo, self.match_cache_context, ntitle, component
+            )
+            if cached is not None:
+                self.match_cache_hits += 1
+                matched_filenames = cached['filenames']
+                self.strategies = cached['strategies']
+                if self.strategies:
+                    self.strategy = self.strategies[-1]
+            else:
+                self.match_cache_misses += 1
+                matched_filenames = self._match_filenames(title, component)
+                ADB.set_component_match(
+                    self.gitrepo.repo, self.match_cache_context, ntitle, component,
+                    matched_filenames, self.strategies
+                )
+
+        return self._matches_for_files(matched_filenames)
+
+    def _matches_for_files(self, matched_filenames, memo=None):
+        '''The metadata of each matched file, memo keeps the metadata already built'''
+
+        # mitigate flattening of the modules directory
+        if matched_filenames:
+            matched_filenames = [MODULES_FLATTEN_MAP.get(fn, fn) for fn in matched_filenames]
+
+        # create metadata for each matched file
+        component_matches = []
+        matched_filenames = sorted(set(matched_filenames))
+        for fn in matched_filenames:
+            if memo is not None and fn in memo:
+                component_matches.append(
+                    {k: v[:] if isinstance(v, list) else v for k, v in memo[fn].items()}
+                )
+                continue
+            component_matches.append(self.get_meta_for_file(fn))
+            if self.gitrepo.exists(fn):
+                component_matches[-1]['exists'] = True
+                component_matches[-1]['existed'] = True
+            elif self.gitrepo.existed(fn):
+                component_matches[-1]['exists'] = False
+                component_matches[-1]['existed'] = True
+            else:
+                component_matches[-1]['exists'] = False
+                component_matches[-1]['existed'] = False
+            if memo is not None:
+                memo[fn] = {k: v[:] if isinstance(v, list) else v for k, v in component_matches[-1].items()}
+
+        return component_matches
+
+    def match_many(self, components, title='', files=False, workers=None):
+        '''Match many components, or filenames with files=True, in one batch
+
+        Yields (component, matches, strategies) in the order the components
+        were first given, as the results come in. Duplicates are matched once,
+        the metadata of a file is built once per worker and the work is spread
+        over forked processes that inherit the indexes.
+        '''
+        components = [x for x in dict.fromkeys(components) if x]
+        if not components:
+            return
+
+        # look up the stored matches here, the workers only match
+        todo = []
+        stored = set()
+        usecache = not files and self.match_cache_context is not None
+        if usecache:
+            ntitle = self.normalize_title(title)
+            for component in components:
+                cached = ADB.get_component_match(
+                    self.gitrepo.repo, self.match_cache_context, ntitle, component
+                )
+                if cached is not None:
+                    self.match_cache_hits += 1
+                    stored.add(component)
+                    todo.append((component, cached['filenames'], cached['strategies']))
+                else:
+                    self.match_cache_misses += 1
+                    todo.append((component, None, None))
+        else:
+            todo = [(x, [x] if files else None, []) for x in components]
+
+        workers = workers or os.cpu_count() or 1
+        workers = min(workers, len(todo) // self.MATCH_MANY_CHUNK + 1)
+        if workers <= 1:
+            results = (self._match_many_chunk(title, todo, {}),)
+        else:
+            results = _fork_map(self, title, todo, workers, self.MATCH_MANY_CHUNK)
+
+        for chunk in results:
+            for component, filenames, strategies, matches in chunk:
+                if usecache and component not in stored:
+                    ADB.set_component_match(
+                        self.gitrepo.repo, self.match_cache_context, ntitle, component,
+                        filenames, strategies
+                    )
+                yield component, matches, strategies
+
+    def _match_many_chunk(self, title, todo, memo):
+        results = []
+        for component, filenames, strategies in todo:
+            if filenames is None:
+                self.strategy = None
+                self.strategies = []
+                filenames = self._match_filenames(title, component)
+                strategies = self.strategies
+            results.append((component, filenames, strategies, self._matches_for_files(filenames, memo)))
+        return results
+
+    def _match_filenames(self, title, component):
+        '''Run the strategies on a component and return the reduced filenames'''
+        if ' ' not in component and '\n' not in component and component.startswith('lib/') and self.gitrepo.existed(component):
             matched_filenames = [component]
         else:
             matched_filenames = []
-            if component is None:
-                return matched_filenames
 
             logging.debug(f'match "{component}"')
 
@@ -457,26 +1009,7 @@ class AnsibleComponentMatcher:
             if matched_filenames:
                 matched_filenames = self.reduce_filepaths(matched_filenames)
 
-        # mitigate flattening of the modules directory
-        if matched_filenames:
-            matched_filenames = [MODULES_FLATTEN_MAP.get(fn, fn) for fn in matched_filenames]
-
-        # create metadata for each matched file
-        component_matches = []
-        matched_filenames = sorted(set(matched_filenames))
-        for fn in matched_filenames:
-            component_matches.append(self.get_meta_for_file(fn))
-            if self.gitrepo.exists(fn):
-                component_matches[-1]['exists'] = True
-                component_matches[-1]['existed'] = True
-            elif self.gitrepo.existed(fn):
-                component_matches[-1]['exists'] = False
-                component_matches[-1]['existed'] = True
-            else:
-                component_matches[-1]['exists'] = False
-                component_matches[-1]['existed'] = False
-
-        return component_matches
+        return matched_filenames
 
     def search_ecosystem(self, component):
 
@@ -648,10 +1181,7 @@ class AnsibleComponentMatcher:
 
         matches = []
 
-        urls = re.findall(
-            r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
-            body
-        )
+        urls = RE_URL.findall(body)
         if urls:
             for url in urls:
                 url = url.rstrip(')')
@@ -689,102 +1219,47 @@ class AnsibleComponentMatcher:
         body = body.lower()
         logging.debug(f'attempt regex match on: {body}')
 
-        # https://www.tutorialspoint.com/python/python_reg_expressions.htm
-        patterns = [
-            r'\:\n(\S+)\.py',
-            r'(\S+)\.py',
-            r'\-(\s+)(\S+)(\s+)module',
-            r'\`ansible_module_(\S+)\.py\`',
-            r'module(\s+)\-(\s+)(\S+)',
-            r'module(\s+)(\S+)',
-            r'\`(\S+)\`(\s+)module',
-            r'(\S+)(\s+)module',
-            r'the (\S+) command',
-            r'(\S+) \(.*\)',
-            r'(\S+)\-module',
-            r'modules/(\S+)',
-            r'module\:(\s+)\`(\S+)\`',
-            r'module\: (\S+)',
-            r'module (\S+)',
-            r'module `(\S+)`',
-            r'module: (\S+)',
-            r'new (\S+) module',
-            r'the (\S+) module',
-            r'the \"(\S+)\" module',
-            r':\n(\S+) module',
-            r'(\S+) module',
-            r'(\S+) core module',
-            r'(\S+) extras module',
-            r':\n\`(\S+)\` module',
-            r'\`(\S+)\` module',
-            r'`(\S+)` module',
-            r'(\S+)\* modules',
-            r'(\S+) and (\S+)',
-            r'(\S+) or (\S+)',
-            r'(\S+) \+ (\S+)',
-            r'(\S+) \& (\S)',
-            r'(\S+) and (\S+) modules',
-            r'(\S+) or (\S+) module',
-            r'(\S+)_module',
-            r'action: (\S+)',
-            r'action (\S+)',
-            r'ansible_module_(\S+)\.py',
-            r'ansible_module_(\S+)',
-            r'ansible_modules_(\S+)\.py',
-            r'ansible_modules_(\S+)',
-            r'(\S+) task',
-            r'(\s+)\((\S+)\)',
-            r'(\S+)(\s+)(\S+)(\s+)modules',
-            r'(\S+)(\s+)module\:(\s+)(\S+)',
-            r'\-(\s+)(\S+)(\s+)module',
-            r'\:(\s+)(\S+)(\s+)module',
-            r'\-(\s+)ansible(\s+)(\S+)(\s+)(\S+)(\s+)module',
-            r'.*(\s+)(\S+)(\s+)module.*'
-        ]
-
         matches = []
 
         logging.debug(f'check patterns against: {body}')
 
-        for pattern in patterns:
-            mobj = re.match(pattern, body, re.M | re.I)
-
-            if mobj:
-                logging.debug(f'pattern {pattern} matched on "{body}"')
-
-                for x in range(0, mobj.lastindex+1):
-                    try:
-                        mname = mobj.group(x)
-                        logging.debug(f'mname: {mname}')
-                        if mname == body:
-                            continue
-                        mname = self.clean_body(mname)
-                        if not mname.strip():
-                            continue
-                        mname = mname.strip().lower()
-                        if ' ' in mname:
-                            continue
-                        if '/' in mname:
-                            continue
-
-                        mname = mname.replace('.py', '').replace('.ps1', '')
-                        logging.debug(f'--> {mname}')
-
-                        # attempt to match a module
-                        module_match = self.find_module_match(mname)
-
-                        if not module_match:
-                            pass
-                        elif isinstance(module_match, list):
-                            for m in module_match:
-                                matches.append(m['repo_filename'])
-                        elif isinstance(module_match, dict):
-                            matches.append(module_match['repo_filename'])
-                    except Exception as e:
-                        logging.error(e)
-
-                if matches:
-                    break
+        for idx, mobj in REGEX_MODULES.matches(body):
+            pattern = REGEX_MODULES.patterns[idx].pattern
+            logging.debug(f'pattern {pattern} matched on "{body}"')
+
+            for x in range(0, mobj.lastindex+1):
+                try:
+                    mname = mobj.group(x)
+                    logging.debug(f'mname: {mname}')
+                    if mname == body:
+                        continue
+                    mname = self.clean_body(mname)
+                    if not mname.strip():
+                        continue
+                    mname = mname.strip().lower()
+                    if ' ' in mname:
+                        continue
+                    if '/' in mname:
+                        continue
+
+                    mname = mname.replace('.py', '').replace('.ps1', '')
+                    logging.debug(f'--> {mname}')
+
+                    # attempt to match a module
+                    module_match = self.find_module_match(mname)
+
+                    if not module_match:
+                        pass
+                    elif isinstance(module_match, list):
+                        for m in module_match:
+                            matches.append(m['repo_filename'])
+                    elif isinstance(module_match, dict):
+                        matches.append(module_match['repo_filename'])
+                except Exception as e:
+                    logging.error(e)
+
+            if matches:
+                break
 
         return matches
 
@@ -815,27 +1290,11 @@ class AnsibleComponentMatcher:
             'ios': 'lib/ansible/modules/network/ios',
         }
 
-        regexes = [
-            r'(\S+) ansible modules',
-            r'all (\S+) based modules',
-            r'all (\S+) modules',
-            r'.* all (\S+) modules.*',
-            r'(\S+) modules',
-            r'(\S+\*) modules',
-            r'all cisco (\S+\*) modules',
-        ]
-
-        mobj = None
-        for x in regexes:
-            mobj = re.match(x, body)
-            if mobj:
-                logging.debug(f'matched glob: {x}')
-                break
-
+        idx, mobj = REGEX_MODULE_GLOBS.match(body)
         if not mobj:
             logging.debug('no glob matches')
-
-        if mobj:
+        else:
+            logging.debug('matched glob: %s' % REGEX_MODULE_GLOBS.patterns[idx].pattern)
             keyword = mobj.group(1)
             if not keyword.strip():
                 pass
@@ -868,68 +1327,26 @@ class AnsibleComponentMatcher:
         # foo dynamic inventory script
         # foo filter
 
-        # https://www.tutorialspoint.com/python/python_reg_expressions.htm
-        patterns = [
-            [r'(.*) action plugin', 'lib/ansible/plugins/action'],
-            [r'(.*) inventory plugin', 'lib/ansible/plugins/inventory'],
-            [r'(.*) dynamic inventory', 'contrib/inventory'],
-            [r'(.*) dynamic inventory (script|file)', 'contrib/inventory'],
-            [r'(.*) inventory script', 'contrib/inventory'],
-            [r'(.*) filter', 'lib/ansible/plugins/filter'],
-            [r'(.*) jinja filter', 'lib/ansible/plugins/filter'],
-            [r'(.*) jinja2 filter', 'lib/ansible/plugins/filter'],
-            [r'(.*) template filter', 'lib/ansible/plugins/filter'],
-            [r'(.*) fact caching plugin', 'lib/ansible/plugins/cache'],
-            [r'(.*) fact caching module', 'lib/ansible/plugins/cache'],
-            [r'(.*) lookup plugin', 'lib/ansible/plugins/lookup'],
-            [r'(.*) lookup', 'lib/ansible/plugins/lookup'],
-            [r'(.*) callback plugin', 'lib/ansible/plugins/callback'],
-            [r'(.*)\.py callback', 'lib/ansible/plugins/callback'],
-            [r'callback plugin (.*)', 'lib/ansible/plugins/callback'],
-            [r'(.*) stdout callback', 'lib/ansible/plugins/callback'],
-            [r'stdout callback (.*)', 'lib/ansible/plugins/callback'],
-            [r'stdout_callback (.*)', 'lib/ansible/plugins/callback'],
-            [r'(.*) callback plugin', 'lib/ansible/plugins/callback'],
-            [r'(.*) connection plugin', 'lib/ansible/plugins/connection'],
-            [r'(.*) connection type', 'lib/ansible/plugins/connection'],
-            [r'(.*) connection', 'lib/ansible/plugins/connection'],
-            [r'(.*) transport', 'lib/ansible/plugins/connection'],
-            [r'connection=(.*)', 'lib/ansible/plugins/connection'],
-            [r'connection: (.*)', 'lib/ansible/plugins/connection'],
-            [r'connection (.*)', 'lib/ansible/plugins/connection'],
-            [r'strategy (.*)', 'lib/ansible/plugins/strategy'],
-            [r'(.*) strategy plugin', 'lib/ansible/plugins/strategy'],
-            [r'(.*) module util', 'lib/ansible/module_utils'],
-            [r'ansible-galaxy (.*)', 'lib/ansible/galaxy'],
-            [r'ansible-playbook (.*)', 'lib/ansible/playbook'],
-            [r'ansible/module_utils/(.*)', 'lib/ansible/module_utils'],
-            [r'module_utils/(.*)', 'lib/ansible/module_utils'],
-            [r'lib/ansible/module_utils/(.*)', 'lib/ansible/module_utils'],
-            [r'(\S+) documentation fragment', 'lib/ansible/utils/module_docs_fragments'],
-        ]
-
         body = self.clean_body(body)
 
         matches = []
 
-        for pattern in patterns:
-            mobj = re.match(pattern[0], body, re.M | re.I)
+        for idx, mobj in REGEX_GENERIC.matches(body):
+            dirname = REGEX_GENERIC_DIRS[idx]
+            logging.debug('pattern hit: %s' % [REGEX_GENERIC.patterns[idx].pattern, dirname])
+            fname = mobj.group(1)
+            fname = fname.lower()
 
-            if mobj:
-                logging.debug(f'pattern hit: {pattern}')
-                fname = mobj.group(1)
-                fname = fname.lower()
+            fpath = os.path.join(dirname, fname)
 
-                fpath = os.path.join(pattern[1], fname)
-
-                if fpath in self.gitrepo.files:
-                    matches.append(fpath)
-                elif os.path.join(pattern[1], fname + '.py') in self.gitrepo.files:
-                    fname = os.path.join(pattern[1], fname + '.py')
-                    matches.append(fname)
-                else:
-                    # fallback to the directory
-                    matches.append(pattern[1])
+            if self.gitrepo.exists(fpath):
+                matches.append(fpath)
+            elif self.gitrepo.exists(os.path.join(dirname, fname + '.py')):
+                fname = os.path.join(dirname, fname + '.py')
+                matches.append(fname)
+            else:
+                # fallback to the directory
+                matches.append(dirname)
 
         return matches
 
@@ -1007,46 +1424,48 @@ class AnsibleComponentMatcher:
                 else:
                     return [mmatch['repo_filename']]
 
-        if body in self.gitrepo.files:
+        files = self.gitrepo.files
+        if self.gitrepo.files_version != self.FILEPATH_INDEX_VERSION:
+            self.FILEPATH_INDEX = FilepathIndex(files)
+            self.FILEPATH_INDEX_VERSION = self.gitrepo.files_version
+        index = self.FILEPATH_INDEX
+
+        if body in index.names:
             matches = [body]
         else:
-            for fn in self.gitrepo.files:
-
-                # limit the search set if a context is given
-                if context is not None and not fn.startswith(context):
-                    continue
-
-                if fn.endswith((body, body + '.py', body + '.ps1')):
-                    # ios_config.py -> test_ios_config.py vs. ios_config.py
-                    bn1 = os.path.basename(body)
-                    bn2 = os.path.basename(fn)
-                    if bn2.startswith(bn1):
-                        matches = [fn]
-                        break
-
-                if partial:
-
-                    # netapp_e_storagepool storage module
-                    # lib/ansible/modules/storage/netapp/netapp_e_storagepool.py
-
-                    # if all subpaths are in this filepath, it is a match
-                    bp_total = 0
-                    fn_paths = fn.split('/')
-                    fn_paths.append(fn_paths[-1].replace('.py', '').replace('.ps1', ''))
-
-                    for bp in body_paths:
-                        if bp in fn_paths:
-                            bp_total += 1
-
-                    if bp_total == len(body_paths):
-                        matches = [fn]
-                        break
-
-                    elif bp_total > 1:
-
-                        if (float(bp_total) / float(len(body_paths))) >= (2.0 / 3.0):
-                            if fn not in matches:
-                                matches.append(fn)
+            # the first file, in repo order, that is a suffix hit or contains
+            # every subpath ends the search like a scan would
+            bn1 = os.path.basename(body)
+            hits = []
+            for suffix in (body, body + '.py', body + '.ps1'):
+                hits.extend(
+                    x for x in index.endswith(suffix)
+                    if os.path.basename(index.files[x]).startswith(bn1)
+                )
+
+            counts = Counter()
+            if partial:
+                # netapp_e_storagepool storage module
+                # lib/ansible/modules/storage/netapp/netapp_e_storagepool.py
+                counts = index.segment_counts(body_paths)
+                hits.extend(x for x, total in counts.items() if total == len(body_paths))
+
+            # limit the search set if a context is given
+            if context is not None:
+                hits = [x for x in hits if index.files[x].startswith(context)]
+
+            if hits:
+                matches = [index.files[min(hits)]]
+            else:
+                # some of the subpaths are in these filepaths
+                for idx in sorted(counts):
+                    fn = index.files[idx]
+                    if context is not None and not fn.startswith(context):
+                        continue
+                    bp_total = counts[idx]
+                    if bp_total > 1 and (float(bp_total) / float(len(body_paths))) >= (2.0 / 3.0):
+                        if fn not in matches:
+                            matches.append(fn)
 
         if matches:
             tr = []
@@ -1116,13 +1535,10 @@ class AnsibleComponentMatcher:
 
     def _filenames_to_keys(self, filenames):
         '''Match filenames to the keys in botmeta'''
+        index = get_botmeta_index(self.botmeta)
         ckeys = set()
         for filen in filenames:
-            if filen in self.botmeta['files']:
-                ckeys.add(filen)
-            for key in self.botmeta['files'].keys():
-                if filen.startswith(key):
-                    ckeys.add(key)
+            ckeys.update(index.ancestors(filen))
         return list(ckeys)
 
     def get_labels_for_files(self, files):
@@ -1204,7 +1620,7 @@ class AnsibleComponentMatcher:
         support_levels = {}
 
         for entry in botmeta_entries:
-            fdata = self.botmeta['files'][entry].copy()
+            fdata = self.botmeta['files'][entry]
 
             if 'authors' in fdata:
                 meta['notify'] += fdata['authors']
@@ -1246,7 +1662,7 @@ class AnsibleComponentMatcher:
         for idx, x in enumerate(paths):
             thispath = '/'.join(paths[:(0-idx)])
             if thispath in self.botmeta['files']:
-                fdata = self.botmeta['files'][thispath].copy()
+                fdata = self.botmeta['files'][thispath]
                 if 'support' in fdata:
                     if isinstance(fdata['support'], list):
                         support_levels[thispath] = fdata['support'][0]
@@ -1362,21 +1778,19 @@ class AnsibleComponentMatcher:
             if isinstance(v, list):
                 meta[k] = sorted(set(v))
 
-        def get_prefix_paths(repo_filename, files):
-            """Emit all prefix paths matching the given file list."""
+        def get_prefix_paths(repo_filename, index):
+            """Emit all prefix paths matching the indexed keys, the longest first."""
             if not repo_filename:
                 return
 
-            prefix_paths = make_prefixes(repo_filename)
-
-            for prefix_path in prefix_paths:
-                if prefix_path in files:
+            for prefix_path in reversed(index.ancestors(repo_filename)):
+                if prefix_path:
                     logging.debug(f'found botmeta prefix: {prefix_path}')
                     yield prefix_path
 
         # walk up the botmeta tree looking for meta to include
         for this_prefix in get_prefix_paths(
-            meta.get('repo_filename'), self.botmeta['files'],
+            meta.get('repo_filename'), get_botmeta_index(self.botmeta),
         ):
 
             this_ignore = (
@@ -1493,31 +1907,23 @@ class AnsibleComponentMatcher:
         else:
             candidates = [pattern, '_' + pattern, noext, '_' + noext]
 
-        for k, v in self.MODULES.items():
-            if v['name'] in candidates:
-                logging.debug('match {} on name: {}'.format(k, v['name']))
-                matches = [v]
-                break
+        match = self.MODULE_INDEX.by_name(candidates)
+        if match is not None:
+            logging.debug('match on name: {}'.format(match['name']))
+            matches = [match]
 
         if not matches:
             # search by key ... aka the filepath
-            for k, v in self.MODULES.items():
-                if k == pattern:
-                    logging.debug(f'match {k} on key: {k}')
-                    matches = [v]
-                    break
+            match = self.MODULE_INDEX.by_key(pattern)
+            if match is not None:
+                logging.debug(f'match {pattern} on key: {pattern}')
+                matches = [match]
 
         # spellcheck
         if not exact and not matches and '/' not in pattern:
             _pattern = pattern
             if not isinstance(_pattern, str):
                 _pattern = to_text(_pattern)
-            for k, v in self.MODULES.items():
-                vname = v['name']
-                if not isinstance(vname, str):
-                    vname = to_text(vname)
-                close_ratio = difflib.SequenceMatcher(None, vname, _pattern).quick_ratio()
-                if close_ratio > .9:
-                    matches.append(self.MODULES[k])
+            matches = self.MODULE_INDEX.close_matches(_pattern)
 
         return matches
@@ -1,6 +1,7 @@
 import logging
 import operator
 import re
+from concurrent.futures import ProcessPoolExecutor
 from string import Template
 
 import yaml
@@ -444,23 +445,34 @@ class ModuleExtractor:
 
     def get_module_authors(self):
         """Grep the authors out of the module docstrings"""
+        return self.resolve_authors(self.get_author_record(), self.email_cache)
+
+    def get_author_record(self):
+        """The logins and emails in the docstring authors, the emails are not resolved"""
 
         # 2019-02-15
+        logins = set()
+        emails = set()
         if 'author' in self.docs or 'authors' in self.docs:
             _authors = self.docs.get('author') or self.docs.get('authors')
             if _authors is None:
-                return []
+                _authors = []
             if not isinstance(_authors, list):
                 _authors = [_authors]
-            logins = set()
             for author in _authors:
-                _logins = self.extract_github_id(author)
-                if _logins:
-                    logins = logins.union(_logins)
-            return list(logins)
-
-        else:
-            return []
+                logins.update(self.extract_github_logins(author))
+                emails.update(self.extract_emails(author))
+        return {'logins': sorted(logins), 'emails': sorted(emails)}
+
+    @staticmethod
+    def resolve_authors(record, email_cache):
+        """Map the emails of an author record to logins and add them"""
+        logins = set(record['logins'])
+        for email in record['emails']:
+            github_id = email_cache.get(email)
+            if github_id:
+                logins.add(github_id)
+        return list(logins)
 
     def extract_github_id(self, author):
         """Extract a set of github login(s) from a string."""
@@ -469,6 +481,16 @@ class ModuleExtractor:
         if author is None:
             return []
 
+        record = {
+            'logins': self.extract_github_logins(author),
+            'emails': self.extract_emails(author),
+        }
+        return self.resolve_authors(record, self.email_cache)
+
+    @staticmethod
+    def extract_github_logins(author):
+        """The github logins written out in an author string"""
+
         authors = set()
 
         if author is None:
@@ -490,13 +512,35 @@ class ModuleExtractor:
             author = author[idx+1:]
             authors.add(author.replace(')', ''))
 
-        # search for emails
-        for email in re.findall(r'[<(]([^@]+@[^)>]+)[)>]', author):
-            github_id = self.email_cache.get(email)
-            if github_id:
-                authors.add(github_id)
+        return authors
+
+    @staticmethod
+    def extract_emails(author):
+        """The emails in an author string"""
+        if author is None:
+            return set()
+        return set(re.findall(r'[<(]([^@]+@[^)>]+)[)>]', author))
+
+
+def _extract_author_record(filepath):
+    return ModuleExtractor(filepath).get_author_record()
+
+
+def extract_author_records(filepaths, workers=None):
+    """The author records of many module files, parsed across a process pool
+
+    Returns a list in the order of filepaths. The docstrings are parsed in
+    process when there are few files or a single worker.
+    """
+    filepaths = list(filepaths)
+    workers = C.DEFAULT_EXTRACT_WORKERS if workers is None else workers
+    workers = min(workers, len(filepaths))
+    if workers <= 1:
+        return [_extract_author_record(x) for x in filepaths]
 
-        return list(authors)
+    chunksize = max(1, len(filepaths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_extract_author_record, filepaths, chunksize=chunksize))
 
 
 def get_template_data(iw):
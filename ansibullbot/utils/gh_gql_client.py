@@ -3,12 +3,18 @@ import logging
 import time
 
 from collections import defaultdict
+from datetime import datetime
+from datetime import timezone
 from operator import itemgetter
 from string import Template
 
 import requests
 
+import ansibullbot.constants as C
+
 from ansibullbot._text_compat import to_bytes, to_text
+from ansibullbot.decorators.github import ADB, ADB_LOCK
+from ansibullbot.utils.rate_scheduler import SCHEDULER
 from ansibullbot.utils.receiver_client import post_to_receiver
 
 
@@ -25,6 +31,7 @@ QUERY_TEAM_MEMBERS_TEMPLATE = """
         }
       }
     }
+    $ratelimit
 }
 """
 
@@ -57,6 +64,7 @@ QUERY_TEMPLATE = """
             }
         }
     }
+    $ratelimit
 }
 """
 
@@ -67,6 +75,7 @@ QUERY_TEMPLATE_SINGLE_NODE = """
             $fields
         }
     }
+    $ratelimit
 }
 """
 
@@ -95,26 +104,359 @@ query {
       }
     }
   }
+  $ratelimit
+}
+"""
+
+# asked for next to every query so the point cost can be budgeted
+QUERY_RATE_LIMIT = """
+rateLimit {
+    limit
+    cost
+    remaining
+    resetAt
+}
+"""
+
+# the timeline items the triager reads, see IssueWrapper._parse_events
+QUERY_TIMELINE_FIELDS = """
+timelineItems(first: 100, itemTypes: [ISSUE_COMMENT, LABELED_EVENT, UNLABELED_EVENT, ASSIGNED_EVENT, REFERENCED_EVENT, CROSS_REFERENCED_EVENT, CLOSED_EVENT, REOPENED_EVENT, SUBSCRIBED_EVENT, MENTIONED_EVENT, RENAMED_TITLE_EVENT]) {
+    pageInfo {
+        hasNextPage
+    }
+    nodes {
+        __typename
+        ... on Node { id }
+        ... on IssueComment { databaseId createdAt author { login } body }
+        ... on LabeledEvent { createdAt actor { login } label { name } }
+        ... on UnlabeledEvent { createdAt actor { login } label { name } }
+        ... on AssignedEvent { createdAt actor { login } assignee { ... on User { login } } }
+        ... on ReferencedEvent { createdAt actor { login } commit { oid } }
+        ... on CrossReferencedEvent { createdAt actor { login } source { ... on Issue { number url } ... on PullRequest { number url } } }
+        ... on ClosedEvent { createdAt actor { login } }
+        ... on ReopenedEvent { createdAt actor { login } }
+        ... on SubscribedEvent { createdAt actor { login } }
+        ... on MentionedEvent { createdAt actor { login } }
+        ... on RenamedTitleEvent { createdAt actor { login } }
+    }
+}
+"""
+
+QUERY_REVIEW_FIELDS = """
+reviews(first: 100) {
+    pageInfo {
+        hasNextPage
+    }
+    nodes {
+        id
+        databaseId
+        author { login }
+        state
+        submittedAt
+        body
+        commit { oid }
+    }
 }
 """
 
+# what the rest api issue has that the triager reads
+QUERY_ISSUE_FIELDS = """
+databaseId
+id
+url
+title
+body
+state
+createdAt
+closedAt
+author { __typename login }
+labels(first: 100) { nodes { name color } }
+assignees(first: 100) { nodes { login } }
+milestone { number title }
+"""
+
+QUERY_FILE_FIELDS = """
+files(first: 100) {
+    pageInfo {
+        hasNextPage
+    }
+    nodes {
+        path
+        additions
+        deletions
+        changeType
+    }
+}
+"""
+
+QUERY_COMMIT_FIELDS = """
+commits(first: 100) {
+    pageInfo {
+        hasNextPage
+    }
+    nodes {
+        commit {
+            oid
+            url
+            message
+            author { name email date user { login } }
+            committer { name email date user { login } }
+            parents(first: 2) { nodes { oid } }
+        }
+    }
+}
+"""
+
+QUERY_TEMPLATE_ISSUE_NODE = """
+    $alias: issueOrPullRequest(number: $number) {
+        ... on Issue {
+            number
+            updatedAt
+            $issue
+            $timeline
+        }
+        ... on PullRequest {
+            number
+            updatedAt
+            $issue
+            $timeline
+            $reviews
+            $files
+            $commits
+        }
+    }
+"""
+
+QUERY_TEMPLATE_ISSUE_NODES = """
+{
+    repository(owner:"$owner", name:"$repo") {
+        $nodes
+    }
+    $ratelimit
+}
+"""
+
+TIMELINE_EVENTS = {
+    'IssueComment': 'commented',
+    'LabeledEvent': 'labeled',
+    'UnlabeledEvent': 'unlabeled',
+    'AssignedEvent': 'assigned',
+    'ReferencedEvent': 'referenced',
+    'CrossReferencedEvent': 'cross-referenced',
+    'ClosedEvent': 'closed',
+    'ReopenedEvent': 'reopened',
+    'SubscribedEvent': 'subscribed',
+    'MentionedEvent': 'mentioned',
+    'RenamedTitleEvent': 'renamed',
+}
+
+
+def _login(actor):
+    # deleted users come back as null
+    return {'login': actor['login'] if actor else None}
+
+
+def timeline_item_to_event(item):
+    """Convert a graphql timeline item into the rest api timeline format"""
+    event = {
+        'event': TIMELINE_EVENTS[item['__typename']],
+        'node_id': item['id'],
+        'created_at': item['createdAt'],
+    }
+
+    if item['__typename'] == 'IssueComment':
+        # comment ids are used for deleting comments through the rest api
+        event['id'] = item['databaseId']
+        event['actor'] = _login(item['author'])
+        event['body'] = item['body']
+    else:
+        event['actor'] = _login(item['actor'])
+
+    if 'label' in item:
+        event['label'] = {'name': item['label']['name']}
+    elif item['__typename'] == 'AssignedEvent':
+        event['assignee'] = _login(item['assignee'])
+    elif item['__typename'] == 'ReferencedEvent':
+        event['commit_id'] = item['commit']['oid'] if item['commit'] else None
+    elif item['__typename'] == 'CrossReferencedEvent':
+        source = item['source'] or {}
+        event['source'] = {'issue': {'number': source.get('number'), 'html_url': source.get('url')}}
+
+    return event
+
+
+def review_to_raw_data(review):
+    """Convert a graphql review into the rest api review format"""
+    return {
+        'id': review['databaseId'],
+        'node_id': review['id'],
+        'user': {'login': review['author']['login']} if review['author'] else None,
+        'state': review['state'],
+        'submitted_at': review['submittedAt'],
+        'body': review['body'],
+        'commit_id': review['commit']['oid'] if review['commit'] else None,
+    }
+
+
+# graphql changeType -> rest file status
+FILE_STATUSES = {
+    'ADDED': 'added',
+    'CHANGED': 'changed',
+    'COPIED': 'copied',
+    'DELETED': 'removed',
+    'MODIFIED': 'modified',
+    'RENAMED': 'renamed',
+}
+
+
+def node_to_issue_raw_data(node, api_url):
+    """Convert the issue fields of a graphql node into the rest api issue format"""
+    author = node['author']
+    if author and author['__typename'] == 'Bot':
+        user = {'login': '%s[bot]' % author['login'], 'type': 'Bot'}
+    elif author:
+        user = {'login': author['login'], 'type': 'User'}
+    else:
+        user = None
+
+    assignees = [{'login': x['login']} for x in node['assignees']['nodes']]
+    raw_data = {
+        'id': node['databaseId'],
+        'node_id': node['id'],
+        'number': node['number'],
+        'url': '%s/issues/%s' % (api_url, node['number']),
+        'html_url': node['url'],
+        'title': node['title'],
+        'body': node['body'],
+        'state': node['state'].lower(),
+        'user': user,
+        'labels': [{'name': x['name'], 'color': x['color']} for x in node['labels']['nodes']],
+        'assignee': assignees[0] if assignees else None,
+        'assignees': assignees,
+        'milestone': node['milestone'],
+        'created_at': node['createdAt'],
+        'updated_at': node['updatedAt'],
+        'closed_at': node['closedAt'],
+    }
+    if '/pull/' in node['url']:
+        raw_data['pull_request'] = {
+            'url': '%s/pulls/%s' % (api_url, node['number']),
+            'html_url': node['url'],
+        }
+    return raw_data
+
+
+def file_to_raw_data(pr_file):
+    """Convert a graphql pull request file into the rest api file format"""
+    return {
+        'filename': pr_file['path'],
+        'additions': pr_file['additions'],
+        'deletions': pr_file['deletions'],
+        'changes': pr_file['additions'] + pr_file['deletions'],
+        'status': FILE_STATUSES.get(pr_file['changeType'], pr_file['changeType'].lower()),
+    }
+
+
+def _git_actor(actor):
+    return {'name': actor['name'], 'email': actor['email'], 'date': actor['date']}
+
+
+def commit_to_raw_data(commit, api_url):
+    """Convert a graphql pull request commit into the rest api commit format"""
+    return {
+        'sha': commit['oid'],
+        'url': '%s/commits/%s' % (api_url, commit['oid']),
+        'html_url': commit['url'],
+        'commit': {
+            'message': commit['message'],
+            'author': _git_actor(commit['author']),
+            'committer': _git_actor(commit['committer']),
+        },
+        'author': _login(commit['author']['user']) if commit['author']['user'] else None,
+        'committer': _login(commit['committer']['user']) if commit['committer']['user'] else None,
+        'parents': [{'sha': x['oid']} for x in commit['parents']['nodes']],
+    }
+
 
 class GithubGraphQLClient:
     baseurl = 'https://api.github.com/graphql'
 
+    # summary pages shrink on timeouts and errors and grow back once they pass
+    MIN_PAGE_SIZE = 10
+    MAX_PAGE_SIZE = 100
+    PAGE_RETRIES = 5
+
+    # seconds before a request is given up on
+    TIMEOUT = 60
+
+    # a connection page costs a point per hundred nodes
+    summary_node_cost = 0.01
+
+    # measured points per hydrated node, refined from the rateLimit cost
+    node_cost = 1.0
+
     def __init__(self, token, server=None):
         if server:
             # this is for testing
             self.baseurl = server.rstrip('/') + '/graphql'
         self.token = token
+        self.ratelimit = None
         self.headers = {
             'Accept': 'application/json',
             'Authorization': 'Bearer %s' % self.token,
         }
 
+    @property
+    def api_url(self):
+        '''The rest api the graphql endpoint belongs to'''
+        return self.baseurl.rsplit('/graphql', 1)[0]
+
+    def _post(self, payload):
+        SCHEDULER.wait('graphql')
+        rr = requests.post(self.baseurl, headers=self.headers, data=json.dumps(payload), timeout=self.TIMEOUT)
+        SCHEDULER.update_from_headers(rr.headers, bucket='graphql')
+        self.ratelimit = self._record_rate_limit(rr)
+        return rr
+
+    def _record_rate_limit(self, rr):
+        '''Keep the point cost and budget github reports in the rateLimit block'''
+        try:
+            ratelimit = (rr.json().get('data') or {}).get('rateLimit')
+        except Exception:
+            return None
+        if not isinstance(ratelimit, dict):
+            return None
+
+        reset = None
+        if ratelimit.get('resetAt'):
+            reset = datetime.strptime(ratelimit['resetAt'], '%Y-%m-%dT%H:%M:%SZ')
+            reset = reset.replace(tzinfo=timezone.utc).timestamp()
+        SCHEDULER.update('graphql', ratelimit.get('limit'), ratelimit.get('remaining', 0), reset)
+
+        with ADB_LOCK:
+            ADB.set_graphql_rate_limit(token=self.token, ratelimit=ratelimit)
+
+        return ratelimit
+
+    def budget(self):
+        '''Points left in the graphql bucket above the reserve, None if unknown'''
+        remaining = SCHEDULER.remaining('graphql')
+        if remaining is None:
+            return None
+        return max(remaining - SCHEDULER.reserve, 0)
+
+    def fit_batch_size(self, batch_size, node_cost=None):
+        '''Shrink a batch to the number of nodes the remaining budget pays for'''
+        budget = self.budget()
+        if budget is None:
+            return batch_size
+        if node_cost is None:
+            node_cost = self.node_cost
+        return min(batch_size, int(budget / node_cost))
+
     def get_members(self, org, team):
-        query = Template(QUERY_TEAM_MEMBERS_TEMPLATE).substitute(login=org, slug=team)
-        resp = requests.post(self.baseurl, headers=self.headers, data=json.dumps({'query': query}))
+        query = Template(QUERY_TEAM_MEMBERS_TEMPLATE).substitute(login=org, slug=team, ratelimit=QUERY_RATE_LIMIT)
+        resp = self._post({'query': query})
         if not resp.ok:
             raise Exception
         data = resp.json()
@@ -187,9 +529,15 @@ class GithubGraphQLClient:
 
         return sorted(summaries, key=itemgetter('number'))
 
-    def get_summaries(self, owner, repo, otype='issues', last=None, first='first: 100', states='states: OPEN', paginate=True):
+    def get_summaries(self, owner, repo, otype='issues', last=None, first=None, states='states: OPEN', paginate=True):
         """Collect all the summary data for issues or pullreuests
 
+        Without first or last the page size adapts, it is halved when a page
+        times out or errors, grows back after pages that succeed and is capped
+        by what the remaining graphql budget pays for. A page
+        that keeps failing raises, partial summaries would mark the missing
+        numbers as closed.
+
         Args:
             owner     (str): the github namespace
             repo      (str): the github repository
@@ -205,24 +553,48 @@ class GithubGraphQLClient:
         after = None
         nodes = []
         pagecount = 0
+        page_size = self.MAX_PAGE_SIZE
+        failures = 0
         while True:
             logging.debug('%s/%s %s pagecount:%s nodecount: %s' %
                           (owner, repo, otype, pagecount, len(nodes)))
 
-            issueparams = ', '.join([x for x in [states, first, last, after] if x])
-            query = templ.substitute(owner=owner, repo=repo, object_type=otype, object_params=issueparams, fields=QUERY_FIELDS)
+            pageparam = first
+            if first is None and last is None:
+                # never ask for more nodes than the remaining points pay for
+                page_size = max(self.MIN_PAGE_SIZE, self.fit_batch_size(page_size, node_cost=self.summary_node_cost))
+                pageparam = 'first: %s' % page_size
+            issueparams = ', '.join([x for x in [states, pageparam, last, after] if x])
+            query = templ.substitute(owner=owner, repo=repo, object_type=otype, object_params=issueparams, fields=QUERY_FIELDS, ratelimit=QUERY_RATE_LIMIT)
 
             payload = {
                 'query': to_text(query, 'ascii', 'ignore').strip(),
                 'variables': '{}',
                 'operationName': None
             }
-            rr = requests.post(self.baseurl, headers=self.headers, data=json.dumps(payload))
-            if not rr.ok:
-                break
-            data = rr.json()
-            if not data:
-                break
+            data = None
+            try:
+                rr = self._post(payload)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                reason = repr(e)
+            else:
+                data = rr.json() if rr.ok else None
+                reason = rr.status_code
+                if data and data.get('errors'):
+                    reason = ', '.join([e.get('message', '') for e in data['errors']])
+            if not data or data.get('errors') or not data.get('data'):
+                failures += 1
+                if failures >= self.PAGE_RETRIES:
+                    raise requests.exceptions.RetryError(
+                        'failed to fetch %s/%s %s page %s: %s' % (owner, repo, otype, pagecount, reason)
+                    )
+                page_size = max(self.MIN_PAGE_SIZE, page_size // 2)
+                logging.warning('%s/%s %s page %s failed (%s), retrying with %s nodes' %
+                                (owner, repo, otype, pagecount, reason, page_size))
+                time.sleep(2)
+                continue
+            failures = 0
+            page_size = min(self.MAX_PAGE_SIZE, page_size * 2)
 
             # keep each edge/node/issue
             for edge in data.get('data', {}).get('repository', {}).get(otype, {}).get('edges', []):
@@ -257,7 +629,7 @@ class GithubGraphQLClient:
 
         template = Template(QUERY_TEMPLATE_SINGLE_NODE)
 
-        query = template.substitute(owner=owner, repo=repo, object_type=otype, object_params='number: %s' % number, fields=QUERY_FIELDS)
+        query = template.substitute(owner=owner, repo=repo, object_type=otype, object_params='number: %s' % number, fields=QUERY_FIELDS, ratelimit=QUERY_RATE_LIMIT)
 
         payload = {
             'query': to_bytes(query, 'ascii', 'ignore').strip(),
@@ -266,7 +638,7 @@ class GithubGraphQLClient:
         }
         payload['query'] = to_text(payload['query'], 'ascii')
 
-        rr = requests.post(self.baseurl, headers=self.headers, data=json.dumps(payload))
+        rr = self._post(payload)
         data = rr.json()
 
         node = data['data']['repository'][otype]
@@ -277,6 +649,115 @@ class GithubGraphQLClient:
 
         return node
 
+    def get_issue_nodes(self, repo_url, numbers, batch_size=None):
+        """Collect the issues with their timelines, reviews, files and commits
+
+        The numbers are aliased into queries of batch_size nodes each, fewer
+        when the graphql budget runs low. The issue is in the rest api format,
+        the other parts are None when they did not fit in a single page or the
+        budget, and numbers the budget did not cover are left out, so callers
+        know to fall back to the rest api.
+
+        Args:
+            repo_url    (str): username/repository
+            numbers    (list): issue and pull request numbers
+            batch_size  (int): number of nodes per query
+        """
+        owner = repo_url.split('/', 1)[0]
+        repo = repo_url.split('/', 1)[1]
+        if batch_size is None:
+            batch_size = C.DEFAULT_GRAPHQL_BATCH_SIZE
+
+        node_template = Template(QUERY_TEMPLATE_ISSUE_NODE)
+        templ = Template(QUERY_TEMPLATE_ISSUE_NODES)
+
+        nodes = {}
+        pending = list(numbers)
+        while pending:
+            # short on points, spend them on the issues and timelines and let
+            # the pull request parts go through rest
+            size = self.fit_batch_size(batch_size)
+            extras = {'reviews': QUERY_REVIEW_FIELDS, 'files': QUERY_FILE_FIELDS, 'commits': QUERY_COMMIT_FIELDS}
+            if size < min(batch_size, len(pending)):
+                size = self.fit_batch_size(batch_size, node_cost=self.node_cost / 2)
+                extras = {'reviews': '', 'files': '', 'commits': ''}
+            if size < 1:
+                logging.warning('%s/%s graphql budget spent, %s left for rest' % (owner, repo, len(pending)))
+                break
+
+            batch, pending = pending[:size], pending[size:]
+            logging.debug('%s/%s hydrating %s' % (owner, repo, batch))
+
+            aliases = [
+                node_template.substitute(
+                    alias='n%s' % number,
+                    number=number,
+                    issue=QUERY_ISSUE_FIELDS,
+                    timeline=QUERY_TIMELINE_FIELDS,
+                    **extras
+                )
+                for number in batch
+            ]
+            query = templ.substitute(owner=owner, repo=repo, nodes=''.join(aliases), ratelimit=QUERY_RATE_LIMIT)
+
+            payload = {
+                'query': to_text(query, 'ascii', 'ignore').strip(),
+                'variables': '{}',
+                'operationName': None
+            }
+            rr = self._post(payload)
+            if not rr.ok:
+                logging.warning('failed to hydrate %s/%s %s: %s' % (owner, repo, batch, rr.status_code))
+                continue
+            data = rr.json()
+
+            if extras['reviews'] and self.ratelimit and self.ratelimit.get('cost'):
+                self.node_cost = max(self.ratelimit['cost'] / len(batch), 0.01)
+
+            # missing numbers are reported as errors next to the found ones
+            repository = (data.get('data') or {}).get('repository') or {}
+            for node in repository.values():
+                if not node:
+                    continue
+                nodes[node['number']] = self.update_issue_node(node, api_url='%s/repos/%s' % (self.api_url, repo_url))
+
+        return nodes
+
+    def update_issue_node(self, node, api_url=None):
+        node['issue'] = None
+        if node.get('databaseId') is not None:
+            node['issue'] = node_to_issue_raw_data(node, api_url)
+
+        timeline = node.pop('timelineItems')
+        if timeline['pageInfo']['hasNextPage']:
+            node['timeline'] = None
+        else:
+            node['timeline'] = [timeline_item_to_event(x) for x in timeline['nodes']]
+
+        reviews = node.pop('reviews', None)
+        if reviews is None or reviews['pageInfo']['hasNextPage']:
+            node['reviews'] = None
+        else:
+            node['reviews'] = [review_to_raw_data(x) for x in reviews['nodes']]
+
+        # graphql has no patches, the docs_only check reads them for
+        # modified python files
+        files = node.pop('files', None)
+        if files is None or files['pageInfo']['hasNextPage'] or \
+                [x for x in files['nodes'] if x['changeType'] == 'MODIFIED' and x['path'].endswith('.py')]:
+            node['files'] = None
+        else:
+            node['files'] = [file_to_raw_data(x) for x in files['nodes']]
+
+        commits = node.pop('commits', None)
+        if commits is None or commits['pageInfo']['hasNextPage']:
+            node['commits'] = None
+        else:
+            node['commits'] = [commit_to_raw_data(x['commit'], api_url) for x in commits['nodes']]
+
+        node['updated_at'] = node.get('updatedAt')
+        return node
+
     def update_node(self, node, node_type, owner, repo):
         node['state'] = node['state'].lower()
         node['created_at'] = node.get('createdAt')
@@ -295,7 +776,7 @@ class GithubGraphQLClient:
         committers = defaultdict(set)
         emailmap = {}
 
-        query = template.substitute(owner=owner, repo=repo, branch=branch, path=filepath)
+        query = template.substitute(owner=owner, repo=repo, branch=branch, path=filepath, ratelimit=QUERY_RATE_LIMIT)
 
         payload = {
             'query': to_text(
@@ -342,7 +823,7 @@ class GithubGraphQLClient:
     def requests(self, payload):
         exc = None
         for i in range(5):
-            response = requests.post(self.baseurl, headers=self.headers, data=json.dumps(payload))
+            response = self._post(payload)
             try:
                 response.raise_for_status()
             except requests.exceptions.HTTPError as e:
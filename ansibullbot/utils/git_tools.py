@@ -1,25 +1,262 @@
+import hashlib
 import logging
 import os
+import re
 import shutil
+import subprocess
 import tarfile
 import tempfile
+import threading
+
+from bisect import bisect_left
+from collections import OrderedDict
 
 import requests
 
-from ansibullbot._text_compat import to_text
+import ansibullbot.constants as C
+
+from ansibullbot._text_compat import to_bytes, to_text
+from ansibullbot.utils.file_tools import read_gzip_json_file, write_gzip_json_file
 from ansibullbot.utils.systemtools import run_command
 
 
+def git_blob_id(data):
+    '''The id git gives a blob of data'''
+    data = to_bytes(data)
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+class FileIndex:
+    '''The files of a checkout as a sorted list and a set
+
+    Membership is a set lookup, the files under a prefix are one bisected
+    range of the sorted list and the files with a suffix one range of the
+    sorted reversed paths, built on first use.
+    '''
+
+    def __init__(self, files):
+        self.files = sorted(set(files))
+        self.names = frozenset(self.files)
+        self._rpaths = None
+
+    def __contains__(self, filename):
+        return filename in self.names
+
+    def startswith(self, prefix):
+        '''The files starting with prefix, in order'''
+        lo = bisect_left(self.files, prefix)
+        hi = lo
+        while hi < len(self.files) and self.files[hi].startswith(prefix):
+            hi += 1
+        return self.files[lo:hi]
+
+    def endswith(self, suffix):
+        '''The files ending with suffix'''
+        if self._rpaths is None:
+            self._rpaths = sorted(x[::-1] for x in self.files)
+        rsuffix = suffix[::-1]
+        idx = bisect_left(self._rpaths, rsuffix)
+        matches = []
+        while idx < len(self._rpaths) and self._rpaths[idx].startswith(rsuffix):
+            matches.append(self._rpaths[idx][::-1])
+            idx += 1
+        return matches
+
+
+class GitObjectStore:
+    '''Git objects read through long running git cat-file processes
+
+    A git cat-file --batch serves the object contents and a --batch-check
+    resolves names to object ids, both line by line over their pipes. The
+    objects of names that can not change (a full sha, optionally followed
+    by ^, ~ or :path) are kept in an LRU cache in front of them. A forked
+    process starts its own readers instead of sharing the parent's pipes.
+    '''
+
+    CACHE_BYTES = 64 * 1024 * 1024
+
+    RE_FIXED_NAME = re.compile(r'^[0-9a-f]{40}([\^~:]|$)')
+
+    def __init__(self, checkoutdir):
+        self.checkoutdir = checkoutdir
+        self._procs = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+
+    def close(self):
+        if self._pid == os.getpid():
+            for proc in self._procs.values():
+                proc.stdin.close()
+                proc.stdout.close()
+                proc.wait()
+        self._procs = {}
+
+    def __del__(self):
+        self.close()
+
+    def _ask(self, mode, name):
+        '''Send a name to cat-file --<mode>, returns the parts of the reply header and the process'''
+        if self._pid != os.getpid():
+            self._procs = {}
+            self._pid = os.getpid()
+        proc = self._procs.get(mode)
+        if proc is None or proc.poll() is not None:
+            proc = self._procs[mode] = subprocess.Popen(
+                ['git', 'cat-file', '--%s' % mode],
+                cwd=self.checkoutdir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        proc.stdin.write(to_bytes(name) + b'\n')
+        proc.stdin.flush()
+        parts = proc.stdout.readline().split()
+        # <sha> <type> <size>, or <name> missing|ambiguous
+        if len(parts) != 3 or not parts[2].isdigit():
+            return None, proc
+        return parts, proc
+
+    def info(self, name):
+        '''The (sha, type, size) of an object, None if there is no such object'''
+        with self._lock:
+            parts, proc = self._ask('batch-check', name)
+        if parts is None:
+            return None
+        return to_text(parts[0]), to_text(parts[1]), int(parts[2])
+
+    def read(self, name):
+        '''The (type, content) of an object, None if there is no such object'''
+        fixed = self.RE_FIXED_NAME.match(name) is not None
+        with self._lock:
+            if fixed and name in self._cache:
+                self._cache.move_to_end(name)
+                return self._cache[name]
+
+            parts, proc = self._ask('batch', name)
+            if parts is None:
+                return None
+            data = proc.stdout.read(int(parts[2]))
+            proc.stdout.read(1)
+            obj = (to_text(parts[1]), data)
+
+            if fixed and len(data) < self.CACHE_BYTES:
+                self._cache[name] = obj
+                self._cache_bytes += len(data)
+                while self._cache_bytes > self.CACHE_BYTES:
+                    self._cache_bytes -= len(self._cache.popitem(last=False)[1][1])
+            return obj
+
+    def blob(self, name):
+        obj = self.read(name)
+        if obj is None or obj[0] != 'blob':
+            return None
+        return obj[1]
+
+    def tree(self, name):
+        '''The (mode, name, sha) entries of a tree, None if it is not one'''
+        obj = self.read(name)
+        if obj is None or obj[0] != 'tree':
+            return None
+        data = obj[1]
+        entries = []
+        idx = 0
+        while idx < len(data):
+            space = data.index(b' ', idx)
+            nul = data.index(b'\0', space)
+            entries.append((to_text(data[idx:space]), to_text(data[space + 1:nul]), data[nul + 1:nul + 21].hex()))
+            idx = nul + 21
+        return entries
+
+    def walk(self, sha, prefix=''):
+        '''Yield the path, mode and sha of everything but the trees under a tree, like ls-tree -r'''
+        for mode, name, esha in self.tree(sha) or []:
+            if mode == '40000':
+                yield from self.walk(esha, prefix + name + '/')
+            else:
+                yield prefix + name, mode, esha
+
+    def commit(self, name):
+        '''The tree, parents, author and committer of a commit, None if it is not one'''
+        info = self.info(name)
+        if info is None or info[1] != 'commit':
+            return None
+        obj = self.read(info[0])
+        headers, _, message = to_text(obj[1]).partition('\n\n')
+        commit = {'sha': info[0], 'tree': None, 'parents': [], 'author': None, 'committer': None, 'message': message}
+        for line in headers.split('\n'):
+            key, _, value = line.partition(' ')
+            if key == 'parent':
+                commit['parents'].append(value)
+            elif key in ('tree', 'author', 'committer'):
+                commit[key] = value
+        return commit
+
+    def changed_files(self, name):
+        '''The paths a commit changed like git show --name-only, an exact rename lists the new path'''
+        commit = self.commit(name)
+        if commit is None:
+            return []
+        if not commit['parents']:
+            return [x[0] for x in self.walk(commit['tree'])]
+
+        changed = None
+        for parent in commit['parents']:
+            changes = self._diff_trees(self.commit(parent)['tree'], commit['tree'])
+            added = {x[1] for x in changes.values() if x[0] is None}
+            paths = {k for k, v in changes.items() if v[1] is not None or v[0] not in added}
+            # a merge lists what differs from every parent
+            changed = paths if changed is None else changed & paths
+        return sorted(changed)
+
+    def _diff_trees(self, old, new, prefix=''):
+        '''Map the paths that differ between two trees to their old and new (mode, sha)'''
+        oentries = {x[1]: x for x in (self.tree(old) if old else None) or []}
+        nentries = {x[1]: x for x in (self.tree(new) if new else None) or []}
+        changes = {}
+        for name in set(oentries) | set(nentries):
+            oentry = oentries.get(name)
+            nentry = nentries.get(name)
+            if oentry == nentry:
+                continue
+            path = prefix + name
+            osub = oentry[2] if oentry and oentry[0] == '40000' else None
+            nsub = nentry[2] if nentry and nentry[0] == '40000' else None
+            if osub or nsub:
+                changes.update(self._diff_trees(osub, nsub, path + '/'))
+            oblob = oentry[::2] if oentry and not osub else None
+            nblob = nentry[::2] if nentry and not nsub else None
+            if oblob or nblob:
+                changes[path] = (oblob, nblob)
+        return changes
+
+
 class GitRepoWrapper:
-    def __init__(self, cachedir, repo, commit=None, rebase=True, context=None):
+
+    CLONE_ARGS = {
+        'full': '',
+        'blobless': '--filter=blob:none',
+        'sparse': '--filter=blob:none --sparse',
+    }
+
+    def __init__(self, cachedir, repo, commit=None, rebase=True, context=None, clone_strategy=None):
         self._needs_rebase = rebase
         self.repo = repo
         self.commit = commit
         self.context = context
+        self.clone_strategy = clone_strategy or C.DEFAULT_CLONE_STRATEGY
+        if self.clone_strategy not in self.CLONE_ARGS:
+            raise ValueError('unknown clone strategy %s' % self.clone_strategy)
         self._lrev_map = {}
         self._is_git = True
         self.checkoutdir = None
-        self._files = []
+        self._index = None
+        self._context_files = None
+        self._module_files = None
+        self._objects = None
+        # bumped on every rebuild of the file index so indexes built from it can tell
+        self.files_version = 0
 
         # allow for null repos
         if self.repo:
@@ -38,7 +275,10 @@ class GitRepoWrapper:
             self.update(force=True)
 
     def exists(self, filename):
-        return filename in self.files
+        self.get_files()
+        if self.context:
+            return filename in self.context_files[1]
+        return filename in self._index
 
     @property
     def branch(self):
@@ -49,34 +289,69 @@ class GitRepoWrapper:
         so = to_text(so).strip()
         return so
 
+    @property
+    def head(self):
+        """Retrieves the commit hash of the checkout"""
+        if not self._is_git:
+            return None
+        cmd = "cd %s ; git rev-parse HEAD" % self.checkoutdir
+        logging.debug(cmd)
+        (rc, so, se) = run_command(cmd)
+        if rc != 0:
+            return None
+        return to_text(so).strip()
+
     @property
     def isgit(self):
         return not self.repo.endswith('.tar.gz')
 
+    @property
+    def objects(self):
+        '''The object reader of the checkout'''
+        if self._objects is None:
+            self._objects = GitObjectStore(self.checkoutdir)
+        return self._objects
+
     def isdir(self, filename):
         if self.context:
             checkfile = os.path.join(self.checkoutdir, self.context, filename)
         else:
             checkfile = os.path.join(self.checkoutdir, filename)
-        return os.path.isdir(checkfile)
+        if os.path.isdir(checkfile):
+            return True
+        # a sparse checkout leaves directories of the tree out of the worktree
+        self.get_files()
+        dirname = os.path.relpath(checkfile, self.checkoutdir)
+        return bool(self._index.startswith(dirname.rstrip('/') + '/'))
 
     @property
     def files(self):
         self.get_files()
         if self.context:
-            _files = self._files[:]
-            _files = [x for x in _files if x.startswith(self.context)]
+            return self.context_files[0]
+        return self._index.files
+
+    @property
+    def context_files(self):
+        '''The files under the context relative to it, as a list and a set'''
+        if self._context_files is None:
+            _files = self._index.startswith(self.context)
             _files = [x.replace(self.context.rstrip('/') + '/', '') for x in _files]
-            return _files
-        return self._files
+            self._context_files = (_files, frozenset(_files))
+        return self._context_files
 
     @property
     def module_files(self):
-        return [x for x in self._files if x.startswith('plugins/modules')]
+        self.get_files()
+        if self._module_files is None:
+            self._module_files = self._index.startswith('plugins/modules')
+        return self._module_files
 
     def create_checkout(self):
         """checkout ansible"""
         # cleanup
+        if self._objects is not None:
+            self._objects.close()
         if os.path.isdir(self.checkoutdir):
             shutil.rmtree(self.checkoutdir)
         if self.repo.endswith('.tar.gz'):
@@ -93,8 +368,8 @@ class GitRepoWrapper:
             tar.extractall(path=self.checkoutdir)
 
         else:
-            cmd = "git clone %s %s" \
-                % (self.repo, self.checkoutdir)
+            cmd = "git clone %s %s %s" \
+                % (self.CLONE_ARGS[self.clone_strategy], self.repo, self.checkoutdir)
             logging.debug(cmd)
             (rc, so, se) = run_command(cmd, env={'GIT_TERMINAL_PROMPT': 0, 'GIT_ASKPASS': '/bin/echo'})
             logging.debug('rc: %s' % rc)
@@ -102,6 +377,13 @@ class GitRepoWrapper:
 
             if rc != 0:
                 os.makedirs(self.checkoutdir)
+            elif self.clone_strategy == 'sparse':
+                cmd = "cd %s; git sparse-checkout set --cone %s" \
+                    % (self.checkoutdir, ' '.join(C.DEFAULT_SPARSE_PATHS))
+                logging.debug(cmd)
+                (rc, so, se) = run_command(cmd, env={'GIT_TERMINAL_PROMPT': 0, 'GIT_ASKPASS': '/bin/echo'})
+                if rc != 0:
+                    logging.error('sparse checkout failed: %s' % to_text(se))
 
     def update(self, force=False):
         '''Reload everything if there are new commits'''
@@ -131,6 +413,25 @@ class GitRepoWrapper:
                 self.create_checkout()
                 changed = True
 
+        elif self.clone_strategy != 'full':
+            # the upstream branch wins, there is nothing to rebase or to re-clone over
+            head = self.head
+            if head is None:
+                # not a usable checkout anymore
+                self.create_checkout()
+                return True
+
+            cmd = "cd %s; git fetch --prune origin && git reset -q --hard @{upstream}" % self.checkoutdir
+            logging.debug(cmd)
+            (rc, so, se) = run_command(cmd, env={'GIT_TERMINAL_PROMPT': 0, 'GIT_ASKPASS': '/bin/echo'})
+            logging.debug(to_text(so) + to_text(se))
+
+            if rc != 0:
+                # keep triaging with the checkout we have, a later update can catch up
+                logging.error('updating %s failed: %s' % (self.checkoutdir, to_text(se)))
+                return False
+            changed = self.head != head
+
         else:
             changed = False
 
@@ -165,40 +466,124 @@ class GitRepoWrapper:
         return changed
 
     def get_files(self, force=False):
-        '''Cache a list of filenames in the checkout'''
-        if not self._files or force:
-            for root, directories, filenames in os.walk(self.checkoutdir):
-                for filename in filenames:
-                    naive_fpath = os.path.realpath(os.path.join(root, filename))
-                    fpath = naive_fpath.replace(self.checkoutdir + u'/', u'')
-                    self._files.append(fpath)
+        '''Cache an index of the filenames in the checkout'''
+        if self._index is None or force:
+            files = self.list_files()
+            if files is None:
+                files = []
+                for root, directories, filenames in os.walk(self.checkoutdir):
+                    if '.git' in directories:
+                        directories.remove('.git')
+                    for filename in filenames:
+                        naive_fpath = os.path.realpath(os.path.join(root, filename))
+                        fpath = naive_fpath.replace(self.checkoutdir + u'/', u'')
+                        files.append(fpath)
+            self._index = FileIndex(files)
+            self._context_files = None
+            self._module_files = None
+            self.files_version += 1
+
+    def list_files(self):
+        '''The files of HEAD from git, persisted per commit, None outside of git'''
+        head = self.head
+        if head is None:
+            return None
+
+        ffile = os.path.join(self.checkoutdir, '.git', 'ansibullbot_files.json.gz')
+        if os.path.exists(ffile):
+            try:
+                data = read_gzip_json_file(ffile)
+            except Exception as e:
+                logging.error('failed to load %s: %s' % (ffile, e))
+            else:
+                if data.get('head') == head:
+                    return data['files']
+
+        cmd = 'cd %s; git ls-tree -r -z --name-only %s' % (self.checkoutdir, head)
+        logging.debug(cmd)
+        (rc, so, se) = run_command(cmd)
+        if rc != 0:
+            return None
+        files = [x for x in to_text(so).split('\0') if x]
+
+        write_gzip_json_file(ffile + '.tmp', {'head': head, 'files': files})
+        os.replace(ffile + '.tmp', ffile)
+        return files
 
     def get_files_by_commit(self, commit):
         if commit not in self.files_by_commit:
-            cmd = f'cd {self.checkoutdir}; git show --pretty="" --name-only {commit}'
-            (rc, so, se) = run_command(cmd)
-            filenames = [x.strip() for x in to_text(so).split('\n') if x.strip()]
+            filenames = self.objects.changed_files(commit)
             self.files_by_commit[commit] = filenames[:]
         else:
             filenames = self.files_by_commit[commit]
 
         return filenames
 
+    def update_email_index(self):
+        '''Bring the commits by email index up to HEAD, persisted per checkout
+
+        The index maps each author email to the hashes of its commits and the
+        number of those commits that touched each file. It is built from one
+        git log --name-only and later only reads the commits since the indexed
+        HEAD. A rename counts for both paths, detecting it would read the
+        contents of the files and a partial clone would download them.
+        '''
+        head = self.head
+        if head is None:
+            return {}
+
+        efile = os.path.join(self.checkoutdir, '.git', 'ansibullbot_emails.json.gz')
+        index = None
+        if os.path.exists(efile):
+            try:
+                index = read_gzip_json_file(efile)
+            except Exception as e:
+                logging.error('failed to load %s: %s' % (efile, e))
+        if index is not None and index.get('head') == head:
+            return index['emails']
+
+        revrange = head
+        if index is not None:
+            cmd = 'cd %s; git merge-base --is-ancestor %s %s' % (self.checkoutdir, index['head'], head)
+            (rc, so, se) = run_command(cmd)
+            if rc == 0:
+                revrange = '%s..%s' % (index['head'], head)
+            else:
+                # rewritten history, start over
+                index = None
+        if index is None:
+            index = {'head': None, 'emails': {}}
+
+        logging.info('update the commits by email index with %s' % revrange)
+        cmd = "cd %s; git -c core.quotepath=off log --name-only --no-renames --format='%%x01%%H;%%ae' %s" % \
+            (self.checkoutdir, revrange)
+        (rc, so, se) = run_command(cmd)
+        if rc != 0:
+            logging.error('git log failed: %s' % to_text(se))
+            return index['emails']
+
+        emails = index['emails']
+        files = None
+        for line in to_text(so).split('\n'):
+            if line.startswith('\x01'):
+                this_hash, this_email = line[1:].split(';', 1)
+                if this_email not in emails:
+                    emails[this_email] = {'commits': [], 'files': {}}
+                emails[this_email]['commits'].append(this_hash)
+                files = emails[this_email]['files']
+            elif line.strip() and files is not None:
+                fn = line.strip()
+                files[fn] = files.get(fn, 0) + 1
+        index['head'] = head
+
+        write_gzip_json_file(efile + '.tmp', index)
+        os.replace(efile + '.tmp', efile)
+        return emails
+
     def get_commits_by_email(self, email):
         '''Map an email(s) to a total num of commits and total by file'''
         if self.commits_by_email is None:
-            commits = {}
-            cmd = f'cd {self.checkoutdir}; git log --format="%h;%ae"'
-            (rc, so, se) = run_command(cmd)
-            lines = [x.strip() for x in to_text(so).split('\n') if x.strip()]
-            for line in lines:
-                parts = line.split(';')
-                this_hash = parts[0]
-                this_email = parts[1]
-                if this_email not in commits:
-                    commits[this_email] = set()
-                commits[this_email].add(this_hash)
-            self.commits_by_email = commits
+            self.commits_by_email = self.update_email_index()
 
         if not isinstance(email, (set, list)):
             emails = [email]
@@ -215,16 +600,10 @@ class GitRepoWrapper:
                 }
 
             if _email in self.commits_by_email:
-
                 email_map[_email]['commit_count'] = \
-                    len(self.commits_by_email[_email])
-
-                for _commit in self.commits_by_email[_email]:
-                    filenames = self.get_files_by_commit(_commit)
-                    for fn in filenames:
-                        if fn not in email_map[_email]['commit_count_byfile']:
-                            email_map[_email]['commit_count_byfile'][fn] = 0
-                        email_map[_email]['commit_count_byfile'][fn] += 1
+                    len(self.commits_by_email[_email]['commits'])
+                email_map[_email]['commit_count_byfile'] = \
+                    dict(self.commits_by_email[_email]['files'])
 
         return email_map
 
@@ -247,6 +626,11 @@ class GitRepoWrapper:
         if self.context:
             filepath = os.path.join(self.context, filepath)
 
+        # no need to search the history for a file in the checkout
+        self.get_files()
+        if filepath in self._index:
+            return True
+
         lrev = self.get_last_rev_for_file(filepath)
         if lrev:
             return True
@@ -260,42 +644,71 @@ class GitRepoWrapper:
                 data = f.read()
             return data
 
+        self.get_files()
+        if filepath in self._index:
+            # in the tree but not in a sparse worktree
+            data = self.objects.blob('HEAD:%s' % filepath)
+            if data is not None:
+                return to_text(data)
+
         if not follow:
             return None
 
         lrev = self.get_last_rev_for_file(filepath)
+        if not lrev:
+            return b''
 
         # https://stackoverflow.com/a/1395463
-        cmd = 'cd %s; git show %s^:%s' % (self.checkoutdir, lrev, filepath)
-        (rc, so, se) = run_command(cmd)
-        logging.info(cmd)
-        so = so.strip()
+        so = (self.objects.blob('%s^:%s' % (lrev, filepath)) or b'').strip()
         if so.decode('utf-8').endswith('.py'):
             newpath = os.path.dirname(filepath)
             newpath = os.path.join(newpath, so.decode('utf-8'))
-            lrev = self.get_last_rev_for_file(filepath)
 
-            cmd = 'cd %s; git show %s^:%s' % (self.checkoutdir, lrev, newpath)
-            logging.info(cmd)
-            (rc, so, se) = run_command(cmd)
-            so = so.strip()
+            so = (self.objects.blob('%s^:%s' % (lrev, newpath)) or b'').strip()
 
         return so
 
     def find(self, pattern):
-        if pattern in self._files:
+        self.get_files()
+        if pattern in self._index:
             return pattern
         matches = set()
-        for fn in self._files:
+        for fn in self._index.endswith(pattern):
             if self.context and self.context not in fn:
                 continue
-            if fn.endswith(pattern):
-                matches.add(fn)
+            matches.add(fn)
         return matches
 
-    def list_files_by_branch(self, branch):
-        cmd = "cd %s; git ls-tree -r --name-only %s" % (self.checkoutdir, branch)
-        logging.info(cmd)
+    def get_blob_ids(self, treeish='HEAD'):
+        '''Map the files of a tree to the ids of their content'''
+        if not self._is_git:
+            return {}
+        cmd = 'cd %s; git ls-tree -r -z %s' % (self.checkoutdir, treeish)
+        logging.debug(cmd)
         (rc, so, se) = run_command(cmd)
-        res = so.strip().decode('utf-8')
-        return res.splitlines()
+        if rc != 0:
+            return {}
+        blobs = {}
+        for entry in to_text(so).split('\0'):
+            if not entry:
+                continue
+            meta, path = entry.split('\t', 1)
+            mode, otype, sha = meta.split()
+            if otype == 'blob':
+                blobs[path] = sha
+        return blobs
+
+    def get_changed_files(self, old, new='HEAD'):
+        '''Paths added, modified or removed between two commits, None if git can not tell'''
+        cmd = 'cd %s; git diff --no-renames --name-only %s %s' % (self.checkoutdir, old, new)
+        logging.debug(cmd)
+        (rc, so, se) = run_command(cmd)
+        if rc != 0:
+            return None
+        return {x for x in to_text(so).splitlines() if x}
+
+    def list_files_by_branch(self, branch):
+        info = self.objects.info('%s^{tree}' % branch)
+        if info is None:
+            return []
+        return [x[0] for x in self.objects.walk(info[0])]
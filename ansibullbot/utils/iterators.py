@@ -1,23 +1,40 @@
 class RepoIssuesIterator:
 
-    def __init__(self, repo, numbers, issuecache=None):
+    def __init__(self, repo, numbers, issuecache=None, hydrate=None, batch_size=25):
         self.repo = repo
         self.numbers = numbers
         self.issuecache = {} if issuecache is None else issuecache
         self.i = 0
 
+        # bulk loads the graphql nodes for a batch of numbers
+        self.hydrate = hydrate
+        self.batch_size = batch_size
+        self.nodes = {}
+        self._hydrated = set()
+
     def __iter__(self):
         return self
 
+    def peek(self, count):
+        '''The numbers the next count iterations will return'''
+        return self.numbers[self.i:self.i + count]
+
     def __next__(self):
 
         if self.i > (len(self.numbers) - 1):
             raise StopIteration()
 
         thisnum = self.numbers[self.i]
+        if self.hydrate is not None and thisnum not in self._hydrated:
+            batch = self.peek(self.batch_size)
+            self._hydrated.update(batch)
+            self.nodes = self.hydrate(batch)
+
         self.i += 1
         if thisnum in self.issuecache:
             issue = self.issuecache[thisnum]
+        elif (self.nodes.get(thisnum) or {}).get('issue'):
+            issue = self.repo.load_issue_from_raw_data(self.nodes[thisnum]['issue'])
         else:
             issue = self.repo.get_issue(thisnum)
 
@@ -11,7 +11,9 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from ansibullbot._text_compat import to_text
-from ansibullbot.utils.extractors import ModuleExtractor
+from ansibullbot.parsers.botmetadata import get_botmeta_index
+from ansibullbot.utils.botmeta import MetaRecord
+from ansibullbot.utils.extractors import extract_author_records, ModuleExtractor
 from ansibullbot.utils.systemtools import run_command
 from ansibullbot.utils.timetools import strip_time_safely
 
@@ -108,6 +110,7 @@ class ModuleIndexer:
 
         matches = sorted(set(matches))
 
+        self.modules = {}
         self.populate_modules(matches)
 
         # custom fixes
@@ -159,6 +162,9 @@ class ModuleIndexer:
         logging.debug('set module maintainers')
         self.set_maintainers()
 
+        # the entries are done changing, keep them compact
+        self.modules = {k: MetaRecord(v) for k, v in self.modules.items()}
+
         return self.modules
 
     def populate_modules(self, matches):
@@ -213,72 +219,106 @@ class ModuleIndexer:
         self.modules['meta']['repo_filename'] = 'meta'
 
     def get_module_commits(self):
-        keys = self.modules.keys()
-        keys = sorted(keys)
-        for k in keys:
-            self.commits[k] = []
-            cpath = os.path.join(self.gitrepo.checkoutdir, k)
-            if not os.path.isfile(cpath):
+        '''The commits of each module, newest first'''
+        history = self.update_module_history()
+        for k in sorted(self.modules.keys()):
+            shas = history['files'].get(k, [])
+            self.commits[k] = [dict(history['commits'][x]) for x in reversed(shas)]
+
+    def update_module_history(self):
+        '''Bring the history index of the modules up to the checkout's HEAD
+
+        The index maps each module path to the commits that touched it, oldest
+        first and following renames like git log --follow, and each commit hash
+        to its author and date. It is built from one git log of the modules
+        directory and later only reads the commits since the indexed HEAD.
+        '''
+        hfile = os.path.join(self.scraper_cache, 'module_history.pickle')
+        history = None
+        if os.path.isfile(hfile):
+            with open(hfile, 'rb') as f:
+                history = pickle.load(f)
+
+        head = self.gitrepo.head
+        if head is None:
+            return {'head': None, 'commits': {}, 'files': {}}
+        if history is not None and history['head'] == head:
+            return history
+
+        revrange = head
+        if history is not None:
+            cmd = 'cd %s; git merge-base --is-ancestor %s %s' % (self.gitrepo.checkoutdir, history['head'], head)
+            (rc, so, se) = run_command(cmd)
+            if rc == 0:
+                revrange = '%s..%s' % (history['head'], head)
+            else:
+                # rewritten history, start over
+                history = None
+        if history is None:
+            history = {'head': None, 'commits': {}, 'files': {}}
+
+        # scoring an inexact rename reads both files, which a partial clone has to download
+        renames = '-M' if self.gitrepo.clone_strategy == 'full' else '-M100%'
+
+        logging.info('update the module history index with %s' % revrange)
+        cmd = "cd %s; git -c core.quotepath=off log --reverse --name-status %s --date=default " \
+            "--format='%%x01%%H%%x1f%%an%%x1f%%ae%%x1f%%ad' %s -- lib/ansible/modules" % \
+            (self.gitrepo.checkoutdir, renames, revrange)
+        (rc, so, se) = run_command(cmd)
+        if rc != 0:
+            logging.error('git log of the modules failed: %s' % to_text(se))
+            return history
+
+        self.read_module_history(history, to_text(so))
+        history['head'] = head
+
+        if not os.path.isdir(self.scraper_cache):
+            os.makedirs(self.scraper_cache)
+        with open(hfile + '.tmp', 'wb') as f:
+            pickle.dump(history, f)
+        os.replace(hfile + '.tmp', hfile)
+
+        return history
+
+    @staticmethod
+    def read_module_history(history, log):
+        '''Replay the output of git log --reverse --name-status into the history index'''
+        commit = None
+        for line in log.split('\n'):
+            if line.startswith('\x01'):
+                sha, name, email, date = line[1:].split('\x1f')
+                commit = {
+                    'name': None,
+                    'email': None,
+                    'login': None,
+                    'hash': sha,
+                    'date': None
+                }
+                if '@' in email:
+                    commit['email'] = email
+                    commit['name'] = ' '.join(name.split())
+                if commit['email'] and 'noreply.github.com' in commit['email']:
+                    commit['login'] = commit['email'].split('@')[0]
+
+                # Sat Jan 28 23:28:53 2017 -0800
+                dstr = ' '.join(date.split(' ')[:-1])
+                commit['date'] = strip_time_safely(to_text(dstr))
+                history['commits'][sha] = commit
                 continue
 
-            mtime = os.path.getmtime(cpath)
-            refresh = False
-            pfile = os.path.join(
-                self.scraper_cache,
-                k.replace('/', '_') + '.commits.pickle'
-            )
+            if not line.strip() or commit is None:
+                continue
 
-            if not os.path.isfile(pfile):
-                refresh = True
+            parts = line.split('\t')
+            if parts[0].startswith('R'):
+                # the renamed file keeps the history of its old path
+                shas = history['files'].pop(parts[1], [])
+                shas.append(commit['hash'])
+                history['files'][parts[2]] = shas
+            elif parts[0].startswith('D'):
+                history['files'].pop(parts[1], None)
             else:
-                print(pfile)
-                with open(pfile, 'rb') as f:
-                    pdata = pickle.load(f)
-                if pdata[0] == mtime:
-                    self.commits[k] = pdata[1]
-                else:
-                    refresh = True
-
-            if refresh:
-                logging.info('refresh commit cache for %s' % k)
-                cmd = 'cd %s; git log --follow %s' % (self.gitrepo.checkoutdir, k)
-                (rc, so, se) = run_command(cmd)
-                for line in to_text(so).split('\n'):
-                    if line.startswith('commit '):
-                        commit = {
-                            'name': None,
-                            'email': None,
-                            'login': None,
-                            'hash': line.split()[-1],
-                            'date': None
-                        }
-
-                    # Author: Matt Clay <matt@mystile.com>
-                    if line.startswith('Author: '):
-                        line = line.replace('Author: ', '')
-                        line = line.replace('<', '')
-                        line = line.replace('>', '')
-                        lparts = line.split()
-
-                        if '@' in lparts[-1]:
-                            commit['email'] = lparts[-1]
-                            commit['name'] = ' '.join(lparts[:-1])
-                        else:
-                            pass
-
-                        if commit['email'] and \
-                                'noreply.github.com' in commit['email']:
-                            commit['login'] = commit['email'].split('@')[0]
-
-                    # Date:   Sat Jan 28 23:28:53 2017 -0800
-                    if line.startswith('Date:'):
-                        dstr = line.split(':', 1)[1].strip()
-                        dstr = ' '.join(dstr.split(' ')[:-1])
-                        commit['date'] = strip_time_safely(to_text(dstr))
-                        self.commits[k].append(commit)
-
-                with open(pfile, 'wb') as f:
-                    pickle.dump((mtime, self.commits[k]), f)
+                history['files'].setdefault(parts[1], []).append(commit['hash'])
 
     def last_commit_for_file(self, filepath):
         if filepath in self.commits and 'hash' in self.commits[filepath][0]:
@@ -307,7 +347,7 @@ class ModuleIndexer:
         changed = False
         keys = sorted(self.modules.keys())
         for k in keys:
-            if k not in self.gitrepo.files:
+            if not self.gitrepo.exists(k):
                 self.committers[k] = {}
                 continue
 
@@ -379,11 +419,11 @@ class ModuleIndexer:
         '''Define the maintainers for each module'''
 
         # grep the authors:
-        for k, v in self.modules.items():
-            if v['filepath'] is None:
-                continue
-            mfile = os.path.join(self.gitrepo.checkoutdir, v['filepath'])
-            authors = ModuleExtractor(mfile, email_cache=self.emails_cache).get_module_authors()
+        keys = [k for k, v in self.modules.items() if v['filepath'] is not None]
+        mfiles = [os.path.join(self.gitrepo.checkoutdir, self.modules[k]['filepath']) for k in keys]
+        records = extract_author_records(mfiles)
+        for k, record in zip(keys, records):
+            authors = ModuleExtractor.resolve_authors(record, self.emails_cache)
             self.modules[k]['authors'] = authors
 
             # authors are maintainers by -default-
@@ -391,7 +431,7 @@ class ModuleIndexer:
             self.modules[k]['maintainers'] = \
                 sorted(set(self.modules[k]['maintainers']))
 
-        metadata = self.botmeta['files'].keys()
+        index = get_botmeta_index(self.botmeta)
         for k, v in self.modules.items():
             if k == 'meta':
                 continue
@@ -417,14 +457,7 @@ class ModuleIndexer:
 
             else:
                 # There isn't metadata in .github/BOTMETA.yml for this file
-                best_match = None
-                for mkey in metadata:
-                    if v['filepath'].startswith(mkey):
-                        if not best_match:
-                            best_match = mkey
-                            continue
-                        if len(mkey) > len(best_match):
-                            best_match = mkey
+                best_match = index.longest(v['filepath'])
                 if best_match:
                     self.modules[k]['maintainers_keys'] = [best_match]
                     for maintainer in self.botmeta['files'][best_match].get('maintainers', []):
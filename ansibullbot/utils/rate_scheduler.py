@@ -0,0 +1,176 @@
+import logging
+import multiprocessing
+import time
+import weakref
+
+from collections.abc import Mapping
+from multiprocessing.sharedctypes import RawArray
+
+from requests.structures import CaseInsensitiveDict
+
+import ansibullbot.constants as C
+
+
+# https://docs.github.com/en/rest/overview/resources-in-the-rest-api#rate-limiting
+BUCKETS = ('core', 'graphql', 'search')
+
+# per bucket slots in the shared array
+LIMIT, REMAINING, RESET, NEXT = range(4)
+SLOTS = 4
+
+
+class RateScheduler:
+    '''Pace api requests against github's rate limit buckets
+
+    Every response carries X-RateLimit-* headers which are fed back in here.
+    Callers take a token before each request and are told how long to wait,
+    once a bucket is below PACE_BELOW of its limit the remaining requests are
+    spread evenly until the reset instead of running dry and sleeping. The
+    state lives in shared memory so forked workers draw from the same buckets.
+    '''
+
+    PACE_BELOW = 0.5
+
+    def __init__(self, reserve=None):
+        self.reserve = C.DEFAULT_RATELIMIT_RESERVE if reserve is None else reserve
+        self._state = RawArray('d', len(BUCKETS) * SLOTS)
+        self._lock = multiprocessing.get_context('fork').Lock()
+        self._tracked = weakref.WeakSet()
+
+    def _slot(self, bucket):
+        return BUCKETS.index(bucket) * SLOTS
+
+    def known(self, bucket):
+        return self._state[self._slot(bucket) + LIMIT] > 0
+
+    def remaining(self, bucket):
+        if not self.known(bucket):
+            return None
+        return int(self._state[self._slot(bucket) + REMAINING])
+
+    def reset_time(self, bucket):
+        '''Seconds until the bucket resets, None if it was never seen'''
+        if not self.known(bucket):
+            return None
+        return max(self._state[self._slot(bucket) + RESET] - time.time(), 0)
+
+    def update(self, bucket, limit, remaining, reset):
+        if bucket not in BUCKETS or not limit or reset is None:
+            return
+        i = self._slot(bucket)
+        with self._lock:
+            # a slow response from the previous window must not undo a reset
+            if reset < self._state[i + RESET]:
+                return
+            # nor can one that was sent earlier in the same window
+            if reset == self._state[i + RESET]:
+                remaining = min(remaining, self._state[i + REMAINING])
+            self._state[i + LIMIT] = limit
+            self._state[i + REMAINING] = remaining
+            self._state[i + RESET] = reset
+
+    def update_from_headers(self, headers, bucket='core'):
+        if not isinstance(headers, Mapping) or 'X-RateLimit-Remaining' not in headers:
+            return
+        self.update(
+            headers.get('X-RateLimit-Resource', bucket),
+            int(headers.get('X-RateLimit-Limit', 0)),
+            int(headers['X-RateLimit-Remaining']),
+            float(headers.get('X-RateLimit-Reset', 0)),
+        )
+
+    def update_from_rate_limit(self, rawjson):
+        '''Seed the buckets from a /rate_limit response'''
+        for bucket, data in (rawjson or {}).get('resources', {}).items():
+            if bucket in BUCKETS:
+                self.update(bucket, data['limit'], data['remaining'], data['reset'])
+
+    def track(self, gh):
+        '''Pace every request PyGithub sends and read the limits it gets back'''
+        if gh is None or gh in self._tracked:
+            return
+        requester = gh._Github__requester
+        requester._Requester__connectionClass = paced_connection_class(
+            requester._Requester__connectionClass, self
+        )
+        # drop a connection made before the hook, the next request opens a paced one
+        requester._Requester__connection = None
+        self._tracked.add(gh)
+
+    def observe(self):
+        '''Pick up the limits PyGithub recorded from its last response
+
+        The Github.rate_limiting properties fetch /rate_limit when nothing
+        was recorded yet, so the requester's attributes are read instead.
+        '''
+        for gh in list(self._tracked):
+            try:
+                requester = gh._Github__requester
+                remaining, limit = requester.rate_limiting
+                if limit < 0:
+                    continue
+                self.update('core', limit, remaining, requester.rate_limiting_resettime)
+            except Exception as e:
+                logging.debug('unable to read the rate limit from %s: %s' % (gh, e))
+
+    def delay(self, bucket, now=None):
+        '''Take a token from the bucket and return the seconds to wait before using it'''
+        if now is None:
+            now = time.time()
+
+        i = self._slot(bucket)
+        with self._lock:
+            limit = self._state[i + LIMIT]
+            remaining = self._state[i + REMAINING]
+            reset = self._state[i + RESET]
+            start = max(now, self._state[i + NEXT])
+
+            if not limit:
+                return 0
+
+            if reset <= now:
+                # the window rolled over, the next response has the new numbers
+                remaining = limit
+                start = now
+                interval = 0
+            elif remaining - self.reserve <= 0:
+                # drained, nothing goes out until the reset
+                start = max(start, reset + 1)
+                interval = 0
+            elif remaining > limit * self.PACE_BELOW:
+                start = now
+                interval = 0
+            else:
+                interval = (reset - now) / (remaining - self.reserve)
+
+            self._state[i + REMAINING] = remaining - 1
+            self._state[i + NEXT] = start + interval
+
+        return max(start - now, 0)
+
+    def wait(self, bucket):
+        stime = self.delay(bucket)
+        if stime > 0:
+            logging.info('pacing %s requests: sleeping %.2fs' % (bucket, stime))
+            time.sleep(stime)
+
+
+def paced_connection_class(connection_class, scheduler):
+    '''Wrap a PyGithub connection class to take a token before each request'''
+    if getattr(connection_class, 'scheduler', None) is scheduler:
+        return connection_class
+
+    class PacedConnection(connection_class):
+        def getresponse(self):
+            # request() only stores the arguments, the request goes out here
+            bucket = 'search' if '/search/' in self.url else 'core'
+            scheduler.wait(bucket)
+            response = super().getresponse()
+            scheduler.update_from_headers(CaseInsensitiveDict(response.getheaders()), bucket=bucket)
+            return response
+
+    PacedConnection.scheduler = scheduler
+    return PacedConnection
+
+
+SCHEDULER = RateScheduler()
@@ -2,10 +2,13 @@ import json
 import logging
 import os
 
+from sqlalchemy import case
 from sqlalchemy import create_engine
 from sqlalchemy import Column
 from sqlalchemy import Integer
+from sqlalchemy import literal
 from sqlalchemy import String
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -42,6 +45,17 @@ class RateLimit(Base):
     query_counter = Column(Integer)
 
 
+class GraphqlRateLimit(Base):
+    __tablename__ = 'graphql_rate_limit'
+    token = Column(String, primary_key=True)
+    limit = Column(Integer)
+    remaining = Column(Integer)
+    reset_at = Column(String)
+    last_cost = Column(Integer)
+    total_cost = Column(Integer)
+    query_counter = Column(Integer)
+
+
 class GithubApiRequest(Base):
     __tablename__ = 'github_api_request'
     id = Column(Integer(), primary_key=True)
@@ -54,6 +68,33 @@ class GithubApiRequest(Base):
     token = Column(String)
 
 
+class WebhookEvent(Base):
+    __tablename__ = 'webhook_event'
+    repo = Column(String, primary_key=True)
+    number = Column(Integer, primary_key=True)
+    events = Column(String)
+    count = Column(Integer)
+    first_seen = Column(String)
+    last_seen = Column(String)
+
+
+class ComponentMatch(Base):
+    __tablename__ = 'component_match'
+    repo = Column(String, primary_key=True)
+    context = Column(String, primary_key=True)
+    title = Column(String, primary_key=True)
+    component = Column(String, primary_key=True)
+    filenames = Column(String)
+    strategies = Column(String)
+
+
+class ModuleAuthors(Base):
+    __tablename__ = 'module_authors'
+    blob = Column(String, primary_key=True)
+    logins = Column(String)
+    emails = Column(String)
+
+
 class AnsibullbotDatabase:
 
     '''A sqlite backed database to help with data caching [NOT CONFIG]'''
@@ -95,7 +136,11 @@ class AnsibullbotDatabase:
                 Email.metadata.create_all(self.engine)
                 Blame.metadata.create_all(self.engine)
                 RateLimit.metadata.create_all(self.engine)
+                GraphqlRateLimit.metadata.create_all(self.engine)
                 GithubApiRequest.metadata.create_all(self.engine)
+                WebhookEvent.metadata.create_all(self.engine)
+                ComponentMatch.metadata.create_all(self.engine)
+                ModuleAuthors.metadata.create_all(self.engine)
                 break
             except Exception as e:
                 retries += 1
@@ -250,3 +295,180 @@ class AnsibullbotDatabase:
         self.session.merge(rl)
         self.session.flush()
         self.session.commit()
+
+    def set_graphql_rate_limit(self, token=None, ratelimit=None):
+
+        '''Store the rateLimit block of a graphql response and add up its cost'''
+
+        if not ratelimit or not isinstance(ratelimit, dict):
+            return None
+
+        try:
+            rl = self.session.query(GraphqlRateLimit).filter(GraphqlRateLimit.token == token).first()
+            if rl is None:
+                rl = GraphqlRateLimit(token=token, total_cost=0, query_counter=0)
+            rl.limit = ratelimit.get('limit')
+            rl.remaining = ratelimit.get('remaining')
+            rl.reset_at = ratelimit.get('resetAt')
+            rl.last_cost = ratelimit.get('cost', 0)
+            rl.total_cost += rl.last_cost
+            rl.query_counter += 1
+            self.session.merge(rl)
+            self.session.flush()
+            self.session.commit()
+        except Exception as e:
+            logging.error('Failed to set graphql rate limit: %s', str(e))
+            self.session.rollback()
+            return None
+
+    def get_graphql_rate_limit(self, token=None):
+
+        '''Get the last graphql rate limit and the accumulated cost by token'''
+
+        try:
+            rl = self.session.query(GraphqlRateLimit).filter(GraphqlRateLimit.token == token).first()
+        except Exception as e:
+            logging.error(e)
+            return None
+
+        if rl is None:
+            return None
+
+        return {
+            'limit': rl.limit,
+            'remaining': rl.remaining,
+            'reset_at': rl.reset_at,
+            'last_cost': rl.last_cost,
+            'total_cost': rl.total_cost,
+            'query_counter': rl.query_counter,
+        }
+
+    def queue_webhook_event(self, repo, number, event, timestamp):
+
+        '''Record an event for repo+number, coalescing it with the queued ones'''
+
+        # a single upsert in its own session, the receiver queues from
+        # concurrent request threads while the triager reads and acks
+        listed = (literal(',') + WebhookEvent.events + ',').contains(',%s,' % event, autoescape=True)
+        stmt = insert(WebhookEvent).values(
+            repo=repo, number=number, events=event, count=1, first_seen=timestamp, last_seen=timestamp
+        ).on_conflict_do_update(
+            index_elements=[WebhookEvent.repo, WebhookEvent.number],
+            set_={
+                'events': case((listed, WebhookEvent.events), else_=WebhookEvent.events + ',' + event),
+                'count': WebhookEvent.count + 1,
+                'last_seen': timestamp,
+            }
+        )
+        with self.session_maker() as session:
+            try:
+                session.execute(stmt)
+                session.commit()
+            except Exception as e:
+                logging.error(e)
+                session.rollback()
+                raise
+
+    def get_webhook_events(self, repo):
+
+        '''Get the queued numbers for a repo with the event count each was read at'''
+
+        # the receiver writes from another process
+        self.session.expire_all()
+        rows = self.session.query(WebhookEvent).filter(WebhookEvent.repo == repo).all()
+        return {x.number: x.count for x in rows}
+
+    def ack_webhook_events(self, repo, events):
+
+        '''Remove the numbers that did not get new events since they were read'''
+
+        for number, count in events.items():
+            self.session.query(WebhookEvent).filter(WebhookEvent.repo == repo).filter(WebhookEvent.number == number).filter(WebhookEvent.count == count).delete()
+        self.session.flush()
+        self.session.commit()
+
+    def get_component_match(self, repo, context, title, component):
+
+        '''The filenames and strategies a component matched in a checkout context'''
+
+        with self.session_maker() as session:
+            try:
+                cm = session.get(ComponentMatch, (repo, context, title, component))
+            except Exception as e:
+                logging.error(e)
+                return None
+            if cm is None:
+                return None
+            return {
+                'filenames': json.loads(cm.filenames),
+                'strategies': json.loads(cm.strategies),
+            }
+
+    def set_component_match(self, repo, context, title, component, filenames, strategies):
+
+        '''Store a component match, workers may race on the same one'''
+
+        stmt = insert(ComponentMatch).values(
+            repo=repo,
+            context=context,
+            title=title,
+            component=component,
+            filenames=json.dumps(filenames),
+            strategies=json.dumps(strategies),
+        ).on_conflict_do_nothing()
+        with self.session_maker() as session:
+            try:
+                session.execute(stmt)
+                session.commit()
+            except Exception as e:
+                logging.error(e)
+                session.rollback()
+
+    def prune_component_matches(self, repo, context):
+
+        '''Drop the matches made against any other checkout context of repo'''
+
+        with self.session_maker() as session:
+            try:
+                session.query(ComponentMatch).filter(ComponentMatch.repo == repo).filter(ComponentMatch.context != context).delete()
+                session.commit()
+            except Exception as e:
+                logging.error(e)
+                session.rollback()
+
+    def get_module_authors(self, blobs):
+
+        '''The author records extracted from the modules with these git blob ids'''
+
+        records = {}
+        blobs = list(blobs)
+        with self.session_maker() as session:
+            try:
+                # stay below sqlite's limit on bound parameters
+                for idx in range(0, len(blobs), 500):
+                    rows = session.query(ModuleAuthors).filter(ModuleAuthors.blob.in_(blobs[idx:idx + 500])).all()
+                    for row in rows:
+                        records[row.blob] = {
+                            'logins': json.loads(row.logins),
+                            'emails': json.loads(row.emails),
+                        }
+            except Exception as e:
+                logging.error(e)
+        return records
+
+    def set_module_authors(self, records):
+
+        '''Store {blob: author record}, the content of a blob never changes'''
+
+        rows = [
+            {'blob': k, 'logins': json.dumps(v['logins']), 'emails': json.dumps(v['emails'])}
+            for k, v in records.items()
+        ]
+        with self.session_maker() as session:
+            try:
+                for idx in range(0, len(rows), 500):
+                    session.execute(insert(ModuleAuthors).values(rows[idx:idx + 500]).on_conflict_do_nothing())
+                session.commit()
+            except Exception as e:
+                logging.error(e)
+                session.rollback()
@@ -0,0 +1,98 @@
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+import os
+import uuid
+
+
+# events that can change the outcome of a triage, see
+# https://docs.github.com/en/developers/webhooks-and-events/webhooks/webhook-events-and-payloads
+TRIAGE_EVENTS = frozenset((
+    'check_run',
+    'check_suite',
+    'issue_comment',
+    'issues',
+    'pull_request',
+    'pull_request_review',
+    'pull_request_review_comment',
+))
+
+
+def verify_webhook_signature(secret, body, signature):
+    '''Check the X-Hub-Signature-256 header against the raw request body'''
+    if not signature or not signature.startswith('sha256='):
+        return False
+    digest = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest('sha256=' + digest, signature)
+
+
+def sign_webhook_body(secret, body):
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def get_webhook_numbers(event, payload):
+    '''Return the repo and the issue|pr numbers a webhook payload is about'''
+    if event not in TRIAGE_EVENTS:
+        return None, []
+
+    repo = payload.get('repository', {}).get('full_name')
+
+    numbers = []
+    if event in ('issues', 'issue_comment'):
+        numbers.append(payload['issue']['number'])
+    elif event.startswith('pull_request'):
+        numbers.append(payload['pull_request']['number'])
+    else:
+        # check runs and suites list the prs for their head sha
+        for pr in payload[event].get('pull_requests', []):
+            # runs can list prs of other repos sharing the head sha
+            if repo and pr.get('url') and '/repos/%s/' % repo not in pr['url']:
+                continue
+            numbers.append(pr['number'])
+
+    return repo, sorted(set(numbers))
+
+
+def queue_webhook(adb, event, payload):
+    '''Add the numbers in a payload to the event queue'''
+    repo, numbers = get_webhook_numbers(event, payload)
+    timestamp = datetime.datetime.utcnow().isoformat()
+    for number in numbers:
+        logging.info('queueing %s event for %s#%s' % (event, repo, number))
+        adb.queue_webhook_event(repo, number, event, timestamp)
+    return repo, numbers
+
+
+def record_webhook(recorddir, event, payload, delivery=None):
+    '''Write a payload to disk in the format the replay tool reads'''
+    if delivery is None:
+        delivery = str(uuid.uuid4())
+    if not os.path.isdir(recorddir):
+        os.makedirs(recorddir)
+
+    fn = os.path.join(
+        recorddir,
+        '%s_%s_%s.json' % (datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S%f'), event, delivery)
+    )
+    with open(fn, 'w') as f:
+        f.write(json.dumps({'event': event, 'delivery': delivery, 'payload': payload}))
+    return fn
+
+
+def load_recorded_webhooks(paths):
+    '''Yield the recorded (event, delivery, payload) from files or directories in order'''
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(
+                os.path.join(path, x) for x in sorted(os.listdir(path)) if x.endswith('.json')
+            )
+        else:
+            filenames.append(path)
+
+    for fn in filenames:
+        with open(fn) as f:
+            data = json.loads(f.read())
+        yield data['event'], data.get('delivery'), data['payload']
@@ -1,18 +1,23 @@
-import json
+import copy
 import logging
 import os
 import pickle
 import requests
-import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
 
 from github import Github
+from github.Issue import Issue
 
 import ansibullbot.constants as C
 
 from ansibullbot.decorators.github import RateLimited
 from ansibullbot.errors import RateLimitError
+from ansibullbot.utils.cache_store import get_cache_store
 from ansibullbot.utils.file_tools import read_gzip_json_file, write_gzip_json_file
+from ansibullbot.utils.rate_scheduler import SCHEDULER
 from ansibullbot.utils.sqlite_utils import AnsibullbotDatabase
 
 
@@ -28,13 +33,76 @@ HEADERS = [
 ]
 
 
+def raise_for_rate_limit(data):
+    '''Turn a rate limit message in a response body into a RateLimitError'''
+    if isinstance(data, dict) and data.get('message'):
+        if data['message'].lower().startswith('api rate limit exceeded'):
+            raise RateLimitError()
+
+
+def get_page_urls(next_url, last_url):
+    '''Enumerate the page urls between the next and last pagination links'''
+    next_parts = urlparse(next_url)
+    next_query = parse_qs(next_parts.query)
+    last_query = parse_qs(urlparse(last_url).query)
+    try:
+        first_page = int(next_query['page'][0])
+        last_page = int(last_query['page'][0])
+    except (KeyError, IndexError, ValueError):
+        # cursor based pagination can not be enumerated
+        return None
+
+    urls = []
+    for page in range(first_page, last_page + 1):
+        next_query['page'] = [str(page)]
+        urls.append(urlunparse(next_parts._replace(query=urlencode(next_query, doseq=True))))
+    return urls
+
+
+def rebind(obj, gh):
+    '''Copy a PyGithub object onto another connection without refetching it'''
+    return gh.create_from_raw_data(obj.__class__, obj._rawData, obj._headers)
+
+
+def merge_pages(data, pages):
+    for _data in pages:
+        if isinstance(data, list):
+            data += _data
+        elif isinstance(data, dict):
+            data.update(_data)
+    return data
+
+
 class GithubWrapper:
     def __init__(self, url=None, user=None, passw=None, token=None, cachedir='~/.ansibullbot/cache'):
+        self._connect_args = (url, user, passw, token)
         self.gh = self._connect(url, user, passw, token)
+        SCHEDULER.track(self.gh)
         self.token = token
         self.cachedir = os.path.expanduser(cachedir)
         self.cached_requests_dir = os.path.join(self.cachedir, 'cached_requests')
 
+        # one keep-alive pool for all raw api calls, capped to stay clear of
+        # the secondary rate limits on concurrent requests
+        self.max_concurrency = C.DEFAULT_GITHUB_MAX_CONCURRENCY
+        self._inflight = threading.BoundedSemaphore(self.max_concurrency)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def clone(self):
+        '''A wrapper with its own PyGithub connection that shares the request pool
+
+        PyGithub's Requester keeps a single connection and pairs each request
+        with the next response read from it, so it can not be used by two
+        threads at once.
+        '''
+        ghw = copy.copy(self)
+        ghw.gh = self._connect(*self._connect_args)
+        SCHEDULER.track(ghw.gh)
+        return ghw
+
     @RateLimited
     def _connect(self, url, user, passw, token):
         """Connects to GitHub's API"""
@@ -47,6 +115,57 @@ class GithubWrapper:
                 password=passw
             )
 
+    def _get(self, url, headers=None):
+        _headers = {
+            'Accept': ','.join(HEADERS),
+            'Authorization': 'Bearer %s' % self.token,
+        }
+        if headers:
+            _headers.update(headers)
+
+        SCHEDULER.wait('core')
+        with self._inflight:
+            rr = self.session.get(url, headers=_headers)
+
+        SCHEDULER.update_from_headers(rr.headers)
+        return rr
+
+    def _get_json(self, url):
+        rr = self._get(url)
+        data = rr.json()
+
+        # handle ratelimits ...
+        raise_for_rate_limit(data)
+
+        return rr, data
+
+    def _get_next_pages(self, rr):
+        '''Fetch every page after the given response'''
+        links = getattr(rr, 'links', None) or {}
+        if not links.get('next'):
+            return []
+
+        page_urls = None
+        if links.get('last'):
+            page_urls = get_page_urls(links['next']['url'], links['last']['url'])
+
+        if page_urls:
+            # the page count is known, so fetch them all at once
+            with ThreadPoolExecutor(max_workers=min(len(page_urls), self.max_concurrency)) as executor:
+                return list(executor.map(lambda x: self._get_json(x)[1], page_urls))
+
+        pages = []
+        url = links['next']['url']
+        while url:
+            rr, data = self._get_json(url)
+            pages.append(data)
+            url = (getattr(rr, 'links', None) or {}).get('next', {}).get('url')
+        return pages
+
+    def _get_all_pages(self, url):
+        rr, data = self._get_json(url)
+        return merge_pages(data, self._get_next_pages(rr))
+
     @RateLimited
     def get_cached_request(self, url):
         '''Use a combination of sqlite and ondisk caching to GET an api resource'''
@@ -61,10 +180,7 @@ class GithubWrapper:
         if url_parts[-2] == 'commits' and os.path.exists(cdf):
             return read_gzip_json_file(cdf)
 
-        headers = {
-            'Accept': ','.join(HEADERS),
-            'Authorization': 'Bearer %s' % self.token,
-        }
+        headers = {}
 
         meta = ADB.get_github_api_request_meta(url, token=self.token)
         if meta is None:
@@ -75,19 +191,16 @@ class GithubWrapper:
         if etag and os.path.exists(cdf):
             headers['If-None-Match'] = etag
 
-        rr = requests.get(url, headers=headers)
+        rr = self._get(url, headers=headers)
 
         if rr.status_code == 304:
             # not modified
-            with open(cdf) as f:
-                data = json.loads(f.read())
+            data = read_gzip_json_file(cdf)
         else:
             data = rr.json()
 
             # handle ratelimits ...
-            if isinstance(data, dict) and data.get('message'):
-                if data['message'].lower().startswith('api rate limit exceeded'):
-                    raise RateLimitError()
+            raise_for_rate_limit(data)
 
             # cache data to disk
             logging.debug('write %s' % cdf)
@@ -97,52 +210,40 @@ class GithubWrapper:
         ADB.set_github_api_request_meta(url, rr.headers, cdf, token=self.token)
 
         # pagination
-        if hasattr(rr, 'links') and rr.links and rr.links.get('next'):
-            _data = self.get_request(rr.links['next']['url'])
-            if isinstance(data, list):
-                data += _data
-            else:
-                data.update(_data)
-
-        return data
+        return merge_pages(data, self._get_next_pages(rr))
 
     @RateLimited
     def get_request(self, url):
         '''Get an arbitrary API endpoint'''
+        return self._get_all_pages(url)
 
-        headers = {
-            'Accept': ','.join(HEADERS),
-            'Authorization': 'Bearer %s' % self.token,
-        }
-
-        rr = requests.get(url, headers=headers)
-        data = rr.json()
-
-        # handle ratelimits ...
-        if isinstance(data, dict) and data.get('message'):
-            if data['message'].lower().startswith('api rate limit exceeded'):
-                raise RateLimitError()
-
-        # pagination
-        if hasattr(rr, 'links') and rr.links and rr.links.get('next'):
-            _data = self.get_request(rr.links['next']['url'])
-            if isinstance(data, list):
-                data += _data
-            elif isinstance(data, dict):
-                data.update(_data)
-
-        return data
+    @RateLimited
+    def get_requests(self, urls):
+        '''Get several API endpoints concurrently, results are in the same order'''
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(urls), self.max_concurrency)) as executor:
+            return list(executor.map(self._get_all_pages, urls))
 
 
 class RepoWrapper:
     def __init__(self, gh, repo_path, cachedir='~/.ansibullbot/cache'):
         self.gh = gh
+        self.repo_path = repo_path
         self.cachedir = os.path.join(os.path.expanduser(cachedir), repo_path)
+        self.store = get_cache_store(cachedir)
 
         self._assignees = False
         self._labels = False
         self.repo = self.get_repo(repo_path)
 
+    def clone(self, gh):
+        '''The same repo on another PyGithub connection'''
+        rw = copy.copy(self)
+        rw.gh = gh
+        rw.repo = rebind(self.repo, gh)
+        return rw
+
     def has_in_assignees(self, login):
         logins = [x.login for x in self.assignees]
         return login in logins
@@ -171,7 +272,7 @@ class RepoWrapper:
             except UnicodeDecodeError:
                 # https://github.com/ansible/ansibullbot/issues/610
                 logging.warning('cleaning cache for %s' % number)
-                shutil.rmtree(os.path.join(self.cachedir, 'issues', str(number)))
+                self.store.delete(self.repo_path, number)
 
         return issue
 
@@ -209,38 +310,23 @@ class RepoWrapper:
         if not C.DEFAULT_PICKLE_ISSUES:
             return False
 
-        pfile = os.path.join(
-            self.cachedir,
-            'issues',
-            str(number),
-            'issue.pickle'
-        )
-        if os.path.isfile(pfile):
-            with open(pfile, 'rb') as f:
-                try:
-                    issue = pickle.load(f)
-                except TypeError:
-                    return False
-            return issue
-        else:
+        try:
+            return self.store.get(self.repo_path, number, 'issue', default=False)
+        except TypeError:
             return False
 
+    def load_issue_from_raw_data(self, raw_data):
+        '''Build an issue from data fetched elsewhere, such as a graphql node'''
+        issue = self.gh.create_from_raw_data(Issue, raw_data)
+        self.save_issue(issue)
+        return issue
+
     def save_issue(self, issue):
         if not C.DEFAULT_PICKLE_ISSUES:
             return
 
-        cfile = os.path.join(
-            self.cachedir,
-            'issues',
-            str(issue.number),
-            'issue.pickle'
-        )
-        cdir = os.path.dirname(cfile)
-        if not os.path.isdir(cdir):
-            os.makedirs(cdir)
-        logging.debug('dump %s' % cfile)
-        with open(cfile, 'wb') as f:
-            pickle.dump(issue, f)
+        logging.debug('dump %s/%s' % (self.repo_path, issue.number))
+        self.store.set(self.repo_path, issue.number, 'issue', issue)
 
     @RateLimited
     def load_update_fetch(self, property_name):
@@ -1,11 +1,10 @@
 import datetime
 import logging
-import os
-import pickle
 
 from operator import itemgetter
 
 import ansibullbot.constants as C
+from ansibullbot.utils.cache_store import cache_root, get_cache_store
 from ansibullbot.utils.timetools import strip_time_safely
 
 
@@ -30,45 +29,10 @@ class HistoryWrapper:
         self.issue = issue
         self._waffled_labels = None
 
-        if issue.repo_full_name not in cachedir and 'issues' not in cachedir:
-            self.cachefile = os.path.join(
-                cachedir,
-                issue.repo_full_name,
-                'issues',
-                str(issue.instance.number),
-                'history.pickle'
-            )
-        elif issue.repo_full_name not in cachedir:
-            self.cachefile = os.path.join(
-                cachedir,
-                issue.repo_full_name,
-                'issues',
-                str(issue.instance.number),
-                'history.pickle'
-            )
-        elif 'issues' not in cachedir:
-            self.cachefile = os.path.join(
-                cachedir,
-                'issues',
-                str(issue.instance.number),
-                'history.pickle'
-            )
-        else:
-            self.cachefile = os.path.join(
-                cachedir,
-                str(issue.instance.number),
-                'history.pickle'
-            )
-
-        self.cachedir = os.path.join(
-            cachedir,
-            os.path.dirname(self.cachefile)
-        )
-        if 'issues' not in self.cachedir:
-            logging.error(self.cachedir)
-            raise Exception
+        self.store = None
 
         if usecache:
+            self.store = get_cache_store(cache_root(cachedir, issue.repo_full_name))
             cache = self._load_cache()
 
             if not self.validate_cache(cache):
@@ -119,41 +83,20 @@ class HistoryWrapper:
         return True
 
     def _load_cache(self):
-        if not os.path.isdir(self.cachedir):
-            os.makedirs(self.cachedir)
-        if not os.path.isfile(self.cachefile):
-            logging.info('!%s' % self.cachefile)
-            return
-        try:
-            with open(self.cachefile, 'rb') as f:
-                cachedata = pickle.load(f)
-        except Exception as e:
-            logging.debug(e)
-            logging.info('%s failed to load' % self.cachefile)
-            return
-
-        return cachedata
+        return self.store.get(self.issue.repo_full_name, self.issue.instance.number, 'history')
 
     def _dump_cache(self):
         if any(x for x in self.history if not isinstance(x['created_at'], datetime.datetime)):
             logging.error(self.history)
             raise AssertionError('found a non-datetime created_at in events data')
 
-        if not os.path.isdir(self.cachedir):
-            os.makedirs(self.cachedir)
-
         cachedata = {
             'version': self.SCHEMA_VERSION,
             'updated_at': self.issue.instance.updated_at,
             'history': self.history
         }
 
-        try:
-            with open(self.cachefile, 'wb') as f:
-                pickle.dump(cachedata, f)
-        except Exception as e:
-            logging.error(e)
-            raise
+        self.store.set(self.issue.repo_full_name, self.issue.instance.number, 'history', cachedata)
 
     def get_json_comments(self):
         comments = self.issue.comments[:]
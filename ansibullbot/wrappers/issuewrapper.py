@@ -15,17 +15,19 @@
 
 
 import datetime
-import json
 import logging
 import os
-import pickle
 import re
 import time
 
 import requests
 
+from github.Commit import Commit
+from github.File import File
+
 import ansibullbot.constants as C
 from ansibullbot.decorators.github import RateLimited
+from ansibullbot.utils.cache_store import cache_root, get_cache_store
 from ansibullbot.utils.extractors import get_template_data
 from ansibullbot.utils.timetools import strip_time_safely
 from ansibullbot.wrappers.historywrapper import HistoryWrapper
@@ -62,6 +64,15 @@ class IssueWrapper:
         self.full_cachedir = os.path.join(self.cachedir, 'issues', str(self.number))
         self._renamed_files = None
         self._pullrequest_check_runs = None
+        self._timeline = None
+        self._graphql_timeline = None
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = get_cache_store(cache_root(self.cachedir, self.repo_full_name))
+        return self._store
 
     @property
     def url(self):
@@ -142,102 +153,61 @@ class IssueWrapper:
 
         return sorted(processed_events, key=lambda x: x['created_at'])
 
-    def _get_timeline(self):
-        '''Use python-requests instead of pygithub'''
-        data = None
-
-        cache_data = os.path.join(self.full_cachedir, 'timeline_data.json')
-        cache_meta = os.path.join(self.full_cachedir, 'timeline_meta.json')
-        logging.debug(cache_data)
+    def _load_cached_timeline(self):
+        '''The cached timeline, None if it is missing or outdated'''
+        meta = self.store.get(self.repo_full_name, self.number, 'timeline_meta') or {}
+        if not meta or meta.get('updated_at', 0) < self.updated_at.isoformat():
+            return None
 
-        if not os.path.exists(self.full_cachedir):
-            os.makedirs(self.full_cachedir)
+        # validate the data is not infected by ratelimit errors
+        data = self.store.get(self.repo_full_name, self.number, 'timeline_data')
+        if not isinstance(data, list) or [x for x in data if not isinstance(x, dict)]:
+            return None
 
-        meta = {}
-        fetch = False
-        if not os.path.exists(cache_data):
-            fetch = True
-        else:
-            with open(cache_meta) as f:
-                meta = json.loads(f.read())
+        return data
 
-        if not fetch and (not meta or meta.get('updated_at', 0) < self.updated_at.isoformat()):
-            fetch = True
+    def _get_timeline(self):
+        '''Use python-requests instead of pygithub'''
+        data = self._load_cached_timeline()
 
-        # validate the data is not infected by ratelimit errors
-        if not fetch:
-            with open(cache_data) as f:
-                data = json.loads(f.read())
-
-            if isinstance(data, list):
-                bad_events = [x for x in data if not isinstance(x, dict)]
-                if bad_events:
-                    fetch = True
-            else:
-                fetch = True
+        if data is None and self._graphql_timeline is not None:
+            # only has the event types the triager reads, so it is not
+            # cached where the full rest timeline is expected
+            return self._graphql_timeline
 
         if data is None:
-            fetch = True
-
-        if fetch:
             url = self.url + '/timeline'
-            data = self.github.get_request(url)
+            if self._timeline is not None:
+                data = self._timeline
+            else:
+                data = self.github.get_request(url)
 
-            with open(cache_meta, 'w') as f:
-                f.write(json.dumps({
-                    'updated_at': self.updated_at.isoformat(),
-                    'url': url
-                }))
-            with open(cache_data, 'w') as f:
-                f.write(json.dumps(data))
+            self.store.set(self.repo_full_name, self.number, 'timeline_meta', {
+                'updated_at': self.updated_at.isoformat(),
+                'url': url
+            })
+            self.store.set(self.repo_full_name, self.number, 'timeline_data', data)
 
         return data
 
-    @RateLimited
-    def load_update_fetch_files(self):
-        edata = None
-        events = []
-        updated = None
-        update = False
-        write_cache = False
-
-        pfile = os.path.join(self.full_cachedir, 'files.pickle')
-        pdir = os.path.dirname(pfile)
-        logging.debug(pfile)
-
-        if not os.path.isdir(pdir):
-            os.makedirs(pdir)
-
-        if os.path.isfile(pfile):
-            try:
-                with open(pfile, 'rb') as f:
-                    edata = pickle.load(f)
-            except Exception:
-                update = True
-                write_cache = True
-
-        # check the timestamp on the cache
-        if edata:
-            updated = edata[0]
-            events = edata[1]
-            if updated < self.instance.updated_at:
-                update = True
-                write_cache = True
-
-        # pull all events if timestamp is behind or no events cached
-        if update or not events:
-            write_cache = True
-            updated = datetime.datetime.utcnow()
-            events = [x for x in self.pullrequest.get_files()]
+    def _load_cached_files(self):
+        '''The cached pullrequest files, None if they are missing or outdated'''
+        edata = self.store.get(self.repo_full_name, self.number, 'files')
+        if not edata or not edata[1] or edata[0] < self.instance.updated_at:
+            return None
+        return edata[1]
 
+    def _save_files(self, files):
         if C.DEFAULT_PICKLE_ISSUES:
-            if write_cache or not os.path.isfile(pfile):
-                # need to dump the pickle back to disk
-                edata = [updated, events]
-                with open(pfile, 'wb') as f:
-                    pickle.dump(edata, f)
+            self.store.set(self.repo_full_name, self.number, 'files', [datetime.datetime.utcnow(), files])
 
-        return events
+    @RateLimited
+    def load_update_fetch_files(self):
+        files = self._load_cached_files()
+        if files is None:
+            files = [x for x in self.pullrequest.get_files()]
+            self._save_files(files)
+        return files
 
     @RateLimited
     def get_labels(self):
@@ -398,6 +368,79 @@ class IssueWrapper:
             self._pr = self.repo.get_pullrequest(self.number)
         return self._pr
 
+    def hydrate(self, node):
+        '''Seed the timeline, reviews, files and commits from a bulk graphql node'''
+        if node.get('updated_at') is None or strip_time_safely(node['updated_at']) < self.updated_at.replace(tzinfo=None):
+            logging.debug('graphql node for %s is behind the issue' % self.number)
+            return
+
+        if node.get('timeline') is not None:
+            self._graphql_timeline = node['timeline']
+
+        if not self.is_pullrequest():
+            return
+
+        if node.get('reviews') is not None:
+            self._pr_reviews = node['reviews']
+        if node.get('files') is not None:
+            self._pr_files = [self.github.gh.create_from_raw_data(File, x) for x in node['files']]
+            self._save_files(self._pr_files)
+        if node.get('commits') is not None:
+            self._commits = [self.github.gh.create_from_raw_data(Commit, x) for x in node['commits']]
+
+    def prefetch(self, resources):
+        '''Load the named lazy properties ahead of processing
+
+        Everything that is not cached is fetched in one concurrent batch through
+        the pooled session of the GithubWrapper. PyGithub's Requester is not
+        thread safe, so it only builds objects from the raw data afterwards.
+        '''
+        if not self.is_pullrequest():
+            resources = [x for x in resources if x == 'events']
+
+        urls = {}
+        if 'events' in resources and self._events is UnsetValue and \
+                self._timeline is None and self._graphql_timeline is None:
+            if self._load_cached_timeline() is None:
+                urls['events'] = self.url + '/timeline'
+
+        if self.is_pullrequest():
+            if 'pr_files' in resources and self._pr_files is None:
+                files = self._load_cached_files()
+                if files is None:
+                    urls['pr_files'] = self.pullrequest.url + '/files?per_page=100'
+                else:
+                    self._pr_files = files
+            if 'reviews' in resources and self._pr_reviews is False:
+                urls['reviews'] = self.pullrequest.url + '/reviews?per_page=100'
+            if 'commits' in resources and self._commits is False:
+                urls['commits'] = self.pullrequest.url + '/commits?per_page=100'
+
+        if urls:
+            try:
+                data = dict(zip(urls, self.github.get_requests(list(urls.values()))))
+            except Exception as e:
+                # leave it to be loaded again when a plugin asks for it
+                logging.warning('prefetching %s for %s failed: %s' % (', '.join(urls), self.number, e))
+                data = {}
+
+            gh = self.github.gh
+            if 'events' in data:
+                self._timeline = data['events']
+            if 'pr_files' in data:
+                self._pr_files = [gh.create_from_raw_data(File, x) for x in data['pr_files']]
+                self._save_files(self._pr_files)
+            if 'reviews' in data:
+                self._pr_reviews = data['reviews']
+            if 'commits' in data:
+                self._commits = [gh.create_from_raw_data(Commit, x) for x in data['commits']]
+
+        if 'events' in resources:
+            self.events
+        if 'pullrequest_check_runs' in resources and self.is_pullrequest() and self.commits:
+            # a lazy list, nothing is fetched until the CI wrapper reads it
+            self.pullrequest_check_runs
+
     def update_pullrequest(self):
         if self.is_pullrequest():
             # the underlying call is wrapper with ratelimited ...
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+"""
+Move the per issue cache tree (<cachedir>/<repo>/issues/<number>/*) into the
+cache store selected by cache_backend.
+
+Usage: ./scripts/ansibot_migrate_cache.py
+       ./scripts/ansibot_migrate_cache.py --cachedir ~/.ansibullbot/cache --repo ansible/ansible --remove
+"""
+
+
+import argparse
+import logging
+
+from ansibullbot.utils.cache_store import FileCacheStore, get_cache_store, migrate
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cachedir', default='~/.ansibullbot/cache')
+    parser.add_argument('--repo', action='append', dest='repos', help='only migrate this repo, can be repeated')
+    parser.add_argument('--backend', default='sqlite', help='the store to migrate into')
+    parser.add_argument('--remove', action='store_true', help='delete the files once they are copied')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    dest = get_cache_store(args.cachedir, backend=args.backend)
+    if isinstance(dest, FileCacheStore):
+        raise SystemExit('the file backend is what is being migrated from')
+
+    counts = migrate(FileCacheStore(args.cachedir), dest, repos=args.repos, remove=args.remove)
+    for repo, count in sorted(counts.items()):
+        print('%s %s' % (repo, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,13 +14,20 @@ from flask import Flask
 from flask import jsonify
 from flask import request
 from flask_pymongo import PyMongo
-from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import BadRequest, Forbidden
+
+import ansibullbot.constants as C
+from ansibullbot.utils.sqlite_utils import AnsibullbotDatabase
+from ansibullbot.utils.webhooks import queue_webhook, record_webhook, verify_webhook_signature
 
 app = Flask(__name__)
 app.config['MONGO_DBNAME'] = 'ansibot_reciever'
 app.config['MONGO_URI'] = 'mongodb://localhost:27017/ansibot_reciever'
 mongo = PyMongo(app)
 
+# the event queue consumed by the triager's --webhooks mode
+ADB = AnsibullbotDatabase()
+
 
 def get_summary_numbers_for_repo(org, repo, collection_name=None):
     pipeline = [
@@ -310,6 +317,31 @@ def summaries():
     return 'summaries\n'
 
 
+@app.route('/webhook', methods=['POST'])
+def webhook():
+    if C.DEFAULT_WEBHOOK_SECRET:
+        signature = request.headers.get('X-Hub-Signature-256')
+        if not verify_webhook_signature(C.DEFAULT_WEBHOOK_SECRET, request.get_data(), signature):
+            raise Forbidden('invalid signature')
+
+    event = request.headers.get('X-GitHub-Event')
+    delivery = request.headers.get('X-GitHub-Delivery')
+    if not event:
+        raise BadRequest('X-GitHub-Event header must be supplied')
+
+    # deliveries configured as application/x-www-form-urlencoded have no json body
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise BadRequest('the webhook content type must be application/json')
+
+    if C.DEFAULT_WEBHOOK_RECORD_DIR:
+        record_webhook(C.DEFAULT_WEBHOOK_RECORD_DIR, event, payload, delivery=delivery)
+
+    repo, numbers = queue_webhook(ADB, event, payload)
+
+    return jsonify({'result': 'ok', 'repo': repo, 'numbers': numbers})
+
+
 #####################################################
 #   LOGGING PAGE
 #####################################################
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""
+Feed recorded webhook payloads (see receiver.webhook_record_dir) back in.
+
+Usage: ./scripts/ansibot_replay_webhooks.py /tmp/webhooks
+       ./scripts/ansibot_replay_webhooks.py --url http://localhost:5001/webhook /tmp/webhooks/*.json
+"""
+
+
+import argparse
+import json
+
+import requests
+
+import ansibullbot.constants as C
+from ansibullbot.utils.sqlite_utils import AnsibullbotDatabase
+from ansibullbot.utils.webhooks import load_recorded_webhooks, queue_webhook, sign_webhook_body
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', nargs='+', help='recorded payload files or directories of them')
+    parser.add_argument('--url', help='POST the payloads to this receiver instead of queueing them directly')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = parse_args()
+
+    adb = None
+    if not args.url:
+        adb = AnsibullbotDatabase()
+
+    for event, delivery, payload in load_recorded_webhooks(args.paths):
+        if adb is not None:
+            repo, numbers = queue_webhook(adb, event, payload)
+            print('%s %s %s' % (event, repo, numbers))
+            continue
+
+        body = json.dumps(payload).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            'X-GitHub-Event': event,
+            'X-GitHub-Delivery': delivery or '',
+        }
+        if C.DEFAULT_WEBHOOK_SECRET:
+            headers['X-Hub-Signature-256'] = sign_webhook_body(C.DEFAULT_WEBHOOK_SECRET, body)
+
+        rr = requests.post(args.url, data=body, headers=headers)
+        print('%s %s %s' % (event, rr.status_code, rr.text.strip()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,3 @@
-import glob
-import json
 import logging
 import os
 
@@ -8,6 +6,7 @@ import pytest
 from tests.utils.componentmocks import BotMockManager
 
 from ansibullbot.triagers.ansible import AnsibleTriage
+from ansibullbot.utils.cache_store import get_cache_store
 
 
 class TestIdempotence:
@@ -77,15 +76,10 @@ class TestIdempotence:
 
             print('# issuedb %s' % id(mm.issuedb))
 
-            # /tmp/ansibot.test.isxYlS/ansible/ansible/issues/1/meta.json                
-            metafiles = glob.glob('%s/*/meta.json' % os.path.join(mm.cachedir, 'ansible', 'ansible', 'issues'))
-            metafiles = sorted(metafiles)
-            for mf in metafiles:
+            metas = get_cache_store(mm.cachedir).items('ansible/ansible', 'meta')
+            for number, meta in metas:
 
-                with open(mf) as f:
-                    meta = json.loads(f.read())
-
-                print('checking %s' % mf)
+                print('checking %s' % number)
 
                 # ensure no actions were created on the last run
                 for k,v in meta['actions'].items():
@@ -1,5 +1,3 @@
-import glob
-import json
 import os
 
 import pytest
@@ -9,6 +7,7 @@ from tests.utils.componentmocks import BotMockManager
 from tests.utils.componentmocks import get_custom_timestamp
 
 from ansibullbot.triagers.ansible import AnsibleTriage
+from ansibullbot.utils.cache_store import get_cache_store
 
 
 class TestSuperShipit:
@@ -80,17 +79,10 @@ class TestSuperShipit:
             AT = AnsibleTriage(args=bot_args)
             AT.run()
 
-            # /tmp/ansibot.test.isxYlS/ansible/ansible/issues/1/meta.json                
-            metafiles = glob.glob('%s/*/meta.json' % os.path.join(mm.cachedir, 'ansible', 'ansible', 'issues'))
-            metafiles = sorted(metafiles)
-            for mf in metafiles:
+            metas = get_cache_store(mm.cachedir).items('ansible/ansible', 'meta')
+            for number, meta in metas:
 
-                number = int(mf.split('/')[-2])
-
-                with open(mf) as f:
-                    meta = json.loads(f.read())
-
-                print(mf)
+                print(number)
                 print('shipit: %s' % ('shipit' in meta['actions']['newlabel']))
                 print('automerge: %s' % ('automerge' in meta['actions']['newlabel']))
                 print('merge: %s' % meta['actions']['merge'])
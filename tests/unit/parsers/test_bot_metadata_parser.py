@@ -258,3 +258,29 @@ class TestBotMetadataParserAnchors(TestBotMetaIndexerBase):
         # we do not want pointers merging all data into the anchor
         assert 'docs' not in data['files'][topdir]['labels']
         assert 'docs' not in data['files'][mfile]['labels']
+
+
+class TestBotMetadataIndex(TestBotMetaIndexerBase):
+    def runTest(self):
+        data = BotMetadataParser.parse_yaml(EXAMPLE1)
+        index = data['files_index']
+
+        paths = [
+            'lib/ansible/foobar/baz.py',
+            'lib/ansible/cli/vault.py',
+            'lib/ansible/cli/galaxy/role.py',
+            'lib/ansible/modules/x/y/z.py',
+            'packaging/debian/rules',
+            'bin/ansible',
+        ]
+        for path in paths:
+            keys = sorted((x for x in data['files'] if path.startswith(x)), key=len)
+            self.assertEqual(keys, index.ancestors(path))
+            self.assertEqual(keys[-1] if keys else None, index.longest(path))
+
+        # keys added later are found too
+        data['files']['lib/ansible'] = {}
+        self.assertEqual(
+            ['lib/ansible', 'lib/ansible/foobar'],
+            index.ancestors('lib/ansible/foobar/baz.py')
+        )
@@ -0,0 +1,252 @@
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+
+from unittest import mock
+
+from ansibullbot.triagers.ansible import AnsibleTriage
+
+
+class ConnectionMock:
+    '''Fails when two threads use it at once, PyGithub's Requester would mix up their responses'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def request(self):
+        if not self._lock.acquire(blocking=False):
+            raise AssertionError('connection used by two threads at once')
+        try:
+            time.sleep(0.02)
+        finally:
+            self._lock.release()
+
+    def create_from_raw_data(self, klass, raw_data, headers={}):
+        return klass(raw_data)
+
+
+class GithubWrapperMock:
+    def __init__(self):
+        self.gh = ConnectionMock()
+        self.get_requests_calls = 0
+
+    def clone(self):
+        return GithubWrapperMock()
+
+    def get_requests(self, urls):
+        self.get_requests_calls += 1
+        self.gh.request()
+        return [[] for x in urls]
+
+
+class RepoWrapperMock:
+    def __init__(self, gh=None):
+        self.gh = gh
+
+    def clone(self, gh):
+        return RepoWrapperMock(gh)
+
+
+class IssueMock:
+    def __init__(self, number):
+        if isinstance(number, dict):
+            number = number['number']
+        self.number = number
+        self.url = 'https://api.github.com/repos/ansible/ansible/issues/%s' % number
+        self.html_url = 'https://github.com/ansible/ansible/issues/%s' % number
+        self.updated_at = datetime.datetime(2020, 5, 31)
+        self.state = 'open'
+        self._rawData = {'number': number}
+        self._headers = {}
+
+
+def get_triager(cachedir, *args):
+    at = AnsibleTriage.__new__(AnsibleTriage)
+    at.args = AnsibleTriage.create_parser().parse_args(list(args))
+    at.cachedir_base = cachedir
+    at.ghw = GithubWrapperMock()
+    at.ci_class = None
+    at.contexts = {}
+    at.repos = {}
+    at.worker = None
+    at.component_matcher = mock.Mock(match_cache_hits=0, match_cache_misses=0)
+    return at
+
+
+class IssuesMock:
+    def __init__(self, numbers):
+        self.numbers = numbers
+        self.issuecache = {x: IssueMock(x) for x in numbers}
+
+
+def run_workers(at, numbers, triage_issue):
+    repopath = 'ansible/ansible'
+    repodata = {'issues': IssuesMock(numbers), 'gitrepo': None}
+    at.create_github_wrapper = GithubWrapperMock
+    at.triage_issue = triage_issue
+    at.repos = {repopath: {'processed': []}}
+    at.issue_summaries = {repopath: {str(x): {'state': 'open'} for x in numbers}}
+
+    with mock.patch('ansibullbot.triagers.ansible.RepoWrapper'):
+        icount = at.run_workers(repopath, repodata)
+
+    with open(os.path.join(at.cachedir_base, 'resume.json')) as f:
+        resume = json.load(f)
+    return icount, resume
+
+
+def test_prefetch_issues_use_their_own_connection():
+    with tempfile.TemporaryDirectory() as cachedir:
+        at = get_triager(cachedir, '--prefetch=4')
+        repodata = {'repo': RepoWrapperMock(at.ghw.gh), 'gitrepo': None}
+        issues = [IssueMock(x) for x in range(1, 9)]
+
+        results = list(at.prefetch_issues('ansible/ansible', repodata, issues))
+
+        assert [x[0].number for x in results] == list(range(1, 9))
+        assert all(x[1] is not None for x in results)
+        iws = [x[1][0] for x in results]
+        assert len({id(x.github.gh) for x in iws} | {id(at.ghw.gh)}) == 9
+        assert all(x.repo.gh is x.github.gh for x in iws)
+        assert at.ghw.get_requests_calls == 0
+
+
+def test_prefetch_issues_look_ahead():
+    with tempfile.TemporaryDirectory() as cachedir:
+        at = get_triager(cachedir, '--prefetch=2')
+        submitted = []
+
+        def prefetch_issue(repopath, repodata, issue, node=None):
+            submitted.append(issue.number)
+            return issue.number
+
+        at.prefetch_issue = prefetch_issue
+        issues = [IssueMock(1), None, IssueMock(2), IssueMock(3), IssueMock(4)]
+
+        seen = []
+        for issue, prefetched in at.prefetch_issues('ansible/ansible', {}, issues):
+            if not seen:
+                # the next issues were handed out before the first one returned
+                assert submitted == [1, 2, 3]
+            seen.append((issue.number, prefetched))
+
+        assert seen == [(1, 1), (2, 2), (3, 3), (4, 4)]
+
+
+def test_prefetch_issue_skip_no_update():
+    with tempfile.TemporaryDirectory() as cachedir:
+        at = get_triager(cachedir, '--prefetch=2', '--skip_no_update')
+        repodata = {'repo': RepoWrapperMock(at.ghw.gh), 'gitrepo': None}
+        issue = IssueMock(1)
+
+        at.load_meta = lambda iw: {'updated_at': issue.updated_at.isoformat()}
+        with mock.patch('ansibullbot.wrappers.issuewrapper.IssueWrapper.prefetch') as prefetch:
+            assert at.prefetch_issue('ansible/ansible', repodata, issue) is None
+
+        assert not prefetch.called
+
+
+def test_prefetch_issues_failure_fallback():
+    with tempfile.TemporaryDirectory() as cachedir:
+        at = get_triager(cachedir, '--prefetch=2')
+
+        def prefetch_issue(repopath, repodata, issue, node=None):
+            if issue.number == 2:
+                raise Exception('boom')
+            return issue.number
+
+        at.prefetch_issue = prefetch_issue
+        issues = [IssueMock(x) for x in range(1, 4)]
+
+        results = list(at.prefetch_issues('ansible/ansible', {}, issues))
+
+        assert [(x[0].number, x[1]) for x in results] == [(1, 1), (2, None), (3, 3)]
+
+
+def test_mark_closed_drops_stale_numbers():
+    with tempfile.TemporaryDirectory() as cachedir:
+        at = get_triager(cachedir)
+        at.issue_summaries = {'ansible/ansible': {'1': {'state': 'open'}, '2': {'state': 'open'}}}
+
+        at.mark_closed('ansible/ansible', 2)
+        at.mark_closed('ansible/ansible', 3)
+
+        assert at.get_stale_numbers('ansible/ansible') == [1]
+
+
+def test_run_workers_drain_the_queue():
+    with tempfile.TemporaryDirectory() as cachedir:
+        at = get_triager(cachedir, '--workers=3', '--resume')
+        logged = []
+
+        def triage_issue(repopath, repodata, issue, prefetched=None):
+            if issue.number == 4:
+                issue.state = 'closed'
+            if issue.number == 7:
+                raise Exception('boom')
+
+        with mock.patch('logging.info', side_effect=lambda msg: logged.append(msg)):
+            icount, resume = run_workers(at, list(range(10, 0, -1)), triage_issue)
+
+        # every number was handed out once and each worker stopped at its sentinel
+        assert icount == 10
+        assert sorted(at.repos['ansible/ansible']['processed']) == list(range(1, 11))
+        worker_lines = [x for x in logged if x.startswith('worker ')]
+        assert len(worker_lines) == 3
+        assert sum(int(x.split('(')[1].split()[0]) for x in worker_lines) == 1
+
+        # the parent writes resume and sees what the workers found closed
+        assert resume == {'repo': 'ansible/ansible', 'number': 1}
+        assert 4 not in at.get_stale_numbers('ansible/ansible')
+
+
+def test_run_workers_survive_a_dead_worker():
+    with tempfile.TemporaryDirectory() as cachedir:
+        at = get_triager(cachedir, '--workers=2', '--resume')
+        at.WORKER_POLL = 0.1
+
+        def triage_issue(repopath, repodata, issue, prefetched=None):
+            if issue.number == 3:
+                os._exit(1)
+
+        icount, resume = run_workers(at, list(range(1, 7)), triage_issue)
+
+        assert icount == 5
+        assert sorted(at.repos['ansible/ansible']['processed']) == [1, 2, 4, 5, 6]
+        # resume does not move past the number the dead worker held
+        assert resume['number'] == 2
+
+
+def test_prepare_context_reused_until_the_checkout_changes():
+    with tempfile.TemporaryDirectory() as cachedir:
+        botmetafile = os.path.join(cachedir, 'BOTMETA.yml')
+        with open(botmetafile, 'w') as f:
+            f.write('files: {}\n')
+
+        at = get_triager(cachedir, '--botmetafile=%s' % botmetafile)
+        at.gqlc = None
+        gitrepo = mock.Mock(head='abc', checkoutdir=cachedir)
+        repodata = {'gitrepo': gitrepo}
+
+        with mock.patch.object(AnsibleTriage, 'load_botmeta', return_value={}) as load_botmeta, \
+                mock.patch('ansibullbot.triagers.ansible.AnsibleVersionIndexer'), \
+                mock.patch('ansibullbot.triagers.ansible.ModuleIndexer'), \
+                mock.patch('ansibullbot.triagers.ansible.AnsibleComponentMatcher'):
+            context = at.prepare_context('ansible/ansible', repodata)
+            assert at.prepare_context('ansible/ansible', repodata) is context
+            assert load_botmeta.call_count == 1
+
+            # a new HEAD
+            gitrepo.head = 'def'
+            head_context = at.prepare_context('ansible/ansible', repodata)
+            assert head_context is not context
+            assert load_botmeta.call_count == 2
+
+            # an edited botmeta
+            mtime = os.path.getmtime(botmetafile)
+            os.utime(botmetafile, (mtime + 10, mtime + 10))
+            assert at.prepare_context('ansible/ansible', repodata) is not head_context
+            assert load_botmeta.call_count == 3
@@ -0,0 +1,35 @@
+import copy
+import pickle
+
+import pytest
+
+from ansibullbot.utils.botmeta import MetaRecord
+
+
+def test_meta_record_reads_like_the_dict():
+    data = {'name': 'ping', 'maintainers': ['foo', 'bar'], 'deprecated': False, 'metadata': {'status': ['preview']}}
+    record = MetaRecord(data)
+
+    assert record == data
+    assert record.to_dict() == data
+    assert record.copy() == data and isinstance(record.copy(), dict)
+    assert record['maintainers'] == ['foo', 'bar']
+    assert record.get('ignored', []) == []
+    assert 'name' in record and 'ignored' not in record
+    assert copy.deepcopy(record) == record
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_meta_record_is_compact_and_immutable():
+    a = MetaRecord({'name': 'ping', 'maintainers': ['foo']})
+    b = MetaRecord({'name': 'pong', 'maintainers': ['foo']})
+
+    # same shape, same key index and interned strings
+    assert a._index is b._index
+    assert a._values[1][0] is b._values[1][0]
+    assert not hasattr(a, '__dict__')
+
+    with pytest.raises(TypeError):
+        a['name'] = 'pang'
+    a['maintainers'].append('bar')
+    assert a['maintainers'] == ['foo']
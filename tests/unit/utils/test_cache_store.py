@@ -0,0 +1,88 @@
+import datetime
+import os
+import tempfile
+import time
+
+from ansibullbot.utils.cache_store import cache_root
+from ansibullbot.utils.cache_store import FileCacheStore
+from ansibullbot.utils.cache_store import migrate
+from ansibullbot.utils.cache_store import SqliteCacheStore
+
+
+def test_cache_root():
+    assert cache_root('/cache', 'ansible/ansible') == '/cache'
+    assert cache_root('/cache/ansible/ansible', 'ansible/ansible') == '/cache'
+    assert cache_root('/cache/ansible/ansible/issues', 'ansible/ansible') == '/cache'
+
+
+def test_sqlite_cache_store():
+    with tempfile.TemporaryDirectory() as cachedir:
+        store = SqliteCacheStore(os.path.join(cachedir, 'issues.sqlite'))
+        history = {'updated_at': datetime.datetime(2020, 5, 31), 'history': []}
+
+        store.set('ansible/ansible', 1, 'history', history)
+        store.set('ansible/ansible', 1, 'meta', {'time': '2020-05-31T10:02:20'})
+        store.set_many('ansible/ansible', 'meta', {2: {'time': 'x'}, 3: {'time': 'y'}})
+        store.set('ansible/other', 1, 'meta', {'time': 'z'})
+
+        assert store.get('ansible/ansible', 1, 'history') == history
+        assert store.get('ansible/ansible', 4, 'meta') is None
+        assert store.get_many('ansible/ansible', [1, 3, 4], 'meta') == {
+            1: {'time': '2020-05-31T10:02:20'},
+            3: {'time': 'y'},
+        }
+        assert [x[0] for x in store.items('ansible/ansible', 'meta')] == [1, 2, 3]
+
+        store.delete('ansible/ansible', 1)
+        assert store.get('ansible/ansible', 1, 'history') is None
+        assert store.get('ansible/other', 1, 'meta') == {'time': 'z'}
+
+        # a schema bump drops the old rows instead of misreading them
+        SqliteCacheStore.SCHEMA_VERSION += 1
+        try:
+            store = SqliteCacheStore(os.path.join(cachedir, 'issues.sqlite'))
+            assert store.get('ansible/other', 1, 'meta') is None
+        finally:
+            SqliteCacheStore.SCHEMA_VERSION -= 1
+
+
+def test_migrate():
+    with tempfile.TemporaryDirectory() as cachedir:
+        source = FileCacheStore(cachedir)
+        source.set('ansible/ansible', 1, 'meta', {'time': '2020-05-31T10:02:20'})
+        source.set('ansible/ansible', 1, 'files', [datetime.datetime(2020, 5, 31), []])
+        source.set('ansible/ansible', 2, 'timeline_data', [{'event': 'labeled'}])
+        assert os.path.isfile(os.path.join(cachedir, 'ansible', 'ansible', 'issues', '1', 'meta.json'))
+
+        dest = SqliteCacheStore(os.path.join(cachedir, 'issues.sqlite'))
+        counts = migrate(source, dest, remove=True)
+
+        assert counts == {'ansible/ansible': 3}
+        assert dest.get('ansible/ansible', 1, 'meta') == {'time': '2020-05-31T10:02:20'}
+        assert dest.get('ansible/ansible', 1, 'files') == [datetime.datetime(2020, 5, 31), []]
+        assert dest.get('ansible/ansible', 2, 'timeline_data') == [{'event': 'labeled'}]
+        assert source.get('ansible/ansible', 1, 'meta') is None
+
+
+def test_triaged_since():
+    with tempfile.TemporaryDirectory() as cachedir:
+        now = datetime.datetime.now()
+        old = now - datetime.timedelta(days=10)
+
+        # metas written before the index existed are backfilled
+        store = SqliteCacheStore(os.path.join(cachedir, 'issues.sqlite'))
+        store.set('ansible/ansible', 1, 'meta', {'time': old.isoformat()})
+        store.conn.execute('DROP TABLE triage_index')
+        store = SqliteCacheStore(os.path.join(cachedir, 'issues.sqlite'))
+
+        for number, ts in [(2, now), (3, old)]:
+            meta = {'time': ts.isoformat(), 'updated_at': '2020-05-31T10:02:20'}
+            store.set('ansible/ansible', number, 'meta', meta)
+            store.set_triaged('ansible/ansible', number, meta)
+
+        since = time.time() - 8 * 86400
+        assert store.get_triaged_since('ansible/ansible', since) == {2}
+        assert store.get_triaged_since('ansible/ansible', since - 3 * 86400) == {1, 2, 3}
+
+        store.delete('ansible/ansible', 2)
+        assert store.get_triaged_since('ansible/ansible', since) == set()
@@ -1,11 +1,19 @@
+import difflib
+import os
 import shutil
 import tempfile
 from unittest import TestCase
+from unittest import mock
 
 import pytest
 
 from ansibullbot.utils.component_tools import AnsibleComponentMatcher as ComponentMatcher
+from ansibullbot.utils.component_tools import FilepathIndex
 from ansibullbot.utils.component_tools import make_prefixes
+from ansibullbot.utils.component_tools import ModuleIndex
+from ansibullbot.utils.component_tools import PatternSet
+from ansibullbot.utils.component_tools import REGEX_GENERIC
+from ansibullbot.utils.component_tools import REGEX_MODULES
 from ansibullbot.utils.git_tools import GitRepoWrapper
 from ansibullbot.utils.systemtools import run_command
 
@@ -21,6 +29,72 @@ class TestMakePrefixes(TestCase):
         assert prefixes[-1] == 'l'
 
 
+class TestFilepathIndex(TestCase):
+
+    def test_lookups(self):
+        index = FilepathIndex([
+            'lib/ansible/modules/network/ios/ios_config.py',
+            'lib/ansible/plugins/action/ios_config.py',
+            'test/units/modules/network/ios/test_ios_config.py',
+        ])
+        assert index.endswith('ios_config.py') == [1, 0, 2]
+        assert index.endswith('action/ios_config.py') == [1]
+        assert index.endswith('nope.py') == []
+
+        counts = index.segment_counts(['network', 'ios', 'ios_config'])
+        assert counts == {0: 3, 2: 2, 1: 1}
+
+
+class TestModuleIndex(TestCase):
+
+    def test_lookups(self):
+        modules = {}
+        for fn in ['modules/cloud/ec2_vpc_net.py', 'modules/cloud/_ec2_vpc.py', 'modules/ec2_vpc_nat.py', 'modules/copy.py']:
+            name = fn.split('/')[-1].split('.')[0]
+            modules[fn] = {'name': name, 'repo_filename': fn}
+        index = ModuleIndex(modules)
+
+        assert index.by_name(['ec2_vpc', '_ec2_vpc'])['repo_filename'] == 'modules/cloud/_ec2_vpc.py'
+        assert index.by_name(['nope']) is None
+        assert index.by_key('modules/copy.py')['name'] == 'copy'
+
+        for pattern in ['ec2_vpc_nt', 'ec2_vpcnet', 'cpy', 'ec2']:
+            expected = [
+                v for v in modules.values()
+                if difflib.SequenceMatcher(None, v['name'], pattern).quick_ratio() > .9
+            ]
+            assert index.close_matches(pattern) == expected
+
+
+class TestPatternSet(TestCase):
+
+    def test_same_hits_as_matching_each_pattern(self):
+        bodies = [
+            'the copy module',
+            'module: ec2_instance',
+            'docker_container and docker_image modules',
+            'foo.py',
+            'aws_s3 jinja2 filter',
+            'stdout callback yaml',
+            'nothing to see here',
+            'lib/ansible/module_utils/basic.py',
+        ]
+        for patternset in (REGEX_MODULES, REGEX_GENERIC):
+            for body in bodies:
+                expected = [
+                    (idx, x.match(body).groups()) for idx, x in enumerate(patternset.patterns)
+                    if x.match(body)
+                ]
+                assert [(idx, x.groups()) for idx, x in patternset.matches(body)] == expected
+
+    def test_first_match(self):
+        patternset = PatternSet([r'all (\S+) modules', r'(\S+) (\S+) modules'])
+        idx, mobj = patternset.match('all aws modules')
+        assert (idx, mobj.group(1)) == (0, 'aws')
+        assert patternset.match('all aws modules', 1)[1].group(1) == 'all'
+        assert patternset.match('nope') == (None, None)
+
+
 class GitShallowRepo(GitRepoWrapper):
     """Perform a shallow copy"""
 
@@ -604,3 +678,177 @@ class TestComponentMatcherInheritance(TestCase):
 
         # make sure the support level is applied
         assert result['support'] == 'core'
+
+
+def make_local_repo(path, files):
+    for fn, data in files.items():
+        fp = os.path.join(path, fn)
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        with open(fp, 'w') as f:
+            f.write(data)
+    cmd = (
+        'cd %s; git init -q; git add -A; '
+        'git -c user.name=bot -c user.email=bot@example.com commit -q -m files' % path
+    )
+    (rc, so, se) = run_command(cmd)
+    assert rc == 0, se
+
+
+def test_match_cache_until_the_checkout_changes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        srcdir = os.path.join(tmpdir, 'src')
+        make_local_repo(srcdir, {
+            'plugins/modules/copy.py': '',
+            'plugins/modules/ec2_instance.py': '',
+        })
+        gitrepo = GitRepoWrapper(cachedir=os.path.join(tmpdir, 'cache'), repo=srcdir)
+        cm = ComponentMatcher(
+            gitrepo=gitrepo, email_cache={}, usecache=True, cachedir=os.path.join(tmpdir, 'cache')
+        )
+
+        first = cm.match_components('copy fails', None, 'plugins/modules/copy.py')
+        assert [x['repo_filename'] for x in first] == ['plugins/modules/copy.py']
+        assert (cm.match_cache_hits, cm.match_cache_misses) == (0, 1)
+        strategies = cm.strategies
+
+        with mock.patch.object(cm, '_match_filenames') as match_filenames:
+            # only the words in the title that change a match are part of the key
+            assert cm.match_components('copy breaks', None, 'plugins/modules/copy.py') == first
+            assert cm.strategies == strategies
+        assert not match_filenames.called
+        assert (cm.match_cache_hits, cm.match_cache_misses) == (1, 1)
+
+        cm.match_components('copy module fails', None, 'plugins/modules/copy.py')
+        assert (cm.match_cache_hits, cm.match_cache_misses) == (1, 2)
+
+        # a new commit starts over
+        make_local_repo(srcdir, {'plugins/modules/ping.py': ''})
+        run_command('cd %s; git pull -q' % gitrepo.checkoutdir)
+        cm.update()
+        cm.match_components('copy fails', None, 'plugins/modules/copy.py')
+        assert (cm.match_cache_hits, cm.match_cache_misses) == (1, 3)
+
+
+def test_index_files_only_reads_changed_modules():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        srcdir = os.path.join(tmpdir, 'src')
+        cachedir = os.path.join(tmpdir, 'cache')
+        make_local_repo(srcdir, {
+            'plugins/modules/copy.py': '',
+            'plugins/modules/ec2_instance.py': '',
+        })
+        run_command('cd %s; git branch stable-2.9' % srcdir)
+        gitrepo = GitRepoWrapper(cachedir=cachedir, repo=srcdir)
+
+        def get_matcher():
+            return ComponentMatcher(gitrepo=gitrepo, email_cache={}, usecache=True, cachedir=cachedir)
+
+        with mock.patch.object(ComponentMatcher, 'get_module_meta', autospec=True, return_value={}) as get_module_meta, \
+                mock.patch.object(gitrepo, 'list_files_by_branch', wraps=gitrepo.list_files_by_branch) as list_files_by_branch:
+            get_matcher()
+            assert get_module_meta.call_count == 2
+            get_matcher()
+            assert get_module_meta.call_count == 2
+
+            make_local_repo(srcdir, {
+                'plugins/modules/copy.py': '# changed',
+                'plugins/modules/ping.py': '',
+            })
+            gitrepo.update()
+            cm = get_matcher()
+
+        assert sorted(x[0][2] for x in get_module_meta.call_args_list[2:]) == [
+            'plugins/modules/copy.py', 'plugins/modules/ping.py'
+        ]
+        assert sorted(cm.MODULES) == [
+            'plugins/modules/copy.py', 'plugins/modules/ec2_instance.py', 'plugins/modules/ping.py'
+        ]
+        # the frozen branch was listed once
+        assert list_files_by_branch.call_count == 1
+
+
+def test_module_authors_cached_by_content():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        srcdir = os.path.join(tmpdir, 'src')
+        cachedir = os.path.join(tmpdir, 'cache')
+        doc = 'DOCUMENTATION = """\nauthor: %s\n"""\n'
+        make_local_repo(srcdir, {
+            'plugins/modules/cloud/setup.py': doc % 'Foo (@foo)',
+            'plugins/modules/system/setup.py': doc % 'Bar (@bar)',
+            'plugins/modules/mail.py': doc % 'Baz <baz@example.com>',
+        })
+        gitrepo = GitRepoWrapper(cachedir=cachedir, repo=srcdir)
+
+        def get_matcher(email_cache):
+            return ComponentMatcher(gitrepo=gitrepo, email_cache=email_cache, usecache=True, cachedir=tmpdir)
+
+        cm = get_matcher({})
+        # the same basename no longer shares a cache entry
+        assert cm.MODULES['plugins/modules/cloud/setup.py']['authors'] == ['foo']
+        assert cm.MODULES['plugins/modules/system/setup.py']['authors'] == ['bar']
+        assert cm.MODULES['plugins/modules/mail.py']['authors'] == []
+
+        # a new matcher reads what was extracted before, the emails resolve against its cache
+        shutil.rmtree(os.path.join(tmpdir, 'component_index'))
+        with mock.patch('ansibullbot.utils.component_tools.ModuleExtractor.get_author_record') as get_author_record:
+            cm = get_matcher({'baz@example.com': 'baz'})
+        assert not get_author_record.called
+        assert cm.MODULES['plugins/modules/mail.py']['authors'] == ['baz']
+
+
+def test_module_and_botmeta_share_one_record():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        srcdir = os.path.join(tmpdir, 'src')
+        make_local_repo(srcdir, {
+            'plugins/modules/cloud/setup.py': 'DOCUMENTATION = """\nauthor: Foo (@foo)\n"""\n',
+        })
+        gitrepo = GitRepoWrapper(cachedir=os.path.join(tmpdir, 'cache'), repo=srcdir)
+        botmeta = {'files': {'plugins/modules/cloud/setup.py': {'maintainers': ['bar'], 'labels': ['cloud']}}}
+
+        cm = ComponentMatcher(gitrepo=gitrepo, botmeta=botmeta, email_cache={}, cachedir=tmpdir)
+
+        filename = 'plugins/modules/cloud/setup.py'
+        assert cm.MODULES[filename] is botmeta['files'][filename]
+        assert cm.MODULES[filename]['name'] == 'setup'
+        assert sorted(cm.MODULES[filename]['maintainers']) == ['bar', 'foo']
+        assert cm.MODULES[filename]['authors'] == ['foo']
+        # reads hand out copies, the shared record does not change
+        cm.MODULES[filename]['authors'].append('baz')
+        assert cm.MODULES[filename]['authors'] == ['foo']
+
+
+def test_match_many_same_as_one_by_one():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        srcdir = os.path.join(tmpdir, 'src')
+        make_local_repo(srcdir, {
+            'plugins/modules/copy.py': '',
+            'plugins/modules/ping.py': '',
+            'plugins/modules/cloud/ec2_instance.py': '',
+        })
+        gitrepo = GitRepoWrapper(cachedir=os.path.join(tmpdir, 'cache'), repo=srcdir)
+        cm = ComponentMatcher(gitrepo=gitrepo, email_cache={}, cachedir=tmpdir)
+        cm.MATCH_MANY_CHUNK = 2
+
+        components = ['copy', 'ping module', 'copy', 'ec2_instance', 'nosuchthing', '']
+        expected = []
+        for component in dict.fromkeys(components):
+            if component:
+                matches = cm.match_components('', '', component)
+                expected.append((component, matches, cm.strategies))
+
+        assert list(cm.match_many(components, workers=1)) == expected
+        assert list(cm.match_many(components, workers=3)) == expected
+
+        filenames = ['plugins/modules/ping.py', 'plugins/modules/copy.py']
+        assert [(x[0], x[1]) for x in cm.match_many(filenames, files=True, workers=2)] == [
+            (x, cm.match_components('', '', None, files=[x])) for x in filenames
+        ]
+
+        # the stored matches are read and written by the parent
+        cm = ComponentMatcher(gitrepo=gitrepo, email_cache={}, usecache=True, cachedir=tmpdir)
+        assert list(cm.match_many(components, workers=2)) == expected
+        assert (cm.match_cache_hits, cm.match_cache_misses) == (0, 4)
+        with mock.patch.object(cm, '_match_filenames') as match_filenames:
+            assert list(cm.match_many(components, workers=2)) == expected
+        assert not match_filenames.called
+        assert (cm.match_cache_hits, cm.match_cache_misses) == (4, 4)
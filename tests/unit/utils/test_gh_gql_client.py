@@ -0,0 +1,254 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from ansibullbot.utils.gh_gql_client import GithubGraphQLClient
+from ansibullbot.utils.gh_gql_client import timeline_item_to_event
+from ansibullbot.utils.rate_scheduler import RateScheduler
+
+
+class ResponseMock:
+    ok = True
+    status_code = 200
+    headers = {}
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+def test_timeline_item_to_event():
+    comment = timeline_item_to_event({
+        '__typename': 'IssueComment',
+        'id': 'IC_1',
+        'databaseId': 100,
+        'createdAt': '2020-05-31T10:02:20Z',
+        'author': {'login': 'jdoe'},
+        'body': 'shipit',
+    })
+    assert comment == {
+        'event': 'commented',
+        'id': 100,
+        'node_id': 'IC_1',
+        'created_at': '2020-05-31T10:02:20Z',
+        'actor': {'login': 'jdoe'},
+        'body': 'shipit',
+    }
+
+    labeled = timeline_item_to_event({
+        '__typename': 'LabeledEvent',
+        'id': 'LE_1',
+        'createdAt': '2020-05-31T10:02:20Z',
+        'actor': None,
+        'label': {'name': 'needs_info'},
+    })
+    assert labeled['event'] == 'labeled'
+    assert labeled['actor'] == {'login': None}
+    assert labeled['label'] == {'name': 'needs_info'}
+
+
+@mock.patch('ansibullbot.utils.gh_gql_client.requests.post')
+def test_get_issue_nodes(mock_post):
+    timeline = {
+        'pageInfo': {'hasNextPage': False},
+        'nodes': [{
+            '__typename': 'ClosedEvent',
+            'id': 'CE_1',
+            'createdAt': '2020-05-31T10:02:20Z',
+            'actor': {'login': 'jdoe'},
+        }],
+    }
+    mock_post.side_effect = [
+        ResponseMock({'data': {'repository': {
+            'n1': {'number': 1, 'updatedAt': '2020-05-31T10:02:20Z', 'timelineItems': timeline},
+            'n2': None,
+        }}}),
+        ResponseMock({'data': {'repository': {
+            'n3': {
+                'number': 3,
+                'updatedAt': '2020-05-31T10:02:20Z',
+                'timelineItems': {'pageInfo': {'hasNextPage': True}, 'nodes': []},
+                'reviews': {'pageInfo': {'hasNextPage': False}, 'nodes': [{
+                    'id': 'PRR_1',
+                    'databaseId': 7,
+                    'author': {'login': 'jdoe'},
+                    'state': 'APPROVED',
+                    'submittedAt': '2020-05-31T10:02:20Z',
+                    'body': '',
+                    'commit': {'oid': 'abc'},
+                }]},
+            },
+        }}}),
+    ]
+
+    gqlc = GithubGraphQLClient('token')
+    nodes = gqlc.get_issue_nodes('ansible/ansible', [1, 2, 3], batch_size=2)
+
+    assert mock_post.call_count == 2
+    assert sorted(nodes) == [1, 3]
+    assert [x['event'] for x in nodes[1]['timeline']] == ['closed']
+    assert nodes[1]['reviews'] is None
+
+    # a timeline that does not fit in one page is left to the rest api
+    assert nodes[3]['timeline'] is None
+    assert nodes[3]['reviews'][0]['user'] == {'login': 'jdoe'}
+    assert nodes[3]['reviews'][0]['commit_id'] == 'abc'
+
+
+@mock.patch('ansibullbot.utils.gh_gql_client.requests.post')
+def test_get_issue_nodes_rest_format(mock_post):
+    actor = {'name': 'J Doe', 'email': 'jdoe@example.com', 'date': '2020-05-31T12:02:20+02:00', 'user': {'login': 'jdoe'}}
+    mock_post.return_value = ResponseMock({'data': {'repository': {'n5': {
+        'number': 5,
+        'updatedAt': '2020-05-31T10:02:20Z',
+        'databaseId': 500,
+        'id': 'PR_5',
+        'url': 'https://github.com/ansible/ansible/pull/5',
+        'title': 'fix foo',
+        'body': 'body',
+        'state': 'OPEN',
+        'createdAt': '2020-05-30T10:02:20Z',
+        'closedAt': None,
+        'author': {'__typename': 'Bot', 'login': 'dependabot'},
+        'labels': {'nodes': [{'name': 'bug', 'color': 'fc2929'}]},
+        'assignees': {'nodes': []},
+        'milestone': None,
+        'timelineItems': {'pageInfo': {'hasNextPage': False}, 'nodes': []},
+        'reviews': {'pageInfo': {'hasNextPage': False}, 'nodes': []},
+        'files': {'pageInfo': {'hasNextPage': False}, 'nodes': [
+            {'path': 'docs/foo.rst', 'additions': 2, 'deletions': 1, 'changeType': 'MODIFIED'},
+            {'path': 'lib/foo.py', 'additions': 3, 'deletions': 0, 'changeType': 'ADDED'},
+        ]},
+        'commits': {'pageInfo': {'hasNextPage': False}, 'nodes': [{'commit': {
+            'oid': 'abc',
+            'url': 'https://github.com/ansible/ansible/commit/abc',
+            'message': 'fix foo',
+            'author': actor,
+            'committer': dict(actor, user=None),
+            'parents': {'nodes': [{'oid': 'def'}]},
+        }}]},
+    }}}})
+
+    gqlc = GithubGraphQLClient('token')
+    node = gqlc.get_issue_nodes('ansible/ansible', [5])[5]
+
+    query = mock_post.call_args[1]['data']
+    assert 'labels(first: 100)' in query and 'files(first: 100)' in query
+    assert node['issue']['url'] == 'https://api.github.com/repos/ansible/ansible/issues/5'
+    assert node['issue']['pull_request']['url'] == 'https://api.github.com/repos/ansible/ansible/pulls/5'
+    assert node['issue']['user'] == {'login': 'dependabot[bot]', 'type': 'Bot'}
+    assert node['issue']['state'] == 'open'
+    assert node['issue']['labels'] == [{'name': 'bug', 'color': 'fc2929'}]
+    assert [(x['filename'], x['status'], x['changes']) for x in node['files']] == [
+        ('docs/foo.rst', 'modified', 3),
+        ('lib/foo.py', 'added', 3),
+    ]
+    assert node['commits'][0]['url'] == 'https://api.github.com/repos/ansible/ansible/commits/abc'
+    assert node['commits'][0]['author'] == {'login': 'jdoe'}
+    assert node['commits'][0]['committer'] is None
+    assert node['commits'][0]['parents'] == [{'sha': 'def'}]
+
+    # a modified python file needs the patch only the rest api has
+    node = gqlc.update_issue_node({
+        'number': 6,
+        'timelineItems': {'pageInfo': {'hasNextPage': False}, 'nodes': []},
+        'files': {'pageInfo': {'hasNextPage': False}, 'nodes': [
+            {'path': 'lib/foo.py', 'additions': 3, 'deletions': 1, 'changeType': 'MODIFIED'},
+        ]},
+    })
+    assert node['issue'] is None
+    assert node['files'] is None
+
+
+def _summaries_page(numbers, has_next, remaining=4000):
+    return ResponseMock({'data': {
+        'repository': {'issues': {
+            'pageInfo': {'endCursor': 'c%s' % numbers[-1], 'hasNextPage': has_next},
+            'edges': [{'node': {'number': x, 'state': 'OPEN'}} for x in numbers],
+        }},
+        'rateLimit': {'limit': 5000, 'cost': 1, 'remaining': remaining, 'resetAt': '2099-01-01T00:00:00Z'},
+    }})
+
+
+@mock.patch('ansibullbot.utils.gh_gql_client.time.sleep')
+@mock.patch('ansibullbot.utils.gh_gql_client.SCHEDULER', new_callable=lambda: RateScheduler(reserve=0))
+@mock.patch('ansibullbot.utils.gh_gql_client.requests.post')
+def test_get_summaries_shrinks_failing_pages(mock_post, mock_scheduler, mock_sleep):
+    mock_post.side_effect = [
+        _summaries_page([1, 2], True),
+        ResponseMock({'errors': [{'message': 'Something went wrong while executing your query.'}]}),
+        _summaries_page([3], False, remaining=3990),
+    ]
+
+    gqlc = GithubGraphQLClient('token')
+    nodes = gqlc.get_summaries('ansible', 'ansible', otype='issues')
+
+    assert [x['number'] for x in nodes] == [1, 2, 3]
+    queries = [x[1]['data'] for x in mock_post.call_args_list]
+    assert 'first: 100' in queries[0]
+    assert 'first: 50' in queries[2] and 'after: \\"c2\\"' in queries[2]
+    assert 'rateLimit' in queries[0]
+    assert mock_scheduler.remaining('graphql') == 3990
+    assert gqlc.ratelimit['remaining'] == 3990
+
+
+@mock.patch('ansibullbot.utils.gh_gql_client.time.sleep')
+@mock.patch('ansibullbot.utils.gh_gql_client.requests.post')
+def test_get_summaries_raises_instead_of_truncating(mock_post, mock_sleep):
+    failed = ResponseMock(None)
+    failed.ok = False
+    failed.status_code = 502
+    mock_post.return_value = failed
+
+    gqlc = GithubGraphQLClient('token')
+    with pytest.raises(requests.exceptions.RetryError):
+        gqlc.get_summaries('ansible', 'ansible', otype='issues')
+    assert mock_post.call_count == GithubGraphQLClient.PAGE_RETRIES
+
+
+@mock.patch('ansibullbot.utils.gh_gql_client.time.sleep')
+@mock.patch('ansibullbot.utils.gh_gql_client.SCHEDULER', new_callable=lambda: RateScheduler(reserve=0))
+@mock.patch('ansibullbot.utils.gh_gql_client.requests.post')
+def test_get_summaries_retries_timeouts_within_budget(mock_post, mock_scheduler, mock_sleep):
+    mock_scheduler.update('graphql', 5000, 0, 4070908800)
+    mock_scheduler.wait = lambda bucket: None
+    mock_post.side_effect = [
+        requests.exceptions.ReadTimeout(),
+        requests.exceptions.ConnectionError(),
+        _summaries_page([1], False),
+    ]
+
+    gqlc = GithubGraphQLClient('token')
+    nodes = gqlc.get_summaries('ansible', 'ansible', otype='issues')
+
+    assert [x['number'] for x in nodes] == [1]
+    assert all(x[1]['timeout'] == GithubGraphQLClient.TIMEOUT for x in mock_post.call_args_list)
+    queries = [x[1]['data'] for x in mock_post.call_args_list]
+    # a drained budget only asks for the smallest pages
+    assert all('first: 10,' in x or 'first: 10)' in x for x in queries)
+
+
+@mock.patch('ansibullbot.utils.gh_gql_client.SCHEDULER', new_callable=lambda: RateScheduler(reserve=0))
+@mock.patch('ansibullbot.utils.gh_gql_client.requests.post')
+def test_get_issue_nodes_fits_the_budget(mock_post, mock_scheduler):
+    timeline = {'pageInfo': {'hasNextPage': False}, 'nodes': []}
+    mock_scheduler.update('graphql', 5000, 3, 4070908800)
+    mock_scheduler.wait = lambda bucket: None
+    mock_post.return_value = ResponseMock({'data': {
+        'repository': {'n1': {'number': 1, 'updatedAt': '2020-05-31T10:02:20Z', 'timelineItems': timeline}},
+        'rateLimit': {'limit': 5000, 'cost': 1, 'remaining': 0, 'resetAt': '2099-01-01T00:00:00Z'},
+    }})
+
+    gqlc = GithubGraphQLClient('token')
+    gqlc.node_cost = 1.0
+    nodes = gqlc.get_issue_nodes('ansible/ansible', list(range(1, 11)), batch_size=10)
+
+    # 3 points cover 6 nodes without reviews, the rest is left to the rest api
+    assert mock_post.call_count == 1
+    query = mock_post.call_args[1]['data']
+    assert query.count('issueOrPullRequest') == 6
+    assert 'reviews(' not in query
+    assert sorted(nodes) == [1]
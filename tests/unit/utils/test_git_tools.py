@@ -0,0 +1,207 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+from unittest import mock
+
+from ansibullbot.utils.git_tools import GitRepoWrapper
+from ansibullbot.utils.systemtools import run_command
+
+
+def test_get_files_force_rebuilds():
+    with tempfile.TemporaryDirectory() as cachedir:
+        gr = GitRepoWrapper(cachedir, None)
+        gr.checkoutdir = os.path.realpath(cachedir)
+        with open(os.path.join(cachedir, 'a.py'), 'w') as f:
+            f.write('')
+
+        assert gr.files == ['a.py']
+        version = gr.files_version
+
+        with open(os.path.join(cachedir, 'b.py'), 'w') as f:
+            f.write('')
+        gr.get_files(force=True)
+
+        assert sorted(gr.files) == ['a.py', 'b.py']
+        assert gr.files_version == version + 1
+
+
+def test_get_files_from_git():
+    with tempfile.TemporaryDirectory() as cachedir:
+        checkoutdir = os.path.realpath(cachedir)
+        for fn in ['plugins/modules/ping.py', 'plugins/modules/cloud/ec2.py', 'plugins/module_utils/ping.py', 'README.md']:
+            os.makedirs(os.path.dirname(os.path.join(checkoutdir, fn)), exist_ok=True)
+            with open(os.path.join(checkoutdir, fn), 'w') as f:
+                f.write(fn)
+        run_command(
+            'cd %s; git init -q; git add -A; git -c user.name=foo -c user.email=foo@example.com commit -q -m init'
+            % checkoutdir
+        )
+
+        gr = GitRepoWrapper(cachedir, None)
+        gr.checkoutdir = checkoutdir
+        gr.get_files(force=True)
+        gr.get_files(force=True)
+
+        # no .git internals and no duplicates
+        assert gr.files == [
+            'README.md', 'plugins/module_utils/ping.py', 'plugins/modules/cloud/ec2.py', 'plugins/modules/ping.py'
+        ]
+        assert gr.module_files == ['plugins/modules/cloud/ec2.py', 'plugins/modules/ping.py']
+        assert gr.exists('plugins/modules/ping.py')
+        assert not gr.exists('plugins/modules')
+        assert gr.find('ping.py') == {'plugins/modules/ping.py', 'plugins/module_utils/ping.py'}
+        assert gr.find('README.md') == 'README.md'
+
+        gr.context = 'plugins/modules'
+        gr.get_files(force=True)
+        assert gr.files == ['cloud/ec2.py', 'ping.py']
+        assert gr.exists('ping.py') and not gr.exists('README.md')
+
+        # the list of a commit is read from git once
+        gr = GitRepoWrapper(cachedir, None)
+        gr.checkoutdir = checkoutdir
+        with mock.patch('ansibullbot.utils.git_tools.run_command', wraps=run_command) as rc:
+            assert len(gr.files) == 4
+        assert not [x for x in rc.call_args_list if 'ls-tree' in x[0][0]]
+
+
+def test_objects_match_git():
+    with tempfile.TemporaryDirectory() as cachedir:
+        checkoutdir = os.path.realpath(cachedir)
+        git = 'cd %s; git -c user.name=foo -c user.email=foo@example.com ' % checkoutdir
+        os.makedirs(os.path.join(checkoutdir, 'plugins/modules'))
+        for fn in ['plugins/modules/ping.py', 'plugins/modules/old.py', 'README.md']:
+            with open(os.path.join(checkoutdir, fn), 'w') as f:
+                f.write('# %s\ndata\n' % fn)
+        run_command('cd %s; git init -q; git add -A' % checkoutdir)
+        run_command(git + 'commit -q -m init')
+        run_command(git + 'mv plugins/modules/ping.py plugins/modules/pong.py')
+        with open(os.path.join(checkoutdir, 'README.md'), 'a') as f:
+            f.write('more\n')
+        run_command(git + 'rm -q plugins/modules/old.py; git add -A')
+        run_command(git + 'commit -q -m change')
+
+        gr = GitRepoWrapper(cachedir, None)
+        gr.checkoutdir = checkoutdir
+        (rc_, so, se) = run_command('cd %s; git ls-tree -r --name-only HEAD~1' % checkoutdir)
+        tree = so.decode('utf-8').split()
+        (rc_, so, se) = run_command('cd %s; git rev-parse HEAD' % checkoutdir)
+        head = so.decode('utf-8').strip()
+
+        popen = subprocess.Popen
+        with mock.patch('ansibullbot.utils.git_tools.run_command') as rc, \
+                mock.patch('subprocess.Popen', side_effect=popen) as spawned:
+            assert gr.list_files_by_branch('HEAD~1') == tree
+            # the old name of an exact rename is not reported
+            assert sorted(gr.get_files_by_commit(head)) == [
+                'README.md', 'plugins/modules/old.py', 'plugins/modules/pong.py'
+            ]
+            assert gr.list_files_by_branch('HEAD') == gr.list_files_by_branch(head)
+
+        # one batch and one batch-check process serve every lookup
+        assert not rc.called
+        assert spawned.call_count == 2
+
+        # a deleted file is read from the commit before the one that removed it
+        assert gr.existed('plugins/modules/old.py')
+        assert gr.get_file_content('plugins/modules/old.py') is None
+        assert gr.get_file_content('plugins/modules/old.py', follow=True) == b'# plugins/modules/old.py\ndata'
+        assert gr.get_file_content('plugins/modules/nope.py', follow=True) == b''
+
+        procs = list(gr.objects._procs.values())
+        gr.objects.close()
+        assert all(x.poll() is not None for x in procs)
+
+
+def test_commits_by_email_index():
+    with tempfile.TemporaryDirectory() as cachedir:
+        checkoutdir = os.path.realpath(cachedir)
+        run_command('cd %s; git init -q' % checkoutdir)
+
+        def commit(email, files):
+            for fn in files:
+                with open(os.path.join(checkoutdir, fn), 'a') as f:
+                    f.write('%s\n' % email)
+            run_command(
+                'cd %s; git add -A; git -c user.name=foo -c user.email=%s commit -q -m change'
+                % (checkoutdir, email)
+            )
+
+        commit('foo@example.com', ['a.py', 'b.py'])
+        commit('bar@example.com', ['b.py'])
+        commit('foo@example.com', ['b.py', 'c.py'])
+
+        gr = GitRepoWrapper(cachedir, None)
+        gr.checkoutdir = checkoutdir
+        assert gr.get_commits_by_email(['foo@example.com', 'nobody@example.com']) == {
+            'foo@example.com': {'commit_count': 2, 'commit_count_byfile': {'a.py': 1, 'b.py': 2, 'c.py': 1}},
+            'nobody@example.com': {'commit_count': 0, 'commit_count_byfile': {}},
+        }
+
+        # a new commit only reads the commits since the indexed HEAD
+        commit('bar@example.com', ['a.py'])
+        gr = GitRepoWrapper(cachedir, None)
+        gr.checkoutdir = checkoutdir
+        with mock.patch('ansibullbot.utils.git_tools.run_command', wraps=run_command) as rc:
+            email_map = gr.get_commits_by_email('bar@example.com')
+        assert email_map == {'bar@example.com': {'commit_count': 2, 'commit_count_byfile': {'a.py': 1, 'b.py': 1}}}
+        logs = [x[0][0] for x in rc.call_args_list if ' log ' in x[0][0]]
+        assert len(logs) == 1 and '..' in logs[0]
+
+        # and the index is read back without git log
+        gr = GitRepoWrapper(cachedir, None)
+        gr.checkoutdir = checkoutdir
+        with mock.patch('ansibullbot.utils.git_tools.run_command', wraps=run_command) as rc:
+            assert gr.get_commits_by_email('foo@example.com')['foo@example.com']['commit_count'] == 2
+        assert not [x for x in rc.call_args_list if ' log ' in x[0][0]]
+
+
+def test_sparse_checkout_strategy():
+    with tempfile.TemporaryDirectory() as cachedir:
+        origin = os.path.join(os.path.realpath(cachedir), 'origin')
+        git = 'cd %s; git -c user.name=foo -c user.email=foo@example.com ' % origin
+        for fn in ['plugins/modules/ping.py', 'docs/ping.md', 'README.md']:
+            os.makedirs(os.path.dirname(os.path.join(origin, fn)), exist_ok=True)
+            with open(os.path.join(origin, fn), 'w') as f:
+                f.write('# %s\n' % fn)
+        run_command('cd %s; git init -q; git config uploadpack.allowfilter true; git add -A' % origin)
+        run_command(git + 'commit -q -m init')
+
+        gr = GitRepoWrapper(os.path.join(cachedir, 'checkouts'), 'file://' + origin, clone_strategy='sparse')
+
+        (rc, so, se) = run_command('cd %s; git config remote.origin.partialclonefilter' % gr.checkoutdir)
+        assert so.decode('utf-8').strip() == 'blob:none'
+        assert os.path.exists(os.path.join(gr.checkoutdir, 'plugins/modules/ping.py'))
+        assert os.path.exists(os.path.join(gr.checkoutdir, 'README.md'))
+        assert not os.path.exists(os.path.join(gr.checkoutdir, 'docs'))
+
+        # what the worktree leaves out is still known and readable
+        assert 'docs/ping.md' in gr.files
+        assert gr.isdir('docs') and not gr.isdir('nope')
+        assert gr.get_file_content('docs/ping.md') == '# docs/ping.md\n'
+
+        # a local commit does not get in the way of the update
+        with open(os.path.join(gr.checkoutdir, 'README.md'), 'a') as f:
+            f.write('local\n')
+        run_command('cd %s; git -c user.name=foo -c user.email=foo@example.com commit -q -am local' % gr.checkoutdir)
+        with open(os.path.join(origin, 'plugins/modules/ping.py'), 'a') as f:
+            f.write('upstream\n')
+        run_command(git + 'commit -q -am upstream')
+
+        with mock.patch.object(gr, 'create_checkout') as create_checkout:
+            assert gr.update_checkout()
+        assert not create_checkout.called
+        (rc, so, se) = run_command('cd %s; git rev-parse HEAD' % origin)
+        assert gr.head == so.decode('utf-8').strip()
+        with open(os.path.join(gr.checkoutdir, 'README.md')) as f:
+            assert 'local' not in f.read()
+        assert not gr.update_checkout()
+
+        # a failed fetch keeps the checkout instead of cloning again
+        shutil.move(origin, origin + '.moved')
+        with mock.patch.object(gr, 'create_checkout') as create_checkout:
+            assert not gr.update_checkout()
+        assert not create_checkout.called
+        assert gr.head == so.decode('utf-8').strip()
@@ -1,6 +1,8 @@
+import os
+import tempfile
 import unittest
 
-from ansibullbot.utils.extractors import ModuleExtractor
+from ansibullbot.utils.extractors import extract_author_records, ModuleExtractor
 
 
 class TestGitHubIdExtractor(unittest.TestCase):
@@ -50,3 +52,19 @@ class TestGitHubIdExtractor(unittest.TestCase):
 
         for line, githubids in authors:
             self.assertEqual(set(githubids), set(ME.extract_github_id(line)))
+
+    def test_extract_author_records_pooled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepaths = []
+            for idx in range(6):
+                filepath = os.path.join(tmpdir, 'mod%s.py' % idx)
+                with open(filepath, 'w') as f:
+                    f.write("DOCUMENTATION = '''\nauthor:\n  - First Last (@user%s)\n  - Other <other@domain.example>\n'''\n" % idx)
+                filepaths.append(filepath)
+            filepaths.append(os.path.join(tmpdir, 'missing.py'))
+
+            pooled = extract_author_records(filepaths, workers=2)
+
+            self.assertEqual(pooled, extract_author_records(filepaths, workers=1))
+            self.assertEqual(pooled[3], {'logins': ['user3'], 'emails': ['other@domain.example']})
+            self.assertEqual(pooled[-1], {'logins': [], 'emails': []})
@@ -0,0 +1,29 @@
+from ansibullbot.utils.iterators import RepoIssuesIterator
+
+
+class RepoWrapperMock:
+    def __init__(self):
+        self.fetched = []
+
+    def get_issue(self, number):
+        self.fetched.append(number)
+        return ('rest', number)
+
+    def load_issue_from_raw_data(self, raw_data):
+        return ('graphql', raw_data['number'])
+
+
+def test_hydrated_batches():
+    batches = []
+
+    def hydrate(numbers):
+        batches.append(numbers)
+        # 3 is not covered by the budget, 4 did not return the issue fields
+        return {x: {'issue': {'number': x} if x != 4 else None} for x in numbers if x != 3}
+
+    repo = RepoWrapperMock()
+    issues = RepoIssuesIterator(repo, [1, 2, 3, 4, 5], issuecache={2: ('cache', 2)}, hydrate=hydrate, batch_size=2)
+
+    assert list(issues) == [('graphql', 1), ('cache', 2), ('rest', 3), ('rest', 4), ('graphql', 5)]
+    assert batches == [[1, 2], [3, 4], [5]]
+    assert repo.fetched == [3, 4]
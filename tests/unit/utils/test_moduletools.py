@@ -0,0 +1,97 @@
+import os
+import tempfile
+
+from unittest import mock
+
+from ansibullbot._text_compat import to_text
+from ansibullbot.utils.git_tools import GitRepoWrapper
+from ansibullbot.utils.moduletools import ModuleIndexer
+from ansibullbot.utils.systemtools import run_command
+
+
+def commit(checkoutdir, files=None, moves=None, message='change'):
+    for src, dest in (moves or {}).items():
+        run_command('cd %s; git mv %s %s' % (checkoutdir, src, dest))
+    for filename, content in (files or {}).items():
+        filepath = os.path.join(checkoutdir, filename)
+        if not os.path.isdir(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+        with open(filepath, 'w') as f:
+            f.write(content)
+    run_command(
+        'cd %s; git add -A; git -c user.name=Foo -c user.email=foo@users.noreply.github.com commit -q -m %s'
+        % (checkoutdir, message)
+    )
+
+
+def git_log_follow(checkoutdir, filename):
+    (rc, so, se) = run_command('cd %s; git log --follow --format=%%H %s' % (checkoutdir, filename))
+    return to_text(so).split()
+
+
+def test_module_commits_follow_renames():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        checkoutdir = os.path.join(tmpdir, 'ansible')
+        cachedir = os.path.join(tmpdir, 'cache')
+        os.makedirs(checkoutdir)
+        os.makedirs(cachedir)
+        run_command('cd %s; git init -q' % checkoutdir)
+        content = ''.join('line %s\n' % x for x in range(20))
+        commit(checkoutdir, {'lib/ansible/modules/cloud/a.py': content, 'lib/ansible/modules/b.py': 'b'})
+        commit(checkoutdir, {'lib/ansible/modules/cloud/a.py': content + 'more\n', 'README': 'x'})
+        commit(checkoutdir, moves={'lib/ansible/modules/cloud/a.py': 'lib/ansible/modules/c.py'})
+
+        gitrepo = GitRepoWrapper(cachedir, None)
+        gitrepo.checkoutdir = checkoutdir
+
+        def get_indexer():
+            return ModuleIndexer(commits=True, blames=False, botmeta={'files': {}}, cachedir=cachedir, gitrepo=gitrepo)
+
+        mi = get_indexer()
+        for filename in ['lib/ansible/modules/c.py', 'lib/ansible/modules/b.py']:
+            assert [x['hash'] for x in mi.commits[filename]] == git_log_follow(checkoutdir, filename)
+        assert mi.commits['lib/ansible/modules/b.py'][0]['login'] == 'foo'
+        assert mi.commits['lib/ansible/modules/b.py'][0]['email'] == 'foo@users.noreply.github.com'
+        assert mi.commits['meta'] == []
+
+        # only the new commits are read
+        commit(checkoutdir, {'lib/ansible/modules/c.py': content + 'even more\n'})
+        with mock.patch('ansibullbot.utils.moduletools.run_command', wraps=run_command) as rc:
+            mi = get_indexer()
+        logs = [x[0][0] for x in rc.call_args_list if ' log ' in x[0][0]]
+        assert len(logs) == 1 and '..' in logs[0]
+        assert [x['hash'] for x in mi.commits['lib/ansible/modules/c.py']] == \
+            git_log_follow(checkoutdir, 'lib/ansible/modules/c.py')
+
+
+def test_module_commits_in_a_partial_clone():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        origin = os.path.join(tmpdir, 'origin')
+        cachedir = os.path.join(tmpdir, 'cache')
+        os.makedirs(origin)
+        run_command('cd %s; git init -q; git config uploadpack.allowfilter true' % origin)
+        content = ''.join('line %s\n' % x for x in range(20))
+        commit(origin, {'lib/ansible/modules/cloud/a.py': content, 'lib/ansible/modules/b.py': content})
+        commit(origin, moves={'lib/ansible/modules/cloud/a.py': 'lib/ansible/modules/c.py'})
+        commit(
+            origin,
+            {'lib/ansible/modules/d.py': content + 'more\n'},
+            moves={'lib/ansible/modules/b.py': 'lib/ansible/modules/d.py'}
+        )
+
+        checkoutdir = os.path.join(tmpdir, 'ansible')
+        run_command('git clone -q --filter=blob:none --no-checkout file://%s %s' % (origin, checkoutdir))
+        packs = os.listdir(os.path.join(checkoutdir, '.git/objects/pack'))
+
+        gitrepo = GitRepoWrapper(cachedir, None, clone_strategy='blobless')
+        gitrepo.checkoutdir = checkoutdir
+        os.makedirs(cachedir)
+        mi = ModuleIndexer(
+            commits=False, blames=False, botmeta={'files': {}}, cachedir=cachedir, gitrepo=gitrepo
+        )
+        history = mi.update_module_history()
+
+        # the exact rename is followed without downloading any file contents for the inexact one
+        assert history['files']['lib/ansible/modules/c.py'] == git_log_follow(origin, 'lib/ansible/modules/c.py')[::-1]
+        assert len(history['files']['lib/ansible/modules/d.py']) == 1
+        assert os.listdir(os.path.join(checkoutdir, '.git/objects/pack')) == packs
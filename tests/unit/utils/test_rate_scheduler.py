@@ -0,0 +1,90 @@
+import time
+
+from unittest import mock
+
+from github import Github
+from requests.structures import CaseInsensitiveDict
+
+from ansibullbot.utils.rate_scheduler import RateScheduler
+
+
+def test_unknown_bucket_is_not_paced():
+    scheduler = RateScheduler(reserve=0)
+    assert not scheduler.known('core')
+    assert scheduler.delay('core', now=1000) == 0
+
+
+def test_update_from_headers_picks_the_bucket():
+    scheduler = RateScheduler(reserve=0)
+    scheduler.update_from_headers({
+        'X-RateLimit-Limit': '5000',
+        'X-RateLimit-Remaining': '4999',
+        'X-RateLimit-Reset': '2000',
+        'X-RateLimit-Resource': 'graphql',
+    })
+    assert scheduler.remaining('graphql') == 4999
+    assert not scheduler.known('core')
+
+    # responses from the previous window are ignored
+    scheduler.update('graphql', 5000, 10, 1000)
+    assert scheduler.remaining('graphql') == 4999
+
+
+def test_paces_below_half_the_limit():
+    scheduler = RateScheduler(reserve=0)
+
+    scheduler.update('core', 100, 80, 1100)
+    assert scheduler.delay('core', now=1000) == 0
+    assert scheduler.delay('core', now=1000) == 0
+
+    # 10 requests left for 100 seconds are spread 10 seconds apart
+    scheduler.update('core', 100, 10, 1100)
+    assert scheduler.delay('core', now=1000) == 0
+    assert scheduler.delay('core', now=1000) == 10
+
+
+def test_drained_bucket_waits_for_the_reset():
+    scheduler = RateScheduler(reserve=5)
+    scheduler.update('search', 30, 5, 1060)
+    assert scheduler.delay('search', now=1000) == 61
+
+    # the window rolled over
+    assert scheduler.delay('search', now=1070) == 0
+
+
+def test_same_window_keeps_the_lowest_remaining():
+    scheduler = RateScheduler(reserve=0)
+    scheduler.update('core', 5000, 100, 2000)
+
+    # a response that was sent before the last one arrives late
+    scheduler.update('core', 5000, 150, 2000)
+    assert scheduler.remaining('core') == 100
+
+    # the new window starts over
+    scheduler.update('core', 5000, 4999, 5600)
+    assert scheduler.remaining('core') == 4999
+
+
+def test_tracked_connection_is_paced_without_rate_limit_calls():
+    scheduler = RateScheduler(reserve=0)
+    gh = Github(login_or_token='x')
+    scheduler.track(gh)
+    scheduler.track(gh)
+
+    # nothing was recorded yet and /rate_limit is not asked
+    with mock.patch.object(Github, 'get_rate_limit') as get_rate_limit:
+        scheduler.observe()
+    assert not get_rate_limit.called
+    assert not scheduler.known('core')
+
+    response = mock.Mock(status_code=200, text='{}', headers=CaseInsensitiveDict({
+        'X-RateLimit-Limit': '5000',
+        'X-RateLimit-Remaining': '42',
+        'X-RateLimit-Reset': '%d' % (time.time() + 3600),
+    }))
+    with mock.patch('requests.Session.get', return_value=response) as get, \
+            mock.patch.object(scheduler, 'wait', wraps=scheduler.wait) as wait:
+        gh.get_user('ansibot')
+    assert get.call_count == 1
+    wait.assert_called_once_with('core')
+    assert scheduler.remaining('core') == 42
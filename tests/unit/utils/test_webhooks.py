@@ -0,0 +1,85 @@
+import tempfile
+import threading
+
+from unittest import mock
+
+from ansibullbot.utils import sqlite_utils
+from ansibullbot.utils.sqlite_utils import AnsibullbotDatabase
+from ansibullbot.utils.webhooks import get_webhook_numbers
+from ansibullbot.utils.webhooks import load_recorded_webhooks
+from ansibullbot.utils.webhooks import queue_webhook
+from ansibullbot.utils.webhooks import record_webhook
+from ansibullbot.utils.webhooks import sign_webhook_body
+from ansibullbot.utils.webhooks import verify_webhook_signature
+
+
+REPOSITORY = {'full_name': 'ansible/ansible'}
+
+
+def test_get_webhook_numbers():
+    assert get_webhook_numbers('issue_comment', {'repository': REPOSITORY, 'issue': {'number': 1}}) == ('ansible/ansible', [1])
+    assert get_webhook_numbers('pull_request_review', {'repository': REPOSITORY, 'pull_request': {'number': 2}}) == ('ansible/ansible', [2])
+    assert get_webhook_numbers('push', {'repository': REPOSITORY}) == (None, [])
+
+    payload = {
+        'repository': REPOSITORY,
+        'check_run': {'pull_requests': [
+            {'number': 3, 'url': 'https://api.github.com/repos/ansible/ansible/pulls/3'},
+            {'number': 4, 'url': 'https://api.github.com/repos/jdoe/ansible/pulls/4'},
+        ]},
+    }
+    assert get_webhook_numbers('check_run', payload) == ('ansible/ansible', [3])
+
+
+def test_webhook_signature():
+    body = b'{"zen": "Keep it logically awesome."}'
+    signature = sign_webhook_body('secret', body)
+    assert verify_webhook_signature('secret', body, signature)
+    assert not verify_webhook_signature('other', body, signature)
+    assert not verify_webhook_signature('secret', body, None)
+
+
+def test_webhook_queue_coalesces_and_replays():
+    with tempfile.TemporaryDirectory() as cachedir:
+        unc = 'sqlite:///' + cachedir + '/test.db'
+
+        with mock.patch('ansibullbot.utils.sqlite_utils.C.DEFAULT_DATABASE_UNC', unc):
+            ADB = AnsibullbotDatabase(cachedir=cachedir)
+
+            record_webhook(cachedir, 'issues', {'repository': REPOSITORY, 'issue': {'number': 1}})
+            record_webhook(cachedir, 'issue_comment', {'repository': REPOSITORY, 'issue': {'number': 1}})
+            record_webhook(cachedir, 'pull_request', {'repository': REPOSITORY, 'pull_request': {'number': 2}})
+
+            for event, delivery, payload in load_recorded_webhooks([cachedir]):
+                queue_webhook(ADB, event, payload)
+
+            events = ADB.get_webhook_events('ansible/ansible')
+            assert events == {1: 2, 2: 1}
+
+            # a new event for 2 arrives while the loop triages
+            queue_webhook(ADB, 'pull_request_review', {'repository': REPOSITORY, 'pull_request': {'number': 2}})
+            ADB.ack_webhook_events('ansible/ansible', events)
+
+            assert ADB.get_webhook_events('ansible/ansible') == {2: 2}
+
+
+def test_webhook_queue_concurrent_events():
+    with tempfile.TemporaryDirectory() as cachedir:
+        unc = 'sqlite:///' + cachedir + '/test.db'
+
+        with mock.patch('ansibullbot.utils.sqlite_utils.C.DEFAULT_DATABASE_UNC', unc):
+            ADB = AnsibullbotDatabase(cachedir=cachedir)
+
+            def queue(event):
+                for _ in range(5):
+                    ADB.queue_webhook_event('ansible/ansible', 1, event, '2020-05-31T10:02:20')
+
+            threads = [threading.Thread(target=queue, args=(x,)) for x in ['issues', 'issue_comment'] * 4]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            assert ADB.get_webhook_events('ansible/ansible') == {1: 40}
+            row = ADB.session.query(sqlite_utils.WebhookEvent).one()
+            assert sorted(row.events.split(',')) == ['issue_comment', 'issues']
@@ -13,7 +13,7 @@ response_mock.json.return_value = {
     'message': 'API rate limit exceeded for user ID XXXXX.'
 }
 requests = Mock()
-requests.get.side_effect = lambda url, headers: response_mock
+requests.Session.return_value.get.side_effect = lambda url, headers: response_mock
 
 
 @patch('ansibullbot.decorators.github.C.DEFAULT_RATELIMIT', False)
@@ -24,3 +24,61 @@ def test_get_request_rate_limited():
 
     with pytest.raises(RateLimitError):
         gw.get_request('https://foo.bar.com/test')
+
+
+class PageMock:
+    def __init__(self, data, links=None):
+        self.data = data
+        self.links = links or {}
+        self.headers = {}
+
+    def json(self):
+        return self.data[:]
+
+
+@patch('ansibullbot.decorators.github.C.DEFAULT_RATELIMIT', False)
+def test_get_request_fetches_all_pages():
+    base = 'https://foo.bar.com/test'
+    pages = {
+        base: PageMock(
+            [1, 2],
+            {'next': {'url': base + '?page=2'}, 'last': {'url': base + '?page=4'}}
+        ),
+        base + '?page=2': PageMock([3, 4]),
+        base + '?page=3': PageMock([5, 6]),
+        base + '?page=4': PageMock([7]),
+    }
+    GithubWrapper._connect = lambda *args: None
+    gw = GithubWrapper(token=12345, cachedir=tempfile.mkdtemp())
+    gw.session = Mock()
+    gw.session.get.side_effect = lambda url, headers: pages[url]
+
+    assert gw.get_request(base) == [1, 2, 3, 4, 5, 6, 7]
+
+
+@patch('ansibullbot.decorators.github.C.DEFAULT_RATELIMIT', False)
+def test_get_request_follows_cursor_pages():
+    base = 'https://foo.bar.com/test'
+    pages = {
+        base: PageMock([1], {'next': {'url': base + '?after=a'}}),
+        base + '?after=a': PageMock([2], {'next': {'url': base + '?after=b'}}),
+        base + '?after=b': PageMock([3]),
+    }
+    GithubWrapper._connect = lambda *args: None
+    gw = GithubWrapper(token=12345, cachedir=tempfile.mkdtemp())
+    gw.session = Mock()
+    gw.session.get.side_effect = lambda url, headers: pages[url]
+
+    assert gw.get_request(base) == [1, 2, 3]
+    assert gw.get_requests([base + '?after=b', base]) == [[3], [1, 2, 3]]
+
+
+@patch('ansibullbot.decorators.github.C.DEFAULT_RATELIMIT', False)
+def test_clone_has_its_own_connection():
+    GithubWrapper._connect = lambda *args: Mock()
+    gw = GithubWrapper(token=12345, cachedir=tempfile.mkdtemp())
+    clone = gw.clone()
+
+    assert clone.gh is not gw.gh
+    assert clone.session is gw.session
+    assert clone.token == gw.token
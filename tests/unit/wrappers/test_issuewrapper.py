@@ -1,27 +1,33 @@
 import datetime
-import json
-import os
 import tempfile
 
 from unittest import mock
 
+from github import Github
+
+from ansibullbot.utils.cache_store import get_cache_store
 from ansibullbot.wrappers.issuewrapper import IssueWrapper
 
 
 class GithubIssueMock:
     number = 1
     url = 'https://github.com/ansible/ansible/issues/1'
+    html_url = 'https://github.com/ansible/ansible/issues/1'
     updated_at = datetime.datetime.now()
 
 
 class GithubWrapperMock:
 
     cache = {}
+    gh = Github()
 
     def get_request(self, url):
         print(url)
         return self._get_request(url)
 
+    def get_requests(self, urls):
+        return [self._get_request(x) for x in urls]
+
     def _get_request(self, url):
         return self.cache.get(url, [])
 
@@ -60,8 +66,8 @@ def test_get_events():
         events = iw.events
 
         assert len(events) == 3
-        assert os.path.exists(os.path.join(cachedir, 'issues', '1', 'timeline_meta.json'))
-        assert os.path.exists(os.path.join(cachedir, 'issues', '1', 'timeline_data.json'))
+        assert iw.store.get('ansible/ansible', 1, 'timeline_meta')
+        assert len(iw.store.get('ansible/ansible', 1, 'timeline_data')) == 3
 
 
 @mock.patch('ansibullbot.decorators.github.C.DEFAULT_RATELIMIT', False)
@@ -78,24 +84,18 @@ def test_get_events_bad_cache_invalidate():
             {'event': 'comment', 'created_at': '2020-05-31T10:02:20Z'}
         ]
 
-        events_meta_cache = os.path.join(cachedir, 'issues', '1', 'timeline_meta.json')
-        events_data_cache = os.path.join(cachedir, 'issues', '1', 'timeline_data.json')
-
-        os.makedirs(os.path.dirname(events_meta_cache))
-
+        store = get_cache_store(cachedir)
 
         # set a meta file that matches the timestamp for the issue so the cache is used
-        with open(events_meta_cache, 'w') as f:
-            f.write(json.dumps({
-                'updated_at': '2020-05-31T10:02:20Z',
-                'url': 'https://github.com/ansible/ansible/issues/1/timeline',
-            }))
+        store.set('ansible/ansible', 1, 'timeline_meta', {
+            'updated_at': '2020-05-31T10:02:20Z',
+            'url': 'https://github.com/ansible/ansible/issues/1/timeline',
+        })
 
         # create a bad event to make sure the cache is invalidated and refetched
         bad_events = github.cache['https://github.com/ansible/ansible/issues/1/timeline'][:]
         bad_events[0] = 'documentation_url'
-        with open(events_data_cache, 'w') as f:
-            f.write(json.dumps(bad_events))
+        store.set('ansible/ansible', 1, 'timeline_data', bad_events)
 
         iw = IssueWrapper(
             github=github,
@@ -108,3 +108,135 @@ def test_get_events_bad_cache_invalidate():
         events = iw.events
 
         assert len(events) == 3
+
+
+class GithubPullRequestIssueMock(GithubIssueMock):
+    html_url = 'https://github.com/ansible/ansible/pull/1'
+
+
+class GithubPullRequestMock:
+    url = 'https://api.github.com/repos/ansible/ansible/pulls/1'
+
+
+class GithubPullRequestRepoWrapperMock(GithubRepoWrapperMock):
+    def get_pullrequest(self, number):
+        return GithubPullRequestMock()
+
+
+@mock.patch('ansibullbot.decorators.github.C.DEFAULT_RATELIMIT', False)
+def test_prefetch_pullrequest():
+    '''Check the resources process() reads are loaded ahead of time'''
+    with tempfile.TemporaryDirectory() as cachedir:
+        github = GithubWrapperMock()
+        repo = GithubPullRequestRepoWrapperMock()
+        issue = GithubPullRequestIssueMock()
+
+        pr_url = GithubPullRequestMock.url
+        github.cache['https://github.com/ansible/ansible/issues/1/timeline'] = [
+            {'event': 'labeled', 'created_at': '2020-05-31T10:02:20Z'},
+        ]
+        github.cache[pr_url + '/files?per_page=100'] = [{'filename': 'lib/ansible/modules/foo.py'}]
+        github.cache[pr_url + '/reviews?per_page=100'] = [{'state': 'APPROVED', 'commit_id': 'abc'}]
+        github.cache[pr_url + '/commits?per_page=100'] = [
+            {'sha': 'abc', 'url': 'https://api.github.com/repos/ansible/ansible/commits/abc'},
+        ]
+
+        iw = IssueWrapper(
+            github=github,
+            repo=repo,
+            issue=issue,
+            cachedir=cachedir,
+            gitrepo=repo,
+        )
+
+        # every request goes through the pooled session, pygithub only
+        # builds the objects from the responses
+        with mock.patch.object(github, 'get_request') as get_request:
+            iw.prefetch(('events', 'pr_files', 'reviews', 'commits', 'pullrequest_check_runs'))
+
+        assert not get_request.called
+        assert len(iw._events) == 1
+        assert [x.filename for x in iw._pr_files] == ['lib/ansible/modules/foo.py']
+        assert iw._pr_reviews == [{'state': 'APPROVED', 'commit_id': 'abc'}]
+        assert [x.sha for x in iw._commits] == ['abc']
+        assert iw._pullrequest_check_runs is not None
+        assert [x.filename for x in iw.store.get('ansible/ansible', 1, 'files')[1]] == ['lib/ansible/modules/foo.py']
+
+
+@mock.patch('ansibullbot.decorators.github.C.DEFAULT_RATELIMIT', False)
+def test_hydrate_timeline():
+    '''A bulk graphql node replaces the timeline request'''
+    with tempfile.TemporaryDirectory() as cachedir:
+        github = GithubWrapperMock()
+        repo = GithubRepoWrapperMock()
+        issue = GithubIssueMock()
+
+        iw = IssueWrapper(
+            github=github,
+            repo=repo,
+            issue=issue,
+            cachedir=cachedir,
+            gitrepo=repo,
+        )
+
+        iw.hydrate({
+            'updated_at': issue.updated_at.strftime('%Y-%m-%dT%H:%M:%S.%f'),
+            'timeline': [
+                {'event': 'labeled', 'node_id': 'LE_1', 'actor': {'login': 'jdoe'},
+                 'label': {'name': 'bug'}, 'created_at': '2020-05-31T10:02:20Z'},
+            ],
+            'reviews': None,
+        })
+
+        with mock.patch.object(github, 'get_request') as get_request:
+            events = iw.events
+
+        assert not get_request.called
+        assert [(x['event'], x['label']) for x in events] == [('labeled', 'bug')]
+
+        # the graphql timeline is partial and must not pass for the rest one
+        assert iw.store.get('ansible/ansible', 1, 'timeline_data') is None
+
+
+@mock.patch('ansibullbot.decorators.github.C.DEFAULT_RATELIMIT', False)
+def test_hydrate_pullrequest():
+    '''Files and commits from a bulk graphql node replace their rest requests'''
+    with tempfile.TemporaryDirectory() as cachedir:
+        github = GithubWrapperMock()
+        repo = GithubPullRequestRepoWrapperMock()
+        issue = GithubPullRequestIssueMock()
+
+        iw = IssueWrapper(
+            github=github,
+            repo=repo,
+            issue=issue,
+            cachedir=cachedir,
+            gitrepo=repo,
+        )
+
+        iw.hydrate({
+            'updated_at': issue.updated_at.strftime('%Y-%m-%dT%H:%M:%S.%f'),
+            'timeline': None,
+            'reviews': [],
+            'files': [{'filename': 'README.md', 'additions': 1, 'deletions': 0, 'changes': 1, 'status': 'modified'}],
+            'commits': [{
+                'sha': 'abc',
+                'url': 'https://api.github.com/repos/ansible/ansible/commits/abc',
+                'commit': {
+                    'message': 'fix',
+                    'author': {'name': 'J Doe', 'email': 'jdoe@example.com', 'date': '2020-05-31T10:02:20Z'},
+                    'committer': {'name': 'J Doe', 'email': 'jdoe@example.com', 'date': '2020-05-31T10:02:20Z'},
+                },
+                'author': {'login': 'jdoe'},
+                'committer': None,
+                'parents': [{'sha': 'def'}],
+            }],
+        })
+
+        with mock.patch.object(github, 'get_requests') as get_requests:
+            iw.prefetch(('pr_files', 'reviews', 'commits'))
+
+        assert not get_requests.called
+        assert iw.files == ['README.md']
+        assert iw.committer_emails == ['jdoe@example.com']
+        assert iw.commits[0].commit.committer.date == datetime.datetime(2020, 5, 31, 10, 2, 20)